@@ -0,0 +1,181 @@
+"""
+End-to-end batch throughput benchmark against the offline fake Gemini backend.
+
+Runs the same BatchPipeline workload as the Batch button (upload -> processing
+wait -> generate -> report) over N synthetic videos, once with a clean
+backend and once with injected faults, and reports:
+
+- videos/hour (in simulated time)
+- p50/p95 seconds per stage and per video
+- error-recovery cost: extra simulated time per video and failures caused
+  by 429/500 errors and malformed responses
+
+Usage:
+    python benchmarks/bench_batch_throughput.py --videos 10 100 1000
+    python benchmarks/bench_batch_throughput.py --videos 100 --error-429 0.1 --malformed 0.05 --json results.json
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from medvat_core import BatchPipeline, GeminiClient, ProcessingPoller, RateLimiter, RubricManager, VideoSegmenter
+from fake_gemini import FakeGeminiBackend
+
+SCALED_CONSTANTS = [
+    (ProcessingPoller, ("MIN_INTERVAL", "MAX_INTERVAL", "BASE_TIMEOUT", "TIMEOUT_PER_MB",
+                        "TIMEOUT_PER_VIDEO_MINUTE", "MAX_TIMEOUT")),
+    (RateLimiter, ("WINDOW_SECONDS", "BASE_BACKOFF", "MAX_BACKOFF", "DECREASE_COOLDOWN")),
+]
+
+
+def scale_timing(time_scale):
+    """Shrink the app's real-time constants to match the fake's time scale."""
+    for cls, names in SCALED_CONSTANTS:
+        for name in names:
+            setattr(cls, name, getattr(cls, name) * time_scale)
+    # ProcessingPoller derives its first interval from MB; keep it proportional
+    ProcessingPoller.MB_PER_INTERVAL_SECOND = ProcessingPoller.MB_PER_INTERVAL_SECOND / time_scale
+    # Synthetic files aren't real media, so never probe them for segmenting
+    VideoSegmenter.is_available = staticmethod(lambda: False)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def run_workload(num_videos, args, faults):
+    """Run one batch and return its measurements in simulated seconds."""
+    work_dir = tempfile.mkdtemp(prefix="medvat_bench_")
+    previous_dir = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        videos = []
+        for i in range(num_videos):
+            path = os.path.join(work_dir, f"video_{i:05d}.mp4")
+            with open(path, "wb") as f:
+                f.write(os.urandom(16 * 1024))
+            videos.append(path)
+
+        backend = FakeGeminiBackend(
+            time_scale=args.time_scale,
+            upload_mbps=args.upload_mbps,
+            generate_seconds=(args.generate_min, args.generate_max),
+            error_rate_429=args.error_429 if faults else 0.0,
+            error_rate_500=args.error_500 if faults else 0.0,
+            malformed_rate=args.malformed if faults else 0.0,
+            rpm_quota=args.rpm_quota if faults else None,
+            seed=args.seed
+        )
+        # Fresh limiter per run so adaptive state doesn't carry over
+        RateLimiter._shared = RateLimiter({"rpm": args.rpm, "tpm": args.tpm, "max_concurrency": args.max_concurrency})
+        client = GeminiClient("fake-key", backend=backend)
+
+        rubric_key = args.rubric
+        rubrics = {rubric_key: RubricManager.get_rubrics()[rubric_key]}
+        incomplete = []
+
+        def report(video_path, result, key):
+            if result.get("missing_criteria"):
+                incomplete.append(video_path)
+            return video_path + ".pdf"
+
+        pipeline = BatchPipeline(
+            client,
+            rubrics,
+            "gemini-2.5-flash",
+            "fake-key",
+            report,
+            concurrency={"upload": args.upload_workers, "generate": args.generate_workers, "report": 1},
+            force_refresh=True
+        )
+        started = time.monotonic()
+        successful, failed, total = pipeline.run(videos)
+        elapsed = (time.monotonic() - started) / args.time_scale
+
+        scale = 1 / args.time_scale
+        stages = {
+            stage: {
+                "p50": percentile(times, 50) * scale,
+                "p95": percentile(times, 95) * scale
+            }
+            for stage, times in list(pipeline.stage_times.items()) + [("video", pipeline.video_times)]
+        }
+        return {
+            "videos": total,
+            "successful": successful,
+            "failed": len(failed),
+            "incomplete": len(incomplete),
+            "elapsed_seconds": elapsed,
+            "videos_per_hour": successful / elapsed * 3600 if elapsed else 0.0,
+            "stages": stages,
+            "backend_counts": dict(backend.counts),
+            "throttled_calls": RateLimiter.shared().throttled_count,
+            "final_concurrency": RateLimiter.shared().concurrency_limit()
+        }
+    finally:
+        os.chdir(previous_dir)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def print_result(label, result):
+    print(f"\n{label}: {result['successful']}/{result['videos']} successful, "
+          f"{result['failed']} failed, {result['incomplete']} incomplete")
+    print(f"  {result['videos_per_hour']:.0f} videos/hour over {result['elapsed_seconds'] / 60:.1f} simulated minutes")
+    for stage, stats in result["stages"].items():
+        print(f"  {stage:<11} p50 {stats['p50']:8.1f}s   p95 {stats['p95']:8.1f}s")
+    counts = result["backend_counts"]
+    print(f"  injected: {counts['429']} x 429, {counts['500']} x 500, {counts['malformed']} malformed; "
+          f"limiter throttled {result['throttled_calls']} calls, final concurrency {result['final_concurrency']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch throughput benchmark using a fake Gemini backend")
+    parser.add_argument("--videos", type=int, nargs="+", default=[10, 100], help="Batch sizes to run (10-1000)")
+    parser.add_argument("--time-scale", type=float, default=0.002, help="Real seconds per simulated second")
+    parser.add_argument("--rubric", default="Suturing: Simple Interrupted")
+    parser.add_argument("--upload-workers", type=int, default=BatchPipeline.DEFAULT_CONCURRENCY["upload"])
+    parser.add_argument("--generate-workers", type=int, default=BatchPipeline.DEFAULT_CONCURRENCY["generate"])
+    parser.add_argument("--upload-mbps", type=float, default=40.0)
+    parser.add_argument("--generate-min", type=float, default=20.0)
+    parser.add_argument("--generate-max", type=float, default=60.0)
+    parser.add_argument("--rpm", type=int, default=RateLimiter.DEFAULT_LIMITS["rpm"])
+    parser.add_argument("--tpm", type=int, default=RateLimiter.DEFAULT_LIMITS["tpm"])
+    parser.add_argument("--max-concurrency", type=int, default=RateLimiter.DEFAULT_LIMITS["max_concurrency"])
+    parser.add_argument("--error-429", type=float, default=0.05, help="Fault run: quota error rate")
+    parser.add_argument("--error-500", type=float, default=0.02, help="Fault run: server error rate")
+    parser.add_argument("--malformed", type=float, default=0.05, help="Fault run: malformed response rate")
+    parser.add_argument("--rpm-quota", type=int, default=None, help="Fault run: server-side generate quota per minute")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    scale_timing(args.time_scale)
+    results = []
+    for num_videos in args.videos:
+        clean = run_workload(num_videos, args, faults=False)
+        faulty = run_workload(num_videos, args, faults=True)
+        print_result(f"{num_videos} videos, clean", clean)
+        print_result(f"{num_videos} videos, with faults", faulty)
+        extra = (faulty["elapsed_seconds"] - clean["elapsed_seconds"]) / max(1, num_videos)
+        print(f"  error-recovery cost: {extra:+.1f} simulated s/video, "
+              f"{faulty['failed'] - clean['failed']:+d} failed videos")
+        results.append({"videos": num_videos, "clean": clean, "faults": faulty, "recovery_seconds_per_video": extra})
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
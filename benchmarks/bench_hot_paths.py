@@ -0,0 +1,251 @@
+"""
+Micro-benchmarks for the local (non-network) hot paths.
+
+Times each operation and measures its peak memory with tracemalloc using
+realistic fixtures: a 50-item rubric, long advice text with braces and
+timestamps, and a ~1 MB model response. Results are compared against a
+stored baseline, and the script exits with status 1 if any operation got
+slower or used more memory than the baseline allows: by default 30% more
+time (timings are noisy) or 20% more peak memory.
+
+Usage:
+    python benchmarks/bench_hot_paths.py                   # compare against the baseline
+    python benchmarks/bench_hot_paths.py --ci              # also fail if there is nothing to compare against
+    python benchmarks/bench_hot_paths.py --save-baseline   # record a new baseline
+    python benchmarks/bench_hot_paths.py --only extract    # run matching operations only
+
+hot_paths_baseline.json is a reference baseline recorded on a headless
+Linux machine (CPython 3, no display, so no form operations). Memory
+figures carry over between machines, but timings don't. Record your own
+baseline on the machine you compare on, or pass --time-tolerance to allow
+for a slower one. GUI operations are skipped when no display is available.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from medvat_core import (
+    GeminiClient, IncrementalAssessmentParser, ReportRenderer, ResponseParser, ResultCache, ResultExporter
+)
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "hot_paths_baseline.json")
+TIME_TOLERANCE = 0.30  # Allowed slowdown before failing (timings are noisy)
+MEMORY_TOLERANCE = 0.20
+
+
+# --- Fixtures ---
+
+def make_rubric(num_items=50):
+    items = []
+    for i in range(num_items):
+        items.append({
+            "name": f"Criterion {i + 1}: step {i + 1} performed correctly",
+            "type": "binary" if i % 3 == 0 else "likert",
+            "desc": "Detailed description of the expected behaviour, common errors and what good looks like. " * 3
+        })
+    # The Chest Tube title pulls in the largest instruction block
+    return {"title": "Chest Tube Insertion Assessment", "category": "Chest Tube", "items": items}
+
+
+def make_advice(index, length):
+    sentence = (f"[{index % 60:02d}:{(index * 7) % 60:02d}] The resident adjusted the grip {{twice}} "
+                "before advancing; keep the instrument tip in view and avoid \"re-grasping\". ")
+    return (sentence * (length // len(sentence) + 1))[:length]
+
+
+def make_result(rubric, advice_length):
+    return {
+        "assessments": [
+            {"name": item["name"], "score": 1 if item["type"] == "binary" else 1 + i % 5,
+             "advice": make_advice(i, advice_length)}
+            for i, item in enumerate(rubric["items"])
+        ],
+        "summative_comment": make_advice(99, 2000)
+    }
+
+
+def build_fixtures():
+    rubric = make_rubric()
+    result = make_result(rubric, 2000)
+    # ~1 MB response wrapped the way models sometimes answer
+    large_result = make_result(rubric, 20000)
+    large_text = "Here is the assessment:\n```json\n" + json.dumps(large_result, indent=2) + "\n```\n"
+    truncated_text = large_text[:int(len(large_text) * 0.8)]
+    return SimpleNamespace(
+        rubric=rubric,
+        result=result,
+        large_text=large_text,
+        truncated_text=truncated_text,
+        chunks=[large_text[i:i + 256] for i in range(0, len(large_text), 256)]
+    )
+
+
+# --- Operations ---
+
+def operations(fx):
+    def stream_parse():
+        parser = IncrementalAssessmentParser(lambda entry: None)
+        for chunk in fx.chunks:
+            parser.feed(chunk)
+        return parser.emitted
+
+    def validate():
+        data = json.loads(json.dumps(fx.result))
+        data["assessments"] = data["assessments"][:-5]
+        return ResponseParser.validate(data, fx.rubric)
+
+    ops = {
+        "build_prompt": lambda: GeminiClient.build_prompt(fx.rubric),
+        "response_schema": lambda: GeminiClient.response_schema(fx.rubric),
+        "result_cache_key": lambda: ResultCache.make_key("0" * 64, fx.rubric, "gemini-2.5-flash"),
+        "extract_1mb": lambda: ResponseParser.extract(fx.large_text),
+        "extract_truncated_1mb": lambda: ResponseParser.extract(fx.truncated_text),
+        "stream_parse_1mb": stream_parse,
+        "validate_50_items": validate,
+        "rows_for_rubric_50_items": lambda: ReportRenderer.rows_for_rubric(fx.rubric["items"], fx.result),
+        "export_rows_50_items": lambda: ResultExporter.rows_for(
+            "video.mp4", "bench", fx.rubric, "gemini-2.5-flash", fx.result, video_duration=600.0
+        ),
+    }
+
+    try:
+        import reportlab  # noqa: F401
+        out_dir = tempfile.mkdtemp(prefix="medvat_bench_pdf_")
+        items, summary = ReportRenderer.rows_for_rubric(fx.rubric["items"], fx.result)
+        pdf_path = os.path.join(out_dir, "video.pdf")
+
+        def render_pdf():
+            # Layout only, in-process; the app runs this in its report pool
+            size = ReportRenderer.render(pdf_path, fx.rubric["title"], "video.mp4", items, summary, "2025-01-01 00:00")
+            os.remove(pdf_path)
+            return size
+
+        ops["render_pdf_50_items"] = render_pdf
+    except ImportError:
+        print("[Bench] reportlab not installed, skipping PDF rendering")
+
+    panel = make_panel()
+    if panel is not None:
+        def build_form_cold():
+            panel.forget_form("bench")
+            panel.build_form(fx.rubric, "bench")
+
+        ops["build_form_50_items"] = build_form_cold
+        ops["switch_form_cached_50_items"] = lambda: panel.build_form(fx.rubric, "bench")
+        ops["populate_from_ai_50_items"] = lambda: panel.populate_from_ai(fx.result)
+    return ops
+
+
+def make_panel():
+    try:
+        import customtkinter as ctk
+        from medvat_app import AssessmentPanel
+        root = ctk.CTk()
+        root.withdraw()
+        panel = AssessmentPanel(root)
+        panel.pack()
+        return panel
+    except Exception as e:
+        print(f"[Bench] No display available, skipping form operations ({e})")
+        return None
+
+
+# --- Measurement ---
+
+def measure(fn, repeats):
+    """Return (median seconds, peak bytes) for fn."""
+    fn()  # Warm up caches and lazy imports
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return statistics.median(times), peak
+
+
+def compare(name, current, baseline, time_tolerance=TIME_TOLERANCE, memory_tolerance=MEMORY_TOLERANCE):
+    """Return a list of regression messages for one operation."""
+    problems = []
+    if current["seconds"] > baseline["seconds"] * (1 + time_tolerance):
+        problems.append(f"{name}: {current['seconds'] * 1000:.2f} ms vs baseline {baseline['seconds'] * 1000:.2f} ms")
+    if current["peak_bytes"] > baseline["peak_bytes"] * (1 + memory_tolerance):
+        problems.append(f"{name}: peak {current['peak_bytes'] / 1024:.0f} KB vs baseline {baseline['peak_bytes'] / 1024:.0f} KB")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark local hot paths against a stored baseline")
+    parser.add_argument("--repeats", type=int, default=7)
+    parser.add_argument("--only", help="Run only operations whose name contains this text")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--ci", action="store_true",
+                        help="Fail (status 2) if the baseline is missing or doesn't cover an operation that ran")
+    parser.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE,
+                        help=f"Allowed slowdown as a fraction (default: {TIME_TOLERANCE})")
+    parser.add_argument("--memory-tolerance", type=float, default=MEMORY_TOLERANCE,
+                        help=f"Allowed peak memory growth as a fraction (default: {MEMORY_TOLERANCE})")
+    args = parser.parse_args()
+
+    fixtures = build_fixtures()
+    results = {}
+    print(f"{'operation':<28}{'median':>12}{'peak memory':>14}")
+    for name, fn in operations(fixtures).items():
+        if args.only and args.only not in name:
+            continue
+        seconds, peak = measure(fn, args.repeats)
+        results[name] = {"seconds": seconds, "peak_bytes": peak}
+        print(f"{name:<28}{seconds * 1000:>9.2f} ms{peak / 1024:>11.0f} KB")
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r") as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline found at {args.baseline}; run with --save-baseline to record one.")
+        return 2 if args.ci else 0
+
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)
+    problems = []
+    for name, current in results.items():
+        if name in baseline:
+            problems.extend(compare(name, current, baseline[name], args.time_tolerance, args.memory_tolerance))
+    uncompared = sorted(name for name in results if name not in baseline)
+    if uncompared:
+        print(f"\nNot in the baseline (not compared): {', '.join(uncompared)}")
+        if args.ci:
+            print("Record them with --save-baseline.")
+            return 2
+    if problems:
+        print("\nRegressions against baseline:")
+        for problem in problems:
+            print(f"  - {problem}")
+        return 1
+    print("\nNo regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""
+Cold-start benchmark for the desktop app.
+
+Each measurement runs in a fresh interpreter, so nothing is already
+imported or cached in-process:
+
+- import time of medvat_core, medvat_app and the heavy third-party
+  modules (customtkinter, google.generativeai, reportlab)
+- time to first paint: import medvat_app, build MedVATApp and process
+  the first round of drawing (app.update()), plus the wall time from
+  process start
+
+It also lists which heavy modules were already loaded when the window
+first painted, and exits with status 1 if the Gemini SDK, ReportLab,
+pandas or pyarrow were among them (they should load on first use).
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --repeats 10 --json startup.json
+
+The first-paint measurement needs a display and is skipped without one.
+It runs in an empty temporary directory, so no API key is loaded and no
+network calls are made.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_MODULES = ["medvat_core", "customtkinter", "google.generativeai", "reportlab.platypus", "medvat_app"]
+# Modules that must not be loaded before the window is interactive
+DEFERRED_MODULES = ["google.generativeai", "reportlab", "pandas", "pyarrow"]
+
+IMPORT_SNIPPET = """
+import json, time
+started = time.perf_counter()
+import {module}
+print(json.dumps({{"seconds": time.perf_counter() - started}}))
+"""
+
+FIRST_PAINT_SNIPPET = """
+import json, sys, time
+started = time.perf_counter()
+import medvat_app
+imported = time.perf_counter()
+app = medvat_app.MedVATApp()
+constructed = time.perf_counter()
+app.update()
+painted = time.perf_counter()
+loaded = [name for name in {deferred!r} if name in sys.modules]
+app.destroy()
+print(json.dumps({{
+    "import_app": imported - started,
+    "construct": constructed - imported,
+    "first_paint": painted - started,
+    "deferred_loaded": loaded
+}}))
+"""
+
+
+def run_snippet(code, cwd):
+    """Run code in a fresh interpreter; return (parsed JSON output, wall seconds) or (None, error)."""
+    env = dict(os.environ, PYTHONPATH=REPO_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        lines = (proc.stderr or proc.stdout).strip().splitlines()
+        return None, lines[-1] if lines else f"exit status {proc.returncode}"
+    return json.loads(proc.stdout.strip().splitlines()[-1]), wall
+
+
+def median_ms(values):
+    return statistics.median(values) * 1000 if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import and first-paint time of the desktop app")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="medvat_bench_startup_")
+    results = {"interpreter": None, "imports": {}, "first_paint": None}
+
+    interpreter = [run_snippet("print('{}')", work_dir)[1] for _ in range(args.repeats)]
+    results["interpreter"] = {"wall_ms": median_ms(interpreter)}
+    print(f"{'bare interpreter':<28}{median_ms(interpreter):>9.1f} ms")
+
+    print("\nImport time (fresh interpreter each run):")
+    for module in IMPORT_MODULES:
+        times = []
+        error = None
+        for _ in range(args.repeats):
+            output, detail = run_snippet(IMPORT_SNIPPET.format(module=module), work_dir)
+            if output is None:
+                error = detail
+                break
+            times.append(output["seconds"])
+        if error:
+            results["imports"][module] = {"error": error}
+            print(f"  {module:<26}   skipped ({error})")
+        else:
+            results["imports"][module] = {"ms": median_ms(times)}
+            print(f"  {module:<26}{median_ms(times):>9.1f} ms")
+
+    print("\nFirst paint:")
+    runs = []
+    for _ in range(args.repeats):
+        output, detail = run_snippet(FIRST_PAINT_SNIPPET.format(deferred=DEFERRED_MODULES), work_dir)
+        if output is None:
+            print(f"  skipped ({detail})")
+            break
+        output["wall"] = detail
+        runs.append(output)
+
+    status = 0
+    if runs:
+        results["first_paint"] = {
+            key: median_ms([run[key] for run in runs])
+            for key in ("import_app", "construct", "first_paint", "wall")
+        }
+        results["first_paint"]["deferred_loaded"] = sorted({name for run in runs for name in run["deferred_loaded"]})
+        fp = results["first_paint"]
+        print(f"  {'import medvat_app':<26}{fp['import_app']:>9.1f} ms")
+        print(f"  {'build window':<26}{fp['construct']:>9.1f} ms")
+        print(f"  {'first paint (in process)':<26}{fp['first_paint']:>9.1f} ms")
+        print(f"  {'first paint (wall)':<26}{fp['wall']:>9.1f} ms")
+        if fp["deferred_loaded"]:
+            print(f"\nLoaded before first paint but should be deferred: {', '.join(fp['deferred_loaded'])}")
+            status = 1
+        else:
+            print("\nNo deferred modules were loaded before first paint.")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,242 @@
+"""
+Offline stand-in for the Gemini API, used by the benchmarks.
+
+FakeGeminiBackend implements the GeminiBackend interface in-process and
+simulates upload bandwidth, server-side PROCESSING time, generation
+latency, quota (429) and server (500) errors, and malformed JSON output,
+so batch throughput, polling and parsing can be measured without an API
+key or real videos.
+
+All simulated delays are multiplied by time_scale, so a 0.01 scale runs a
+workload 100x faster than real time.
+"""
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+from datetime import timedelta
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from medvat_core import GeminiBackend
+
+
+class FakeGeminiBackend(GeminiBackend):
+    """
+    Simulated Gemini service. Video sizes and durations are derived from a
+    hash of the file path, so the same workload always looks the same.
+    """
+    def __init__(self, time_scale=1.0, upload_mbps=40.0, video_mb=(50, 400),
+                 processing_seconds_per_mb=0.15, generate_seconds=(20, 60),
+                 error_rate_429=0.0, error_rate_500=0.0, malformed_rate=0.0,
+                 rpm_quota=None, seed=0):
+        """
+        Args:
+            time_scale: Multiplier applied to every simulated delay
+            upload_mbps: Simulated upload bandwidth in MB/s (shared by all uploads)
+            video_mb: (min, max) simulated video size in MB
+            processing_seconds_per_mb: Server-side PROCESSING time per MB
+            generate_seconds: (min, max) generation latency
+            error_rate_429: Probability a generate call fails with a quota error
+            error_rate_500: Probability an upload or generate call fails with a server error
+            malformed_rate: Probability a response is truncated, fenced or missing a criterion
+            rpm_quota: Generate calls allowed per (scaled) minute before 429s, or None
+            seed: Seed for the error and latency draws
+        """
+        self.time_scale = time_scale
+        self.upload_mbps = upload_mbps
+        self.video_mb = video_mb
+        self.processing_seconds_per_mb = processing_seconds_per_mb
+        self.generate_seconds = generate_seconds
+        self.error_rate_429 = error_rate_429
+        self.error_rate_500 = error_rate_500
+        self.malformed_rate = malformed_rate
+        self.rpm_quota = rpm_quota
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._upload_lock = threading.Lock()  # Uploads share one link
+        self._files = {}
+        self._generate_calls = deque()
+        self.counts = {
+            "upload": 0, "get_file": 0, "list_files": 0, "delete_file": 0,
+            "generate": 0, "cache": 0, "429": 0, "500": 0, "malformed": 0
+        }
+
+    # --- Simulation helpers ---
+
+    def _sleep(self, seconds):
+        time.sleep(seconds * self.time_scale)
+
+    def _draw(self):
+        with self._lock:
+            return self._random.random()
+
+    def _count(self, key):
+        with self._lock:
+            self.counts[key] += 1
+
+    def _maybe_fail(self, rate_500, rate_429=0.0):
+        if rate_429 and self._draw() < rate_429:
+            self._count("429")
+            raise Exception("429 Resource has been exhausted (e.g. check quota).")
+        if rate_500 and self._draw() < rate_500:
+            self._count("500")
+            raise Exception("500 An internal error has occurred. Please retry.")
+
+    def _video_profile(self, path):
+        digest = int(hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:8], 16)
+        low, high = self.video_mb
+        size_mb = low + (digest % 1000) / 1000 * (high - low)
+        # Roughly 1 MB per 2 seconds of 720p video
+        return size_mb, size_mb * 2
+
+    def _snapshot(self, entry):
+        ready = time.monotonic() >= entry["ready_at"]
+        return SimpleNamespace(
+            name=entry["name"],
+            state=SimpleNamespace(name="ACTIVE" if ready else "PROCESSING"),
+            size_bytes=int(entry["size_mb"] * 1024 * 1024),
+            video_metadata=SimpleNamespace(video_duration=timedelta(seconds=entry["duration"])),
+            uri=f"https://fake.invalid/{entry['name']}"
+        )
+
+    # --- GeminiBackend ---
+
+    def configure(self, api_key):
+        pass
+
+    def upload_file(self, path):
+        self._count("upload")
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        size_mb, duration = self._video_profile(path)
+        with self._upload_lock:
+            self._sleep(size_mb / self.upload_mbps)
+        self._maybe_fail(self.error_rate_500)
+        with self._lock:
+            name = f"files/fake-{len(self._files) + 1:06d}"
+            self._files[name] = {
+                "name": name,
+                "size_mb": size_mb,
+                "duration": duration,
+                "ready_at": time.monotonic() + size_mb * self.processing_seconds_per_mb * self.time_scale
+            }
+            return self._snapshot(self._files[name])
+
+    def get_file(self, name):
+        self._count("get_file")
+        with self._lock:
+            entry = self._files.get(name)
+            if entry is None:
+                raise Exception(f"404 File {name} not found.")
+            return self._snapshot(entry)
+
+    def list_files(self):
+        self._count("list_files")
+        with self._lock:
+            return [self._snapshot(entry) for entry in self._files.values()]
+
+    def delete_file(self, name):
+        self._count("delete_file")
+        with self._lock:
+            self._files.pop(name, None)
+
+    def list_models(self):
+        return [
+            SimpleNamespace(name=f"models/{name}", supported_generation_methods=["generateContent"])
+            for name in ("gemini-2.5-flash", "gemini-2.5-pro")
+        ]
+
+    def get_model(self, name):
+        for model in self.list_models():
+            if model.name == name:
+                return model
+        raise Exception(f"404 Model {name} not found.")
+
+    def generate_content(self, model_name, contents, generation_config=None, stream=False, timeout=600, cached_content=None):
+        self._count("generate")
+        if self.rpm_quota:
+            now = time.monotonic()
+            window = 60 * self.time_scale
+            with self._lock:
+                while self._generate_calls and now - self._generate_calls[0] >= window:
+                    self._generate_calls.popleft()
+                over_quota = len(self._generate_calls) >= self.rpm_quota
+                self._generate_calls.append(now)
+            if over_quota:
+                self._count("429")
+                raise Exception("429 Resource has been exhausted (e.g. check quota).")
+        self._maybe_fail(self.error_rate_500, self.error_rate_429)
+
+        low, high = self.generate_seconds
+        self._sleep(low + self._draw() * (high - low))
+        text = self._response_text(contents, generation_config)
+        usage = SimpleNamespace(total_token_count=int(len(text) / 4) + 20000)
+        if not stream:
+            return SimpleNamespace(text=text, usage_metadata=usage)
+        chunks = [SimpleNamespace(text=text[i:i + 200]) for i in range(0, len(text), 200)]
+        return FakeStream(chunks, usage)
+
+    def create_cached_content(self, model_name, contents, ttl, display_name=None):
+        self._count("cache")
+        return FakeCachedContent(display_name)
+
+    # --- Responses ---
+
+    def _response_text(self, contents, generation_config):
+        if isinstance(contents, str):
+            return "OK"
+        names = []
+        schema = (generation_config or {}).get("response_schema")
+        if schema:
+            names = schema["properties"]["assessments"]["items"]["properties"]["name"].get("enum", [])
+        if not names:
+            names = ["Overall technique"]
+        assessments = [
+            {"name": name, "score": 1 + (i % 5), "advice": f"[00:{10 + i:02d}] Simulated feedback {{with braces}} for {name}."}
+            for i, name in enumerate(names)
+        ]
+        payload = {"assessments": assessments, "summative_comment": "Simulated summative comment."}
+        if schema and "detected_pattern" in schema["properties"]:
+            payload["detected_pattern"] = "Unknown"
+        text = json.dumps(payload)
+
+        if self.malformed_rate and self._draw() < self.malformed_rate:
+            self._count("malformed")
+            kind = self._draw()
+            if kind < 0.4:
+                # Cut off mid-response
+                text = text[:int(len(text) * 0.7)]
+            elif kind < 0.7:
+                text = f"Here is the assessment:\n```json\n{text}\n```"
+            else:
+                payload["assessments"] = assessments[:-1]
+                text = json.dumps(payload)
+        return text
+
+
+class FakeStream:
+    """Iterable of response chunks, like a streamed generate_content call."""
+    def __init__(self, chunks, usage_metadata):
+        self._chunks = chunks
+        self.usage_metadata = usage_metadata
+
+    def __iter__(self):
+        return iter(self._chunks)
+
+
+class FakeCachedContent:
+    def __init__(self, display_name):
+        self.name = f"cachedContents/{display_name}"
+
+    def update(self, ttl=None):
+        pass
+
+    def delete(self):
+        pass
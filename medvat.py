@@ -0,0 +1,12 @@
+"""
+MedVAT desktop app launcher: python medvat.py
+
+PDF reports are rendered in spawned worker processes, and spawn re-runs
+the parent's entry script in every worker (as __mp_main__). This script
+imports nothing outside its __main__ guard, so the workers only load
+medvat_core, not tkinter/customtkinter and the rest of medvat_app.
+"""
+
+if __name__ == "__main__":
+    from medvat_app import main
+    main()
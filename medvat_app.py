@@ -2,820 +2,163 @@ import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 import customtkinter as ctk
 import threading
-import time
-import json
 import os
 from datetime import datetime
-import google.generativeai as genai
-from reportlab.lib.pagesizes import LETTER
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
+from medvat_core import (
+    AssessmentModel, BatchJobStore, BatchPipeline, ConfigManager, ConnectivityMonitor, ErrorHandler,
+    FolderWatcher, GeminiClient, Metrics, ModelCatalogue, PromptCache, RateLimiter, ReportRenderer,
+    ResultCache, ResultExporter, RubricManager, VideoScanner
+)
 
 # --- Configuration ---
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("dark-blue")
 
-class RubricManager:
+class UIUpdateBus:
     """
-    Manages the definitions of different assessment rubrics.
-    """
-    @staticmethod
-    def get_rubrics():
-        return {
-            "Suturing: Simple Interrupted": {
-                "title": "Simple Interrupted Suture Assessment",
-                "category": "Suturing",
-                "subcategory": "Simple Interrupted",
-                "items": [
-                    {"name": "Perpendicular needle passes", "type": "likert", "desc": "Needle enters/exits at ~90°, symmetric bites."},
-                    {"name": "Gentle tissue handling", "type": "likert", "desc": "Use of forceps without crushing or repeated grasping. Single clean grasp per edge, no trauma."},
-                    {"name": "Square, secure knots", "type": "likert", "desc": "Flat, square, properly tightened, not loose."},
-                    {"name": "Appropriate tension", "type": "likert", "desc": "Skin edges meet without squeezing or gaps. Edges just touch, no blanching or puckering."},
-                    {"name": "Even spacing", "type": "likert", "desc": "Distance between stitches. Each 0.5-1cm apart, uniform."},
-                    {"name": "Dermal and epidermal apposition", "type": "likert", "desc": "How well layers meet. Layers aligned; mild eversion fine but not required."},
-                    {"name": "Economy of motion", "type": "likert", "desc": "Efficiency during suturing. Hands stay close to field, minimal unnecessary motion."}
-                ]
-            },
-            "Suturing: Vertical Mattress": {
-                "title": "Vertical Mattress Suture Assessment",
-                "category": "Suturing",
-                "subcategory": "Vertical Mattress",
-                "items": [
-                    {"name": "Correct far-far and near-near", "type": "likert", "desc": "Placement of deep and superficial bites. Deep supports wound, shallow closes skin."},
-                    {"name": "Gentle tissue handling", "type": "likert", "desc": "Avoiding rough handling. Single, light grasps per edge."},
-                    {"name": "Square, secure knots", "type": "likert", "desc": "Knot integrity. Flat, tight, not slipping."},
-                    {"name": "Balanced deep/superficial tension", "type": "likert", "desc": "Relationship between inner and outer tension. Deep supports wound, superficial not strangling tissue."},
-                    {"name": "Even spacing", "type": "likert", "desc": "Stitch intervals. Consistent, 0.5-1cm apart."},
-                    {"name": "Proper eversion", "type": "likert", "desc": "Skin edges slightly raised. Uniform ridge, no inversion."},
-                    {"name": "Economy of motion", "type": "likert", "desc": "Efficiency. Few wasted movements, steady rhythm."}
-                ]
-            },
-            "Suturing: Subcuticular": {
-                "title": "Subcuticular Suture Assessment",
-                "category": "Suturing",
-                "subcategory": "Subcuticular",
-                "items": [
-                    {"name": "Consistent dermal bites", "type": "likert", "desc": "Depth and spacing of bites in continuous run. Smooth, even rhythm without irregular spacing."},
-                    {"name": "Entry/exit symmetry", "type": "likert", "desc": "How evenly left and right bites mirror. Same depth and offset each side."},
-                    {"name": "No unintended surface breaches", "type": "likert", "desc": "Whether suture stays beneath epidermis. Only start/finish exposed; no loops outside."},
-                    {"name": "Gentle tissue handling", "type": "likert", "desc": "Smooth needle driving and tension control. Controlled, atraumatic, no heavy pressure."},
-                    {"name": "Square, secure knots", "type": "likert", "desc": "Knot formation and concealment. Square, tight, hidden or buried."},
-                    {"name": "Flat skin approximation", "type": "likert", "desc": "Final cosmetic appearance. Smooth surface, no ridges or gaps."},
-                    {"name": "Economy of motion", "type": "likert", "desc": "Efficiency and organization. Continuous, confident workflow, few interruptions."}
-                ]
-            },
-            "Suturing: Auto-Detect": {
-                "title": "Suturing Assessment (Pattern Auto-Detected)",
-                "category": "Suturing",
-                "subcategory": "Auto-Detect",
-                "items": [
-                    {"name": "Perpendicular needle passes", "type": "likert", "desc": "Needle enters/exits at ~90°, symmetric bites."},
-                    {"name": "Gentle tissue handling", "type": "likert", "desc": "Use of forceps without crushing or repeated grasping."},
-                    {"name": "Square, secure knots", "type": "likert", "desc": "Flat, square, properly tightened, not loose."},
-                    {"name": "Appropriate tension", "type": "likert", "desc": "Skin edges meet without squeezing or gaps."},
-                    {"name": "Even spacing", "type": "likert", "desc": "Distance between stitches. Each 0.5-1cm apart, uniform."},
-                    {"name": "Economy of motion", "type": "likert", "desc": "Efficiency during suturing. Hands stay close to field, minimal unnecessary motion."}
-                ],
-                "auto_detect": True
-            },
-            "Chest Tube Insertion VOP": {
-                "title": "VOP - Chest Tube Insertion",
-                "category": "Procedures",
-                "subcategory": None,
-                "items": [
-                    {"name": "Selects appropriate site for incision - mid axillary", "type": "binary", "desc": ""},
-                    {"name": "Infiltrates local anesthetic at appropriate site", "type": "binary", "desc": ""},
-                    {"name": "2 cm transverse incision through skin", "type": "binary", "desc": ""},
-                    {"name": "Uses a Kelly to bluntly dissect down to chest wall", "type": "binary", "desc": ""},
-                    {"name": "Blunt dissection on top of rib one interspace higher than incision", "type": "binary", "desc": ""},
-                    {"name": "Dissects with gentle pressure through intercostals muscles, enters pleura", "type": "binary", "desc": ""},
-                    {"name": "Grasps tube with Kelly, carefully", "type": "binary", "desc": ""},
-                    {"name": "Advances chest tube past the last tube hole", "type": "binary", "desc": ""},
-                    {"name": "Secures chest tube with a suture", "type": "binary", "desc": ""},
-                    {"name": "Economy of Time and Motion", "type": "likert", "desc": "Many unnecessary / disorganized movements (1) → Organized time / motion, some unnecessary movements (3) → Maximum economy of movement and efficiency (5)"},
-                    {"name": "Final Rating / Demonstrates Proficiency", "type": "binary", "desc": ""}
-                ]
-            },
-            "Standardized Patient Encounter": {
-                "title": "SP Communication Assessment",
-                "category": "Communication",
-                "subcategory": None,
-                "items": [
-                    {"name": "Introduction & Role ID", "type": "likert", "desc": "Clear introduction."},
-                    {"name": "Open-ended questioning", "type": "likert", "desc": "Starts broad before narrowing."},
-                    {"name": "Empathy & Validation", "type": "likert", "desc": "Acknowledges patient emotion."},
-                    {"name": "No Medical Jargon", "type": "likert", "desc": "Uses lay terms."},
-                    {"name": "Closure & Teach-back", "type": "likert", "desc": "Ensures patient understanding."}
-                ]
-            }
-        }
+    Hands UI updates from worker threads to the Tk main loop.
     
-    @staticmethod
-    def get_rubrics_by_category():
-        """Organize rubrics by category for hierarchical display."""
-        rubrics = RubricManager.get_rubrics()
-        categories = {}
-        
-        for key, rubric in rubrics.items():
-            category = rubric.get("category", "Other")
-            if category not in categories:
-                categories[category] = []
-            categories[category].append((key, rubric))
-        
-        return categories
-
-class ErrorHandler:
-    """
-    Provides user-friendly error messages with actionable steps.
+    Workers never touch widgets: they publish updates under a key (e.g.
+    "status" or "progress") and the Tk side drains the bus every FRAME_MS,
+    applying only the latest update per key. However many jobs are in
+    flight, each frame costs at most one call per key. post() queues an
+    update that is never coalesced, for one-off events like a finished batch.
     """
-    @staticmethod
-    def format_error(error_type, error_details, is_fatal=False):
-        """
-        Format error messages in plain English with actionable steps.
-        
-        Args:
-            error_type: Type of error (e.g., "Video Upload Failed", "API Error")
-            error_details: Detailed error message
-            is_fatal: Whether this error requires abandoning the assessment
-        
-        Returns:
-            Formatted error message with steps to resolve
-        """
-        base_message = f"{error_type}\n\nDetails: {error_details}\n\n"
-        
-        if is_fatal:
-            base_message += "⚠️ FATAL ERROR: This assessment cannot be completed.\n\n"
-        else:
-            base_message += "ℹ️ This error may be recoverable. Please try the steps below.\n\n"
-        
-        # Error-specific guidance
-        if "404" in error_details or "not found" in error_details.lower():
-            return base_message + """HOW TO FIX:
-1. Check that your API key has access to the selected model
-2. Try switching to a different model (e.g., gemini-2.5-flash)
-3. Verify your API key is correct and active
-4. Check Google AI Studio for model availability status"""
-        
-        elif "403" in error_details or "permission" in error_details.lower() or "forbidden" in error_details.lower():
-            return base_message + """HOW TO FIX:
-1. Verify your API key has the necessary permissions
-2. Check your Google Cloud project billing status
-3. Ensure your API key hasn't been revoked
-4. Try regenerating your API key from Google AI Studio"""
-        
-        elif "401" in error_details or "invalid" in error_details.lower() or "unauthorized" in error_details.lower():
-            return base_message + """HOW TO FIX:
-1. Check that your API key is correct (no extra spaces)
-2. Verify the API key is from Google AI Studio (not Google Cloud)
-3. Try pasting the API key again
-4. Generate a new API key if needed"""
-        
-        elif "timeout" in error_details.lower() or "timed out" in error_details.lower():
-            return base_message + """HOW TO FIX:
-1. Check your internet connection
-2. The video may be too large - try a shorter video
-3. Wait a few minutes and try again
-4. Check Google AI service status"""
-        
-        elif "file" in error_details.lower() and ("not found" in error_details.lower() or "cannot" in error_details.lower()):
-            return base_message + """HOW TO FIX:
-1. Verify the video file still exists at the original location
-2. Check that you have read permissions for the file
-3. Ensure the file isn't open in another program
-4. Try selecting the file again"""
-        
-        elif "json" in error_details.lower() or "parse" in error_details.lower() or "extra data" in error_details.lower():
-            return base_message + """HOW TO FIX:
-1. This is usually a temporary AI response issue
-2. Try running the analysis again
-3. If it persists, try switching to a different model
-4. The video assessment may need to be abandoned if this continues"""
-        
-        elif "video processing failed" in error_details.lower() or "upload" in error_details.lower():
-            return base_message + """HOW TO FIX:
-1. Check that the video file is a valid format (MP4, MOV, AVI, MKV)
-2. Ensure the video file isn't corrupted
-3. Try converting the video to MP4 format
-4. Check file size - very large files may timeout"""
-        
-        elif "quota" in error_details.lower() or "limit" in error_details.lower() or "rate limit" in error_details.lower():
-            return base_message + """HOW TO FIX:
-1. You've reached your API usage limit
-2. Wait a few minutes before trying again
-3. Check your Google AI Studio quota limits
-4. Consider upgrading your API tier if needed"""
-        
-        else:
-            return base_message + """HOW TO FIX:
-1. Try running the analysis again
-2. Check your internet connection
-3. Verify your API key is valid
-4. If the error persists, try restarting the application
-5. Contact support if the problem continues"""
+    FRAME_MS = 50
 
-class ConfigManager:
-    """
-    Manages saving and loading configuration (API key).
-    """
-    CONFIG_FILE = "medvat_config.json"
-    
-    @staticmethod
-    def load_config():
-        """Load configuration from file."""
-        if os.path.exists(ConfigManager.CONFIG_FILE):
-            try:
-                with open(ConfigManager.CONFIG_FILE, 'r') as f:
-                    return json.load(f)
-            except Exception:
-                return {}
-        return {}
-    
-    @staticmethod
-    def save_config(config):
-        """Save configuration to file."""
-        try:
-            with open(ConfigManager.CONFIG_FILE, 'w') as f:
-                json.dump(config, f, indent=2)
-        except Exception as e:
-            print(f"Error saving config: {e}")
+    def __init__(self, widget):
+        self.widget = widget
+        self._lock = threading.Lock()
+        self._pending = {}  # key -> (fn, args), in order of latest publish
+        self._posted = 0
 
-class GeminiClient:
-    """
-    Handles the interaction with the Google Gemini API.
-    """
-    def __init__(self, api_key):
-        genai.configure(api_key=api_key)
-    
-    @staticmethod
-    def fetch_available_models(api_key):
-        """
-        Query the API for available models that support generateContent.
-        Returns (models_list, error_message)
-        """
-        # Safe fallback defaults
-        FALLBACK_MODELS = ["gemini-2.5-flash", "gemini-1.5-pro", "gemini-1.5-flash"]
-        
-        if not api_key:
-            print("[Model Discovery] No API key provided, using fallback models")
-            return FALLBACK_MODELS, None
-        
-        try:
-            genai.configure(api_key=api_key)
-            
-            # Query available models
-            print("[Model Discovery] Querying API for available models...")
-            models_iter = genai.list_models()
-            models_list = list(models_iter)
-            
-            if not models_list:
-                print("[Model Discovery] No models returned from API, using fallback")
-                return FALLBACK_MODELS, "No models returned from API"
-            
-            # Filter models that support generateContent
-            available_models = []
-            for model in models_list:
-                try:
-                    # Safely access supported_generation_methods attribute
-                    supported_methods = getattr(model, 'supported_generation_methods', [])
-                    
-                    # Check if model supports generateContent method
-                    if supported_methods and 'generateContent' in supported_methods:
-                        model_name = getattr(model, 'name', '')
-                        # Extract just the model name (remove 'models/' prefix if present)
-                        if '/' in model_name:
-                            model_name = model_name.split('/')[-1]
-                        if model_name:
-                            available_models.append(model_name)
-                            print(f"[Model Discovery] Found: {model_name}")
-                except Exception as e:
-                    print(f"[Model Discovery] Error processing model: {e}")
-                    continue
-            
-            if available_models:
-                print(f"[Model Discovery] Success! Found {len(available_models)} models with generateContent support:")
-                for model in available_models:
-                    print(f"  - {model}")
-                return available_models, None
-            else:
-                print("[Model Discovery] No models found with generateContent support, using fallback")
-                return FALLBACK_MODELS, "No models found with generateContent support"
-                
-        except Exception as e:
-            error_msg = str(e)
-            print(f"[Model Discovery] Error querying models: {error_msg}")
-            print(f"[Model Discovery] Falling back to default models: {FALLBACK_MODELS}")
-            
-            # Check for specific error types
-            if "401" in error_msg or "invalid" in error_msg.lower() or "unauthorized" in error_msg.lower():
-                return FALLBACK_MODELS, "Invalid API key"
-            elif "403" in error_msg or "permission" in error_msg.lower():
-                return FALLBACK_MODELS, "API key lacks permission to list models"
-            else:
-                return FALLBACK_MODELS, f"API error: {error_msg[:100]}"
-    
-    @staticmethod
-    def check_model_availability(api_key, model_name):
-        """
-        Ping the model to check if it's available with the given API key.
-        Returns (is_available, error_message)
-        """
-        try:
-            genai.configure(api_key=api_key)
-            model = genai.GenerativeModel(model_name=model_name)
-            # Simple test prompt to verify model access
-            response = model.generate_content(
-                "Say 'OK'",
-                request_options={"timeout": 10}
-            )
-            return True, None
-        except Exception as e:
-            error_msg = str(e)
-            # Check for common error patterns
-            if "404" in error_msg or "not found" in error_msg.lower():
-                return False, f"Model {model_name} not available (404)"
-            elif "403" in error_msg or "permission" in error_msg.lower():
-                return False, f"API key lacks access to {model_name}"
-            elif "401" in error_msg or "invalid" in error_msg.lower():
-                return False, "Invalid API key"
-            else:
-                return False, f"Error: {error_msg[:100]}"
+    def publish(self, key, fn, *args):
+        """Replace any pending update with the same key. Safe from any thread."""
+        with self._lock:
+            self._pending.pop(key, None)
+            self._pending[key] = (fn, args)
 
-    def analyze_video(self, video_path, rubric_data, progress_callback, model_name="gemini-2.5-flash", auto_detect_pattern=False, api_key=None):
-        try:
-            if api_key:
-                genai.configure(api_key=api_key)
-            
-            # 1. Upload File
-            progress_callback("Uploading video to Gemini...", 0.1)
-            try:
-                # Check if file exists
-                if not os.path.exists(video_path):
-                    error_msg = ErrorHandler.format_error(
-                        "Video File Not Found",
-                        f"The video file could not be found at: {video_path}",
-                        is_fatal=True
-                    )
-                    return {"error": error_msg, "fatal": True}
-                
-                # Check file size (warn if very large)
-                file_size_mb = os.path.getsize(video_path) / (1024 * 1024)
-                if file_size_mb > 100:
-                    print(f"Warning: Large video file ({file_size_mb:.1f} MB) may take longer to process")
-                
-                video_file = genai.upload_file(path=video_path)
-            except FileNotFoundError:
-                error_msg = ErrorHandler.format_error(
-                    "Video File Not Found",
-                    f"The video file could not be found. It may have been moved or deleted.",
-                    is_fatal=True
-                )
-                return {"error": error_msg, "fatal": True}
-            except PermissionError:
-                error_msg = ErrorHandler.format_error(
-                    "File Access Denied",
-                    f"You don't have permission to read the video file. Check file permissions.",
-                    is_fatal=True
-                )
-                return {"error": error_msg, "fatal": True}
-            except Exception as e:
-                error_msg = ErrorHandler.format_error(
-                    "Video Upload Failed",
-                    f"Could not upload video file: {str(e)}",
-                    is_fatal=True
-                )
-                return {"error": error_msg, "fatal": True}
-            
-            # 2. Wait for Processing
-            progress_callback("Processing video (this may take a moment)...", 0.3)
-            max_wait_time = 300  # 5 minutes max wait
-            wait_time = 0
-            while video_file.state.name == "PROCESSING":
-                if wait_time >= max_wait_time:
-                    error_msg = ErrorHandler.format_error(
-                        "Video Processing Timeout",
-                        "The video processing took too long. This may be due to a very large file or server issues.",
-                        is_fatal=True
-                    )
-                    try:
-                        genai.delete_file(video_file.name)
-                    except:
-                        pass
-                    return {"error": error_msg, "fatal": True}
-                time.sleep(2)
-                wait_time += 2
-                try:
-                    video_file = genai.get_file(video_file.name)
-                except Exception as e:
-                    error_msg = ErrorHandler.format_error(
-                        "Video Processing Error",
-                        f"Error checking video processing status: {str(e)}",
-                        is_fatal=True
-                    )
-                    return {"error": error_msg, "fatal": True}
-            
-            if video_file.state.name == "FAILED":
-                error_msg = ErrorHandler.format_error(
-                    "Video Processing Failed",
-                    "Google's servers could not process your video file. This may be due to file format, corruption, or size issues.",
-                    is_fatal=True
-                )
-                return {"error": error_msg, "fatal": True}
-            
-            # 2.5. Auto-detect suturing pattern if needed
-            detected_pattern = None
-            if auto_detect_pattern:
-                progress_callback("Detecting suturing pattern...", 0.4)
-                detected_pattern = GeminiClient._detect_suturing_pattern(video_file, model_name, api_key)
-                if detected_pattern:
-                    # Update rubric_data with detected pattern's rubric
-                    all_rubrics = RubricManager.get_rubrics()
-                    pattern_key = f"Suturing: {detected_pattern}"
-                    if pattern_key in all_rubrics:
-                        rubric_data = all_rubrics[pattern_key]
-                        progress_callback(f"Detected pattern: {detected_pattern}", 0.5)
-                    else:
-                        progress_callback("Pattern detection inconclusive, using generic rubric", 0.5)
-                else:
-                    progress_callback("Pattern detection inconclusive, using generic rubric", 0.5)
-            
-            # 3. Construct Prompt
-            progress_callback(f"Analyzing content against rubric using {model_name}...", 0.6)
-            
-            rubric_text = json.dumps(rubric_data, indent=2)
-            rubric_title = rubric_data.get('title', '')
-            
-            # Build rubric-specific instructions based on procedure type
-            special_instructions = ""
-            
-            if "Chest Tube" in rubric_title:
-                special_instructions = """
-                
-                CRITICAL ASSESSMENT DIRECTIVE: PATIENT IMPACT & FINESSE
-                
-                You must evaluate not just *if* a step was done, but *how* it was done, with a specific focus on patient trauma and pain.
-                
-                1. **Dissection Finesse (The "One-Pass" Rule):**
-                   - **Ideal:** The practitioner should spread the intercostal muscles firmly and decisively in 1-2 motions to create the track.
-                   - **Red Flag (Pain/Trauma):** Watch closely for "pecking," "searching," or repetitive small spreading motions with the Kelly clamp deep in the tissue.
-                   - **Assessment Impact:** If you see multiple (>3) separate spreading maneuvers at the same depth, you must downgrade "Economy of Motion" and flag "Dissects with gentle pressure" as a potential failure due to excessive trauma, even if they eventually enter the pleura.
-                   - **Rationale:** Repeated spreading of the intercostal muscles is excruciatingly painful for a conscious patient and increases the risk of intercostal nerve injury.
-                
-                2. **Economy of Motion as a Proxy for Competence:**
-                   - Do not rate "Economy of Motion" highly just because the student is moving quickly.
-                   - Look for *purposeful* movement. Fumbling with the suture, losing the tail, or repeatedly picking up/putting down instruments are signs of cognitive load overload and should lower the score.
-                   - Watch the blunt dissection closely. Count the number of spreading maneuvers.
-                   - Ideal technique is 'push, spread, advance.' Repetitive 'pecking' is incorrect.
-                   - Flag any motion that looks like it would cause unnecessary pain in a conscious patient.
-                
-                3. **Holistic Impact:**
-                   - If a step is technically completed (e.g., the tube goes in) but the technique was traumatic (excessive force, repetitive spreading), the specific step (e.g., "Enters pleura") should be marked as **"No"** or **"Marginal,"** and the feedback must explicitly mention "patient pain" or "excessive tissue trauma."
-                
-                CALIBRATION UPDATE: THE "NOVICE CURVE"
-                
-                You are evaluating a resident in training. Be critical of technique, but pragmatic about scoring.
-                
-                1. **The "Pecking" Rule:**
-                   - Repetitive "pecking" or small spreading motions during dissection are common in novices.
-                   - **Scoring:** If the dissection remains safely over the rib and enters the pleura without damaging surrounding structures, mark the step as **"YES"** (Pass).
-                   - **Feedback:** Do NOT fail the step solely for pecking. Instead, use the "Feedback" box to strongly critique the inefficiency and mention the potential for increased patient pain.
-                   - **Fail Criteria:** Only mark "No" if the motion creates a false track, slips off the rib dangerously, or is violent/uncontrolled.
-                
-                2. **Proficiency Threshold:**
-                   - A student can demonstrate "Proficiency" (Pass) even with imperfect economy of motion.
-                   - Proficiency means "Safe to perform under supervision," not "Master surgeon."
-                   - If the tube is in safely and secured, lean towards a "Yes" on proficiency unless a critical safety violation occurred.
-                
-                """
-            elif "Suturing" in rubric_title:
-                special_instructions = """
-                
-                CRITICAL ASSESSMENT DIRECTIVE: PATIENT IMPACT & FINESSE
-                
-                You must evaluate not just *if* a step was done, but *how* it was done, with a specific focus on patient trauma and tissue handling.
-                
-                1. **Tissue Handling Finesse:**
-                   - Watch for excessive force or repeated grasping of tissue with forceps, which causes trauma.
-                   - Multiple attempts to grasp the same tissue indicate poor technique and should lower scores.
-                   - Look for signs of crushing or tearing tissue during manipulation.
-                
-                2. **Economy of Motion:**
-                   - Do not rate "Economy of Motion" highly just because the student is moving quickly.
-                   - Look for *purposeful* movement. Dropping instruments, fumbling with sutures, or repeatedly adjusting position are signs of inefficiency and should lower the score.
-                   - Each motion should have clear intent and contribute to progress.
-                
-                3. **Holistic Impact:**
-                   - If sutures are placed but tissue handling was traumatic (excessive force, repeated grasping), mark "Gentle tissue handling" as low and explicitly mention "patient trauma" or "tissue damage" in feedback.
-                
-                CALIBRATION DIRECTIVE: DISTINGUISHING "CLUMSY" FROM "UNSAFE"
-                
-                You are evaluating a *novice resident*, not an expert surgeon. You must distinguish between "inefficient/clumsy" (which is acceptable for a pass) and "dangerous/traumatic" (which is a fail).
-                
-                1. **The "Good Enough" Standard:**
-                   - If the student achieves the clinical goal (e.g., places sutures correctly, closes wound) but takes 2-3 extra attempts or looks stiff/hesitant, mark the step as **"Pass"** (score 3-4 for likert, "Yes" for binary) but note the inefficiency in the feedback.
-                   - Only mark a step as **"Fail"** (score 1-2 for likert, "No" for binary) if the action was *ineffective* (sutures don't hold, wound doesn't close) or *dangerous* (visible tissue damage, excessive bleeding from technique).
-                
-                2. **Evaluating "Clumsiness" vs. "Trauma":**
-                   - Multiple attempts to grasp tissue or place a suture is inefficient but not automatically a failure unless it causes visible tissue damage or is excessive (>5-6 attempts for the same action).
-                   - If they fumble but eventually place sutures correctly without causing harm, score as **"Pass"** but downgrade "Economy of Motion" and "Gentle tissue handling" scores.
-                
-                3. **Holistic Proficiency:**
-                   - A student can be "Proficient" (score 3-4) even with poor economy of motion, provided they are safe and achieve the clinical goal. Do not fail the entire procedure solely for slowness, stiffness, or minor inefficiencies.
-                
-                """
-            elif "Patient Encounter" in rubric_title or "SP" in rubric_title:
-                special_instructions = """
-                
-                CRITICAL ASSESSMENT DIRECTIVE: PATIENT EXPERIENCE & COMMUNICATION
-                
-                You must evaluate not just *if* communication occurred, but *how* it impacted the patient experience.
-                
-                1. **Empathy & Validation:**
-                   - Look for genuine acknowledgment of patient emotions, not just perfunctory responses.
-                   - Watch for non-verbal cues that show the practitioner is truly listening and responding to patient concerns.
-                
-                2. **Communication Efficiency:**
-                   - Do not rate highly just because questions were asked quickly.
-                   - Look for *purposeful* communication that builds rapport and gathers necessary information without causing patient distress.
-                   - Repetitive questioning or asking the same thing multiple ways indicates poor communication skills.
-                
-                3. **Holistic Impact:**
-                   - If communication occurred but the patient appeared uncomfortable, anxious, or confused, mark relevant items lower and explicitly mention "patient distress" or "communication breakdown" in feedback.
-                
-                """
-            else:
-                # Generic patient-focused instructions for other procedures
-                special_instructions = """
-                
-                CRITICAL ASSESSMENT DIRECTIVE: PATIENT IMPACT & FINESSE
-                
-                You must evaluate not just *if* steps were completed, but *how* they were performed, with a specific focus on patient safety, comfort, and tissue trauma.
-                
-                1. **Technique Finesse:**
-                   - Watch for signs of excessive force, repetitive unnecessary motions, or fumbling that could cause patient discomfort or trauma.
-                   - Multiple attempts to complete the same step indicate poor technique and should lower scores.
-                
-                2. **Economy of Motion:**
-                   - Do not rate "Economy of Motion" highly just because the student is moving quickly.
-                   - Look for *purposeful* movement. Dropping instruments, fumbling, or repeatedly adjusting position are signs of inefficiency and should lower the score.
-                
-                3. **Holistic Impact:**
-                   - If steps are technically completed but the technique was traumatic or inefficient, mark relevant items lower and explicitly mention "patient trauma," "excessive force," or "inefficient technique" in feedback.
-                
-                CALIBRATION DIRECTIVE: DISTINGUISHING "CLUMSY" FROM "UNSAFE"
-                
-                You are evaluating a *novice resident*, not an expert surgeon. You must distinguish between "inefficient/clumsy" (which is acceptable for a pass) and "dangerous/traumatic" (which is a fail).
-                
-                1. **The "Good Enough" Standard:**
-                   - If the student achieves the clinical goal but takes 2-3 extra attempts or looks stiff/hesitant, mark the step as **"Pass"** (score 3-4 for likert, "Yes" for binary) but note the inefficiency in the feedback.
-                   - Only mark a step as **"Fail"** (score 1-2 for likert, "No" for binary) if the action was *ineffective* (didn't achieve the goal) or *dangerous* (risked patient harm).
-                
-                2. **Evaluating Inefficiency vs. Danger:**
-                   - Multiple attempts or fumbling is inefficient but not automatically a failure unless it causes harm or is excessive (>5-6 attempts for the same action).
-                   - If they eventually complete the step safely and effectively, score as **"Pass"** but downgrade efficiency-related scores.
-                
-                3. **Holistic Proficiency:**
-                   - A student can be "Proficient" (score 3-4) even with poor economy of motion, provided they are safe and achieve the clinical goal. Do not fail the entire procedure solely for slowness, stiffness, or minor inefficiencies.
-                
-                """
-            
-            prompt = f"""
-            You are an expert medical evaluator. Watch the attached video and assess the performance based strictly on the following rubric.
-            
-            Your goal is to provide feedback that a student can verify. If you claim they 'pecked' during dissection, tell them exactly when it happened so they can watch the video and see it themselves.
-            
-            RUBRIC DEFINITION:
-            
-            {rubric_text}
-            
-            {special_instructions}
-            
-            INSTRUCTIONS:
-            
-            1. Provide a score for each item.
-               - For 'likert' type: Score 1 (Novice) to 5 (Expert).
-               - For 'binary' type: Score 1 (Yes/Done) or 0 (No/Not Done).
-               - **CRITICAL:** Evaluate not just whether steps were completed, but HOW they were performed. Consider patient trauma, pain, and tissue damage in your scoring.
-               - **CALIBRATION:** Remember you are evaluating a novice resident. Distinguish between "inefficient/clumsy" (acceptable for pass, score 3-4) and "dangerous/traumatic" (fail, score 1-2). If the clinical goal is achieved safely, even with inefficiency, mark as Pass but note inefficiency in feedback.
-            
-            2. **GENERAL SAFETY DIRECTIVE: INSTRUMENT HYGIENE & SAFETY**
-               - Regardless of the specific procedure, you must continuously monitor for 'Instrument Hygiene' violations. If any of the following occur, you must flag them immediately in the commentary and potentially fail the relevant step or the entire proficiency rating if the action is dangerous.
-               
-               a. **Inappropriate Dual-Use:**
-                  - Instruments must only be used for their intended purpose.
-                  - **CRITICAL FAIL:** Using an instrument to dissect, cut, or spread tissue while it is *simultaneously* holding another object (e.g., a tube, a needle, or gauze). This blunts the instrument, crushes the object, and risks uncontrolled trauma.
-                  - **Example:** Dissecting with a Kelly clamp while it is gripping a chest tube.
-               
-               b. **Uncontrolled Sharps:**
-                  - Watch for needles or scalpels being waved in the air, left on the patient drape, or handled with fingers instead of instruments (unless appropriate).
-                  - **Flag:** Ideally, sharps should be "parked" safely or handed off immediately after use.
-               c. **Loss of Tension/Control:**
-                  - Watch for instruments slipping, requiring repeated re-grasping, or being used with a loose grip that allows the tip to wander.
-                  - **Comment:** Note any "fumbling" or "resetting" of the grip as an efficiency issue.
-               
-               **If a Critical Fail (Rule 2a - Inappropriate Dual-Use) is observed:**
-                  - Mark the relevant step (e.g., "Grasps tube" or "Dissects") as **"No"**.
-                  - Mark "Proficiency" (if present) as **"No"**.
-                  - In the feedback, use the phrase: **"CRITICAL SAFETY VIOLATION: Instrument Hygiene."**
-            
-            3. Provide 'actionable_advice' for every single item based on visual evidence.
-               - **MANDATORY:** If you observe signs of patient trauma, excessive force, repetitive unnecessary motions, or inefficiency, you MUST explicitly mention these in your advice.
-               - **CALIBRATION:** When noting inefficiency (multiple attempts, fumbling), distinguish between "needs improvement" (for clumsy but safe technique) and "critical error" (for dangerous technique). Provide constructive feedback that helps the resident improve.
-               - Focus on specific techniques that would reduce patient discomfort and improve outcomes.
-            
-            4. Provide a 'summative_comment' for the whole procedure.
-               - Include an assessment of overall patient impact and technique finesse.
-               - **CALIBRATION:** Acknowledge that novice residents may be slow or clumsy but still proficient if they are safe and achieve the clinical goal. Only fail if there are safety concerns or the procedure was ineffective.
-               - Highlight any concerns about patient trauma or inefficient technique, but frame them appropriately for a learning context.
-            
-            5. **MANDATORY TIMESTAMP REQUIREMENT:**
-               - For any criterion where the score indicates poor performance (e.g., 'No' for binary, or <=3 for Likert), you MUST provide a specific timestamp (MM:SS format) in the 'advice' field citing exactly where the error or inefficient behavior occurred.
-               - Example format: "[01:15] The student fumbled the needle driver..."
-               - Example format: "[02:32] You performed 5 small spreading motions here instead of one decisive spread..."
-               - If multiple issues occur at different times, include multiple timestamps: "[01:15] First issue... [02:30] Second issue..."
-               - This makes feedback verifiable and actionable. A student can watch the video at that timestamp and see exactly what you're referring to.
-               - Note: Scores of 4-5 (Likert) or 'Yes' (binary) do not require timestamps unless there are specific improvement suggestions.
-            
-            OUTPUT FORMAT:
-            
-            Return ONLY valid JSON. Do not use Markdown code blocks. The JSON must match this structure:
-            
-            {{
-                "assessments": [
-                    {{ "name": "Criterion Name", "score": 3, "advice": "[01:15] Observation and advice with timestamp..." }},
-                    ...
-                ],
-                "summative_comment": "Overall feedback..."
-            }}
-            
-            **CRITICAL:** Every 'advice' field for scores indicating poor performance (binary 'No' or Likert <=3) MUST include at least one timestamp in [MM:SS] format. This is mandatory for verifiable feedback.
-            """
+    def post(self, fn, *args):
+        """Queue an update that always runs. Safe from any thread."""
+        with self._lock:
+            self._posted += 1
+            self._pending[("post", self._posted)] = (fn, args)
 
-            # 4. Generate Content
-            try:
-                model = genai.GenerativeModel(model_name=model_name)
-                response = model.generate_content(
-                    [video_file, prompt],
-                    request_options={"timeout": 600}
-                )
-            except Exception as e:
-                error_str = str(e)
-                # Cleanup uploaded file before returning error
-                try:
-                    genai.delete_file(video_file.name)
-                except:
-                    pass
-                
-                # Determine if fatal
-                is_fatal = False
-                if "404" in error_str or "not found" in error_str.lower():
-                    is_fatal = True
-                elif "403" in error_str or "permission" in error_str.lower():
-                    is_fatal = True
-                elif "401" in error_str or "invalid" in error_str.lower():
-                    is_fatal = True
-                
-                error_msg = ErrorHandler.format_error(
-                    "AI Analysis Failed",
-                    error_str,
-                    is_fatal=is_fatal
-                )
-                return {"error": error_msg, "fatal": is_fatal}
-            
-            # 5. Cleanup
+    def start(self):
+        self.widget.after(UIUpdateBus.FRAME_MS, self._drain)
+
+    def _drain(self):
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+        for fn, args in pending.values():
             try:
-                genai.delete_file(video_file.name)
+                fn(*args)
             except Exception as e:
-                print(f"Warning: Could not delete uploaded file: {e}")
-            
-            progress_callback("Analysis Complete.", 1.0)
-            
-            # Parse JSON (Strip markdown if present)
-            text = response.text.strip()
-            
-            # Remove markdown code blocks if present
-            if text.startswith("```json"):
-                text = text[7:]
-            if text.startswith("```"):
-                text = text[3:]
-            if text.endswith("```"):
-                text = text[:-3]
-            text = text.strip()
-            
-            # Try to extract JSON if there's extra content
-            try:
-                # First try parsing directly
-                return json.loads(text)
-            except json.JSONDecodeError as e:
-                # If there's extra data, try to extract just the JSON object
-                if "Extra data" in str(e) or e.pos:
-                    # Find the first complete JSON object
-                    try:
-                        # Try to find JSON object boundaries
-                        start_idx = text.find('{')
-                        if start_idx != -1:
-                            # Find matching closing brace
-                            brace_count = 0
-                            end_idx = start_idx
-                            for i in range(start_idx, len(text)):
-                                if text[i] == '{':
-                                    brace_count += 1
-                                elif text[i] == '}':
-                                    brace_count -= 1
-                                    if brace_count == 0:
-                                        end_idx = i + 1
-                                        break
-                            
-                            if end_idx > start_idx:
-                                json_text = text[start_idx:end_idx]
-                                return json.loads(json_text)
-                    except:
-                        pass
-                
-                # If all else fails, return error with helpful message
-                error_msg = ErrorHandler.format_error(
-                    "AI Response Parsing Error",
-                    f"The AI returned a response that couldn't be parsed as JSON. This is usually a temporary issue. Error: {str(e)}",
-                    is_fatal=False
-                )
-                return {"error": error_msg, "fatal": False}
-        except Exception as e:
-            error_msg = ErrorHandler.format_error(
-                "Unexpected Analysis Error",
-                f"An unexpected error occurred during video analysis: {str(e)}",
-                is_fatal=True
-            )
-            return {"error": error_msg, "fatal": True}
-    
-    @staticmethod
-    def _detect_suturing_pattern(video_file, model_name, api_key=None):
-        """
-        Detect which suturing pattern is being used in the video.
-        Returns: "Simple Interrupted", "Vertical Mattress", "Subcuticular", or None
-        """
-        try:
-            if api_key:
-                genai.configure(api_key=api_key)
-            model = genai.GenerativeModel(model_name=model_name)
-            
-            detection_prompt = """
-            Watch this surgical video and identify which suturing technique is being used.
-            
-            Possible techniques:
-            1. Simple Interrupted - Individual separate stitches, each tied independently
-            2. Vertical Mattress - Deep and superficial bites creating a vertical pattern, often with visible eversion
-            3. Subcuticular - Continuous running suture beneath the skin surface, minimal visible suture material
-            
-            Respond with ONLY one of these exact strings:
-            - "Simple Interrupted"
-            - "Vertical Mattress"  
-            - "Subcuticular"
-            - "Unknown" (if you cannot determine)
-            
-            Do not provide any explanation, just the technique name.
-            """
-            
-            response = model.generate_content(
-                [video_file, detection_prompt],
-                request_options={"timeout": 60}
-            )
-            
-            detected = response.text.strip()
-            # Clean up any markdown or extra text
-            detected = detected.replace("```", "").strip()
-            
-            valid_patterns = ["Simple Interrupted", "Vertical Mattress", "Subcuticular"]
-            for pattern in valid_patterns:
-                if pattern.lower() in detected.lower():
-                    return pattern
-            
-            return None
-        except Exception as e:
-            print(f"[Pattern Detection] Error: {e}")
-            return None
+                print(f"[UI] Update failed: {e}")
+        self.widget.after(UIUpdateBus.FRAME_MS, self._drain)
 
 class AssessmentPanel(ctk.CTkScrollableFrame):
     """
     The right-hand panel that displays the form.
+    
+    The form is a view of an AssessmentModel: results are applied to the
+    bound model and shown from it, and edits are read back into it by
+    get_data().
+    
+    Built forms are kept per rubric key, so switching back to a rubric only
+    re-packs its frame. Item rows are created lazily: the first few right
+    away, the rest in small batches as the view scrolls towards them.
     """
+    INITIAL_ROWS = 8
+    ROW_BATCH = 6
+    PRELOAD_FRACTION = 0.15  # Build more rows once the view is this close to the end
+    MAX_CACHED_FORMS = 12
+
     def __init__(self, parent):
         super().__init__(parent, label_text="Assessment Results")
+        self.forms = {}  # rubric key -> form state, least recently used first
+        self.form = None
         self.vars = {}
         self.comments = {}
         self.rubric_structure = []
+        self.summative_box = None
+        self.model = None
+        self._rows_scheduled = False
+        
+        # Watch scrolling to build rows on demand; without the scrollable
+        # frame's canvas, build the remaining rows in idle-time batches instead
+        self._lazy_scroll = hasattr(self, "_parent_canvas") and hasattr(self, "_scrollbar")
+        if self._lazy_scroll:
+            self._parent_canvas.configure(yscrollcommand=self._on_scroll)
 
-    def build_form(self, rubric_data):
-        # Clear old widgets
-        for widget in self.winfo_children():
-            widget.destroy()
-        self.vars = {}
-        self.comments = {}
-        self.rubric_structure = rubric_data['items']
+    def build_form(self, rubric_data, key=None):
+        """Show the form for a rubric, reusing it if it was built before."""
+        key = key or rubric_data['title']
+        if self.form is not None:
+            self.form["frame"].pack_forget()
+        
+        form = self.forms.pop(key, None)
+        if form is None:
+            form = self._new_form(rubric_data)
+        self.forms[key] = form
+        self._evict_forms()
+        
+        form["frame"].pack(fill="x")
+        self.form = form
+        self.vars = form["vars"]
+        self.comments = form["comments"]
+        self.rubric_structure = form["items"]
+        self.summative_box = form["summative_box"]
+        self.bind_model(AssessmentModel(rubric_data))
+        
+        if self._lazy_scroll:
+            self._parent_canvas.yview_moveto(0)
+        else:
+            self._schedule_more_rows()
+
+    def forget_form(self, key):
+        """Destroy a cached form (it is rebuilt on next use)."""
+        form = self.forms.pop(key, None)
+        if form is None:
+            return
+        if form is self.form:
+            self.form = None
+        form["frame"].destroy()
+
+    def _evict_forms(self):
+        while len(self.forms) > AssessmentPanel.MAX_CACHED_FORMS:
+            self.forget_form(next(iter(self.forms)))
+
+    def _new_form(self, rubric_data):
+        frame = ctk.CTkFrame(self, fg_color="transparent")
+        rows_frame = ctk.CTkFrame(frame, fg_color="transparent")
+        rows_frame.pack(fill="x")
         
-        for i, item in enumerate(self.rubric_structure):
+        # Summative
+        ctk.CTkLabel(frame, text="Holistic Summative Comment", font=("Arial", 16, "bold")).pack(pady=(20,5), anchor="w")
+        summative_box = ctk.CTkTextbox(frame, height=120)
+        summative_box.pack(fill="x", pady=5)
+        
+        form = {
+            "frame": frame,
+            "rows_frame": rows_frame,
+            "items": rubric_data['items'],
+            "vars": {},
+            "comments": {},
+            "summative_box": summative_box,
+            "built": 0
+        }
+        self._build_rows(form, AssessmentPanel.INITIAL_ROWS)
+        return form
+
+    def _build_rows(self, form, count):
+        start = form["built"]
+        end = min(len(form["items"]), start + count)
+        for i in range(start, end):
+            item = form["items"][i]
             # Container
-            frame = ctk.CTkFrame(self, fg_color="transparent")
+            frame = ctk.CTkFrame(form["rows_frame"], fg_color="transparent")
             frame.pack(fill="x", pady=10)
             
             # Header
@@ -827,78 +170,104 @@ class AssessmentPanel(ctk.CTkScrollableFrame):
             
             # Controls
             if item['type'] == 'binary':
-                var = ctk.StringVar(value="No")
+                var = ctk.StringVar(value=AssessmentModel.BINARY_DEFAULT)
                 seg = ctk.CTkSegmentedButton(frame, values=["Yes", "No"], variable=var)
                 seg.pack(fill="x", pady=5)
-                self.vars[item['name']] = var
             else:
-                var = ctk.IntVar(value=3)
+                var = ctk.IntVar(value=AssessmentModel.LIKERT_DEFAULT)
                 slider_row = ctk.CTkFrame(frame, fg_color="transparent")
                 slider_row.pack(fill="x")
                 
-                lbl_score = ctk.CTkLabel(slider_row, text="Score: 3/5", width=60)
+                lbl_score = ctk.CTkLabel(slider_row, text=f"Score: {AssessmentModel.LIKERT_DEFAULT}/5", width=60)
                 lbl_score.pack(side="right")
                 
-                def update_lbl(val, l=lbl_score):
-                    l.configure(text=f"Score: {int(val)}/5")
+                # Follow programmatic changes (results, rubric switches) as well as drags
+                def update_lbl(*_, l=lbl_score, v=var):
+                    l.configure(text=f"Score: {int(v.get())}/5")
+                var.trace_add("write", update_lbl)
                 
-                slider = ctk.CTkSlider(slider_row, from_=1, to=5, number_of_steps=4, variable=var, command=update_lbl)
+                slider = ctk.CTkSlider(slider_row, from_=1, to=5, number_of_steps=4, variable=var)
                 slider.pack(side="left", fill="x", expand=True)
-                self.vars[item['name']] = var
+            form["vars"][item['name']] = var
             
             # AI Feedback Box
             fb = ctk.CTkTextbox(frame, height=60, text_color="#DCE4EE")
             fb.pack(fill="x", pady=(5,0))
-            self.comments[item['name']] = fb
-        
-        # Summative
-        ctk.CTkLabel(self, text="Holistic Summative Comment", font=("Arial", 16, "bold")).pack(pady=(20,5), anchor="w")
-        self.summative_box = ctk.CTkTextbox(self, height=120)
-        self.summative_box.pack(fill="x", pady=5)
+            form["comments"][item['name']] = fb
+            
+            if form is self.form and self.model is not None:
+                self._show_item(item['name'])
+        form["built"] = end
+
+    def _on_scroll(self, first, last):
+        self._scrollbar.set(first, last)
+        if float(last) >= 1 - AssessmentPanel.PRELOAD_FRACTION:
+            self._schedule_more_rows()
+
+    def _schedule_more_rows(self):
+        form = self.form
+        if form is None or form["built"] >= len(form["items"]) or self._rows_scheduled:
+            return
+        self._rows_scheduled = True
+        self.after_idle(self._build_more_rows)
+
+    def _build_more_rows(self):
+        self._rows_scheduled = False
+        if self.form is None:
+            return
+        self._build_rows(self.form, AssessmentPanel.ROW_BATCH)
+        if not self._lazy_scroll:
+            self._schedule_more_rows()
+
+    def bind_model(self, model):
+        """Show a model (for the rubric the form was built for)."""
+        self.model = model
+        for name in self.vars:
+            self._show_item(name)
+        self.summative_box.delete("0.0", "end")
+        self.summative_box.insert("0.0", model.summative)
+
+    def _show_item(self, name):
+        if name not in self.vars:
+            return  # Row not built yet; it reads the model when it is
+        self.vars[name].set(self.model.scores[name])
+        self.comments[name].delete("0.0", "end")
+        self.comments[name].insert("0.0", self.model.feedback[name])
 
     def populate_from_ai(self, ai_data):
         if "error" in ai_data:
             # Error messages are already formatted by ErrorHandler
             # Don't show another dialog here - let finish_analysis handle it
             return
-        
-        # Map list to dict for easy lookup
-        ai_map = {item['name']: item for item in ai_data.get('assessments', [])}
-        
-        for item in self.rubric_structure:
-            name = item['name']
-            if name in ai_map:
-                # Set Score
-                if item['type'] == 'binary':
-                    val = "Yes" if ai_map[name]['score'] >= 1 else "No"
-                    self.vars[name].set(val)
-                else:
-                    self.vars[name].set(ai_map[name]['score'])
-                
-                # Set Comment
-                self.comments[name].delete("0.0", "end")
-                self.comments[name].insert("0.0", ai_map[name].get('advice', ''))
-        
-        # Set Summative
-        self.summative_box.delete("0.0", "end")
-        self.summative_box.insert("0.0", ai_data.get('summative_comment', ''))
+        self.bind_model(AssessmentModel.from_result(self.model.rubric, ai_data))
+
+    def update_item(self, ai_item):
+        """Show one criterion's score and advice, e.g. as it streams in."""
+        name = self.model.apply(ai_item)
+        if name is not None:
+            self._show_item(name)
 
     def get_data(self):
-        results = []
-        for item in self.rubric_structure:
-            name = item['name']
-            results.append({
-                "Criterion": name,
-                "Score": self.vars[name].get(),
-                "Feedback": self.comments[name].get("0.0", "end-1c")
-            })
-        return results, self.summative_box.get("0.0", "end-1c")
+        """Read edits back into the model and return its rows and summative comment."""
+        for name, var in self.vars.items():
+            # Rows that were never built can't have been edited
+            self.model.set_score(name, var.get())
+            self.model.set_feedback(name, self.comments[name].get("0.0", "end-1c"))
+        self.model.summative = self.summative_box.get("0.0", "end-1c")
+        return self.model.rows()
 
 class MedVATApp(ctk.CTk):
+    # A model list refresh at startup waits until the window has been drawn and sat idle this long
+    STARTUP_DISCOVERY_DELAY_MS = 1500
+    API_KEY_DEBOUNCE_MS = 1000  # Save the key and look up models once typing pauses
+
     def __init__(self):
         super().__init__()
         self.title("MedVAT - AI Surgical Assessment")
         self.geometry("1100x800")
+        # Worker threads publish UI updates here; the Tk thread applies them
+        self.ui_bus = UIUpdateBus(self)
+        self.ui_bus.start()
         self.selected_video_path = None
         self.rubrics = RubricManager.get_rubrics()
         self.rubrics_by_category = RubricManager.get_rubrics_by_category()
@@ -906,6 +275,7 @@ class MedVATApp(ctk.CTk):
         self.selected_model = None  # Will be set after model discovery
         self.available_models = []  # Will be populated dynamically
         self.detected_suturing_pattern = None  # For auto-detection
+        self.extra_rubric_keys = []  # Additional rubrics assessed in the same job
         
         # Layout
         self.grid_columnconfigure(1, weight=1)
@@ -977,6 +347,25 @@ class MedVATApp(ctk.CTk):
         )
         self.subcategory_menu.pack(padx=20, fill="x")
         
+        # Extra rubrics assessed from the same upload
+        self.btn_extra_rubrics = ctk.CTkButton(
+            self.sidebar,
+            text="Also assess with...",
+            command=self.select_extra_rubrics,
+            fg_color="transparent",
+            border_width=1,
+            height=24
+        )
+        self.btn_extra_rubrics.pack(padx=20, pady=(5, 0), fill="x")
+        
+        # Cached results are reused unless the user asks for a fresh run
+        self.force_refresh_var = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(
+            self.sidebar,
+            text="Ignore cached results",
+            variable=self.force_refresh_var
+        ).pack(padx=20, pady=(5, 0), anchor="w")
+        
         # Initialize subcategory dropdown
         self.update_subcategory_menu()
         
@@ -991,6 +380,15 @@ class MedVATApp(ctk.CTk):
         self.btn_batch = ctk.CTkButton(file_frame, text="Batch", command=self.select_batch_files, fg_color="#8B5CF6", width=80)
         self.btn_batch.pack(side="right")
         
+        folder_frame = ctk.CTkFrame(self.sidebar, fg_color="transparent")
+        folder_frame.pack(padx=20, pady=(5, 0), fill="x")
+        
+        self.btn_import_folder = ctk.CTkButton(folder_frame, text="Import Folder", command=self.import_folder, fg_color="#8B5CF6", width=100)
+        self.btn_import_folder.pack(side="left", fill="x", expand=True, padx=(0, 5))
+        
+        self.btn_watch_folder = ctk.CTkButton(folder_frame, text="Watch Folder", command=self.toggle_watch_folder, fg_color="#8B5CF6", width=100)
+        self.btn_watch_folder.pack(side="right", fill="x", expand=True)
+        
         self.lbl_file = ctk.CTkLabel(self.sidebar, text="No file selected", text_color="gray", wraplength=200)
         self.lbl_file.pack(padx=20, pady=5)
         
@@ -1030,6 +428,12 @@ class MedVATApp(ctk.CTk):
         )
         self.lbl_batch_counts.pack(anchor="w", pady=(3, 0))
         
+        # Shown when a batch finished with failures
+        self.btn_retry_failed = ctk.CTkButton(
+            self.batch_frame, text="Retry Failed", command=self.retry_failed_jobs,
+            fg_color="#D97706", width=100
+        )
+        
         self.batch_frame.pack_forget()  # Hide initially
         
         # Analyze Button
@@ -1040,6 +444,23 @@ class MedVATApp(ctk.CTk):
         # Batch processing variables
         self.batch_videos = []
         self.batch_processing = False
+        self.batch_id = None  # Batch in the job store being run or retried
+        self.batch_rubric_keys = None
+        self.batch_model = None
+        self.retry_batch_ids = []  # Finished batches with failed videos, oldest first
+        self.connectivity_monitor = None
+        self.folder_watcher = None
+        self.watch_queue = []  # Ready videos from the watched folder waiting for the next batch
+        # Cohort dataset of every completed assessment (see ResultExporter)
+        self.exporter = ResultExporter.from_config(ConfigManager.load_config())
+        # (video, rubric key, model, result_key) of the analysis shown in the form;
+        # it is exported once the user has reviewed it and written the report
+        self.pending_export = None
+        try:
+            self.job_store = BatchJobStore()
+        except Exception as e:
+            print(f"[Batch] Job store unavailable, batches will not be resumable: {e}")
+            self.job_store = None
         
         # Progress
         self.progress = ctk.CTkProgressBar(self.sidebar)
@@ -1060,6 +481,7 @@ class MedVATApp(ctk.CTk):
         
         # Load saved API key
         self.load_config()
+        self.after_idle(self.offer_resume_batch)
         
         # Initial Load - set up first category and subcategory
         if categories:
@@ -1100,6 +522,36 @@ class MedVATApp(ctk.CTk):
         else:
             self.subcategory_menu.configure(values=[])
     
+    def select_extra_rubrics(self):
+        """Let the user pick additional rubrics to score the same video against."""
+        dialog = ctk.CTkToplevel(self)
+        dialog.title("Additional Rubrics")
+        dialog.geometry("360x420")
+        dialog.transient(self)
+        dialog.grab_set()
+        
+        ctk.CTkLabel(
+            dialog,
+            text="Each selected rubric gets its own report.\nThe video is uploaded only once.",
+            justify="left"
+        ).pack(padx=20, pady=(20, 10), anchor="w")
+        
+        checks = {}
+        for key in self.rubrics:
+            var = ctk.BooleanVar(value=key in self.extra_rubric_keys)
+            ctk.CTkCheckBox(dialog, text=key, variable=var).pack(padx=20, pady=4, anchor="w")
+            checks[key] = var
+        
+        def apply():
+            self.extra_rubric_keys = [key for key, var in checks.items() if var.get()]
+            count = len(self.extra_rubric_keys)
+            self.btn_extra_rubrics.configure(
+                text=f"Also assess with... (+{count})" if count else "Also assess with..."
+            )
+            dialog.destroy()
+        
+        ctk.CTkButton(dialog, text="OK", command=apply).pack(padx=20, pady=20, fill="x")
+
     def change_category(self, category):
         """Handle category selection change."""
         self.update_subcategory_menu()
@@ -1116,6 +568,7 @@ class MedVATApp(ctk.CTk):
             # Hide batch frame if visible
             self.batch_frame.pack_forget()
             self.batch_videos = []
+            self.batch_id = None
     
     def select_batch_files(self):
         """Select multiple video files for batch processing."""
@@ -1124,44 +577,213 @@ class MedVATApp(ctk.CTk):
             filetypes=[("Video", "*.mp4 *.mov *.avi *.mkv")]
         )
         if paths:
-            self.batch_videos = list(paths)
-            self.lbl_file.configure(text=f"{len(self.batch_videos)} videos selected")
-            # Show batch status frame
-            self.batch_frame.pack(padx=20, pady=(10, 0), fill="x", before=self.btn_analyze)
-            total = len(self.batch_videos)
-            self.lbl_batch_header.configure(text=f"Batch: {total} video{'s' if total != 1 else ''}")
-            self.lbl_batch_status.configure(text="Ready to start processing")
-            self.lbl_batch_counts.configure(text=f"Completed: 0 / Total: {total} | Successful: 0 | Failed: 0")
-            self.batch_progress.set(0)
-            self.btn_analyze.configure(state="normal", text="START BATCH PROCESSING")
-            self.selected_video_path = None  # Clear single file selection
+            # A new selection starts a new batch
+            self.batch_id = None
+            self.show_batch_selection(list(paths))
+    
+    def import_folder(self):
+        """Select a folder and queue every video under it that has no report yet."""
+        folder = filedialog.askdirectory(title="Import Videos from Folder")
+        if not folder:
+            return
+        self.btn_import_folder.configure(state="disabled")
+        self.set_status(f"Scanning {os.path.basename(folder)}...", 0)
+        
+        def scan():
+            paths = VideoScanner.scan(folder)
+            self.ui_bus.post(self._finish_folder_import, folder, paths)
+        
+        threading.Thread(target=scan, daemon=True).start()
+    
+    def _finish_folder_import(self, folder, paths):
+        self.btn_import_folder.configure(state="normal")
+        self.set_status("Ready", 0)
+        if self.batch_processing:
+            messagebox.showinfo("Batch Running", "Wait for the current batch to finish before importing another folder.")
+            return
+        if not paths:
+            messagebox.showinfo("No New Videos", f"Every video in {folder} already has a report.")
+            return
+        self.batch_id = None
+        self.show_batch_selection(paths, status_text=f"Imported from {os.path.basename(folder)}")
+    
+    def toggle_watch_folder(self):
+        """
+        Start or stop watching a folder. New videos are processed in batches
+        automatically once they are fully written.
+        """
+        if self.folder_watcher is not None:
+            self.folder_watcher.stop()
+            self.folder_watcher = None
+            self.watch_queue = []
+            self.btn_watch_folder.configure(text="Watch Folder", fg_color="#8B5CF6")
+            if not self.batch_processing:
+                self.lbl_file.configure(text="No file selected")
+            return
+        if not self.entry_api_key.get():
+            messagebox.showwarning("Missing Key", "Please enter a Gemini API Key before watching a folder.")
+            return
+        folder = filedialog.askdirectory(title="Watch Folder for New Videos")
+        if not folder:
+            return
+        self.folder_watcher = FolderWatcher(
+            folder, lambda paths: self.ui_bus.post(self.enqueue_watched_videos, paths)
+        )
+        self.folder_watcher.start()
+        self.btn_watch_folder.configure(text="Stop Watching", fg_color="#D97706")
+        if not self.batch_processing:
+            self.lbl_file.configure(text=f"Watching {os.path.basename(folder)}")
+    
+    def enqueue_watched_videos(self, paths):
+        """Queue ready videos from the watched folder; they run as soon as no batch is running."""
+        if self.folder_watcher is None:
+            return
+        self.watch_queue.extend(path for path in paths if path not in self.watch_queue)
+        if not self.batch_processing:
+            self._start_watched_batch()
+    
+    def _start_watched_batch(self):
+        api_key = self.entry_api_key.get()
+        if not self.watch_queue or not api_key:
+            return
+        paths, self.watch_queue = self.watch_queue, []
+        # Each group of watched videos is its own batch, with the rubrics selected now
+        self.batch_id = None
+        self.show_batch_selection(paths, status_text="New videos from watched folder")
+        self.start_batch_processing(api_key)
+    
+    def show_batch_selection(self, paths, status_text="Ready to start processing"):
+        """Show the batch status frame for videos about to be processed."""
+        self.batch_videos = paths
+        self.lbl_file.configure(text=f"{len(self.batch_videos)} videos selected")
+        # Show batch status frame
+        self.batch_frame.pack(padx=20, pady=(10, 0), fill="x", before=self.btn_analyze)
+        self.btn_retry_failed.pack_forget()
+        total = len(self.batch_videos)
+        self.lbl_batch_header.configure(text=f"Batch: {total} video{'s' if total != 1 else ''}")
+        self.lbl_batch_status.configure(text=status_text)
+        self.lbl_batch_counts.configure(text=f"Completed: 0 / Total: {total} | Successful: 0 | Failed: 0")
+        self.batch_progress.set(0)
+        self.btn_analyze.configure(state="normal", text="START BATCH PROCESSING")
+        self.selected_video_path = None  # Clear single file selection
+    
+    def offer_resume_batch(self):
+        """Offer to resume the last batch if it was interrupted (app closed, crash)."""
+        if self.job_store is None:
+            return
+        batch = self.job_store.latest_batch(resumable=True)
+        if batch is None:
+            return
+        unfinished = self.job_store.jobs(batch["id"], states=BatchJobStore.UNFINISHED_STATES)
+        paths = []
+        for job in unfinished:
+            if os.path.isfile(job["path"]):
+                paths.append(job["path"])
+            else:
+                self.job_store.update(batch["id"], job["path"], "failed",
+                                      error="Video file not found", error_class="file")
+        rubric_keys = [key for key in batch["rubric_keys"] if key in self.rubrics]
+        if not paths or not rubric_keys:
+            self.job_store.close_batch(batch["id"])
+            return
+        counts = self.job_store.counts(batch["id"])
+        started = datetime.fromtimestamp(batch["created_at"]).strftime("%Y-%m-%d %H:%M")
+        message = (f"A batch started {started} did not finish.\n\n"
+                   f"Remaining: {len(paths)} video(s)\n"
+                   f"Already reported: {counts.get('reported', 0)}\n"
+                   f"Failed: {counts.get('failed', 0)}\n\n"
+                   f"Rubrics: {', '.join(rubric_keys)}\nModel: {batch['model']}\n\n"
+                   "Resume it? Finished uploads and analyses are reused.")
+        if not messagebox.askyesno("Resume Batch?", message):
+            self.job_store.close_batch(batch["id"])
+            return
+        self.batch_id = batch["id"]
+        self.batch_rubric_keys = rubric_keys
+        self.batch_model = batch["model"]
+        self.show_batch_selection(paths, status_text="Resuming interrupted batch")
+    
+    def retry_failed_jobs(self, network_only=False):
+        """
+        Re-run the failed videos of the oldest batch that has any, under that
+        batch's own rubrics and model. With network_only (used when
+        connectivity comes back), only videos that failed with network
+        errors are retried, without asking.
+        """
+        if self.job_store is None or self.batch_processing:
+            return
+        for batch_id in list(self.retry_batch_ids):
+            batch = self.job_store.batch(batch_id)
+            rubric_keys = [key for key in batch["rubric_keys"] if key in self.rubrics] if batch else []
+            if not rubric_keys or not self.job_store.jobs(batch_id, states=("failed",)):
+                # Nothing left that can be retried
+                self.retry_batch_ids.remove(batch_id)
+                self.job_store.close_batch(batch_id)
+                continue
+            failed = self.job_store.jobs(
+                batch_id, states=("failed",), error_class="network" if network_only else None
+            )
+            paths = [job["path"] for job in failed if os.path.isfile(job["path"])]
+            if paths:
+                break
+        else:
+            if not self.retry_batch_ids:
+                self.btn_retry_failed.pack_forget()
+            return
+        api_key = self.entry_api_key.get()
+        if not api_key:
+            if not network_only:
+                messagebox.showwarning("Missing Key", "Please enter a Gemini API Key.")
+            return
+        print(f"[Batch] Retrying {len(paths)} failed video(s) of batch {batch_id}")
+        # Back in the list when it finishes with failures again
+        self.retry_batch_ids.remove(batch_id)
+        self.batch_id = batch_id
+        self.batch_rubric_keys = rubric_keys
+        self.batch_model = batch["model"]
+        self.show_batch_selection(paths, status_text="Retrying failed videos")
+        self.start_batch_processing(api_key)
 
     def load_config(self):
-        """Load API key from config file."""
+        """Load API key and metrics settings from config file."""
         config = ConfigManager.load_config()
+        Metrics.configure(config.get("metrics"))
         if "api_key" in config:
             self.entry_api_key.delete(0, "end")
             self.entry_api_key.insert(0, config["api_key"])
-            # Auto-discover models and check availability after loading
-            self.after(500, self.discover_models)
+            # Fill the model list from the catalogue once the window is up;
+            # a refresh (SDK import + network call) runs later, off the UI thread
+            self.after_idle(lambda: self.discover_models(
+                refresh_delay_ms=MedVATApp.STARTUP_DISCOVERY_DELAY_MS
+            ))
     
     def save_config(self):
         """Save API key to config file."""
         api_key = self.entry_api_key.get()
         if api_key:
-            ConfigManager.save_config({"api_key": api_key})
+            # Keep other settings (e.g. batch_concurrency) when updating the key
+            config = ConfigManager.load_config()
+            if config.get("api_key") == api_key:
+                return
+            config["api_key"] = api_key
+            ConfigManager.save_config(config)
     
     def on_api_key_change(self, event=None):
         """Called when API key is modified."""
-        # Debounce: discover models after user stops typing
-        if hasattr(self, '_discover_timer'):
-            self.after_cancel(self._discover_timer)
-        self._discover_timer = self.after(1000, self.discover_models)
-        # Save config when API key changes
+        # Debounce: save and discover models after user stops typing
+        if hasattr(self, '_api_key_timer'):
+            self.after_cancel(self._api_key_timer)
+        self._api_key_timer = self.after(MedVATApp.API_KEY_DEBOUNCE_MS, self._on_api_key_settled)
+    
+    def _on_api_key_settled(self):
         self.save_config()
+        self.discover_models()
     
-    def discover_models(self):
-        """Discover available models from the API and update dropdown."""
+    def discover_models(self, refresh_delay_ms=0):
+        """
+        Show the models available to the API key, from the model catalogue
+        when it has them. Unknown or stale keys are refreshed from the API in
+        the background after refresh_delay_ms.
+        """
         api_key = self.entry_api_key.get()
         
         if not api_key:
@@ -1171,21 +793,35 @@ class MedVATApp(ctk.CTk):
             self.model_status_text.configure(text="No API key", text_color="gray")
             return
         
-        # Show loading state
-        self.model_menu.configure(values=["Discovering models..."], state="disabled")
-        self.model_status_label.configure(text="●", text_color="yellow")
-        self.model_status_text.configure(text="Discovering models...", text_color="yellow")
+        models, is_fresh = ModelCatalogue.lookup(api_key)
+        if models:
+            self._update_model_list(models, None)
+            if is_fresh:
+                return
+            print("[Model Discovery] Catalogue is stale, refreshing in the background")
+        else:
+            # Show loading state
+            self.model_menu.configure(values=["Discovering models..."], state="disabled")
+            self.model_status_label.configure(text="●", text_color="yellow")
+            self.model_status_text.configure(text="Discovering models...", text_color="yellow")
         
         # Run discovery in thread to avoid blocking UI
-        thread = threading.Thread(target=self._discover_models_thread, args=(api_key,))
-        thread.start()
+        def start_refresh():
+            thread = threading.Thread(target=self._discover_models_thread, args=(api_key,), daemon=True)
+            thread.start()
+        self.after(refresh_delay_ms, start_refresh)
     
     def _discover_models_thread(self, api_key):
-        """Thread function to discover available models."""
-        models, error_msg = GeminiClient.fetch_available_models(api_key)
-        
-        # Update UI on main thread
-        self.after(0, lambda: self._update_model_list(models, error_msg))
+        """Thread function to refresh the model catalogue for a key."""
+        models, error_msg = ModelCatalogue.refresh(api_key)
+        if error_msg:
+            # Keep showing a stale list rather than the fallback models
+            cached, _ = ModelCatalogue.lookup(api_key)
+            if cached:
+                models = cached
+        
+        # Update UI on main thread, unless the key changed meanwhile
+        self.ui_bus.post(lambda: self._update_model_list(models, error_msg) if self.entry_api_key.get() == api_key else None)
     
     def _update_model_list(self, models, error_msg):
         """Update model dropdown with discovered models."""
@@ -1232,6 +868,13 @@ class MedVATApp(ctk.CTk):
             self.model_status_text.configure(text="No API key", text_color="gray")
             return
         
+        # The catalogue answers without any API call; a stale one is being
+        # refreshed in the background and will update the status
+        listed = ModelCatalogue.is_listed(api_key, self.selected_model, allow_stale=True)
+        if listed is not None:
+            self._update_model_status(listed, None if listed else f"{self.selected_model} not available for this key")
+            return
+        
         # Show checking status
         self.model_status_label.configure(text="●", text_color="yellow")
         self.model_status_text.configure(text="Checking...", text_color="yellow")
@@ -1246,9 +889,9 @@ class MedVATApp(ctk.CTk):
         
         # Update UI on main thread
         if is_available:
-            self.after(0, lambda: self._update_model_status(True, None))
+            self.ui_bus.publish("model_status", self._update_model_status, True, None)
         else:
-            self.after(0, lambda: self._update_model_status(False, error_msg))
+            self.ui_bus.publish("model_status", self._update_model_status, False, error_msg)
     
     def _update_model_status(self, is_available, error_msg):
         """Update model status indicator on main thread."""
@@ -1298,7 +941,11 @@ class MedVATApp(ctk.CTk):
         else:
             self.lbl_status.configure(text="Ready")
         
-        self.assessment_form.build_form(rubric)
+        self.assessment_form.build_form(rubric, rubric_key)
+
+    def _make_client(self, api_key):
+        """Create a GeminiClient using the settings from the config."""
+        return GeminiClient.from_config(api_key)
 
     def start_analysis(self):
         api_key = self.entry_api_key.get()
@@ -1317,8 +964,8 @@ class MedVATApp(ctk.CTk):
             self.btn_analyze.configure(state="disabled", fg_color="gray", text="RUN AI ANALYSIS")
             self.progress.set(0)
             
-            # Run in thread to keep UI responsive
-            thread = threading.Thread(target=self.run_ai_thread, args=(api_key,))
+            # Run in thread to keep UI responsive; Tk variables are read here, not in the worker
+            thread = threading.Thread(target=self.run_ai_thread, args=(api_key, self.force_refresh_var.get()))
             thread.start()
     
     def start_batch_processing(self, api_key):
@@ -1326,95 +973,85 @@ class MedVATApp(ctk.CTk):
         if not self.batch_videos:
             return
         
+        if self.batch_id is None:
+            # New batch: remember its rubrics and model so it can be resumed as it was
+            self.batch_rubric_keys = [self.current_rubric_key] + [
+                key for key in self.extra_rubric_keys if key != self.current_rubric_key
+            ]
+            self.batch_model = self.selected_model
+            if self.job_store is not None:
+                self.batch_id = self.job_store.create_batch(self.batch_rubric_keys, self.batch_model)
+        if self.connectivity_monitor is not None:
+            self.connectivity_monitor.stop()
+            self.connectivity_monitor = None
+        
         self.batch_processing = True
         self.btn_analyze.configure(state="disabled", fg_color="gray", text="PROCESSING BATCH...")
         self.btn_file.configure(state="disabled")
         self.btn_batch.configure(state="disabled")
+        self.btn_import_folder.configure(state="disabled")
+        self.btn_retry_failed.pack_forget()
         self.batch_progress.set(0)
         
-        # Run batch processing in thread
-        thread = threading.Thread(target=self.run_batch_thread, args=(api_key,))
+        # Run batch processing in thread; Tk variables are read here, not in the worker
+        thread = threading.Thread(target=self.run_batch_thread, args=(api_key, self.force_refresh_var.get()))
         thread.start()
     
-    def run_batch_thread(self, api_key):
-        """Process multiple videos in batch."""
-        client = GeminiClient(api_key)
-        rubric = self.rubrics[self.current_rubric_key]
-        auto_detect = rubric.get("auto_detect", False)
-        total_videos = len(self.batch_videos)
-        successful = 0
-        failed = []
+    def run_batch_thread(self, api_key, force_refresh=False):
+        """Process multiple videos in batch through the staged pipeline."""
+        client = self._make_client(api_key)
+        config = ConfigManager.load_config()
+        rubrics = {key: self.rubrics[key] for key in self.batch_rubric_keys}
+        primary_key = self.batch_rubric_keys[0]
         
-        for idx, video_path in enumerate(self.batch_videos):
-            video_name = os.path.basename(video_path)
-            try:
-                # Update batch status - starting video
-                completed_before = idx
-                self.after(0, lambda vn=video_name, i=idx, t=total_videos, c=completed_before: 
-                    self.update_batch_status_starting(vn, i, t, c))
-                
-                # Process video
-                def update_prog(msg, val, vn=video_name):
-                    self.after(0, lambda m=msg: self.lbl_status.configure(text=m))
-                    self.after(0, lambda v=val: self.progress.set(v))
-                
-                result = client.analyze_video(
-                    video_path,
-                    rubric,
-                    update_prog,
-                    self.selected_model,
-                    auto_detect_pattern=auto_detect,
-                    api_key=api_key
-                )
-                
-                # Generate PDF automatically
-                if "error" not in result:
-                    pdf_path = self.generate_pdf_for_video(video_path, result)
-                    if pdf_path:
-                        successful += 1
-                    else:
-                        failed.append((video_name, "PDF generation failed - check file permissions"))
-                else:
-                    error_msg = result.get("error", "Analysis failed")
-                    is_fatal = result.get("fatal", False)
-                    # Extract just the error type for summary
-                    if "FATAL ERROR" in error_msg:
-                        error_summary = error_msg.split("\n\n")[0]  # Get first line
-                    else:
-                        error_summary = error_msg.split("\n")[0] if "\n" in error_msg else error_msg[:50]
-                    failed.append((video_name, error_summary))
-                
-                # Update batch status - video completed
-                completed_after = idx + 1
-                self.after(0, lambda vn=video_name, c=completed_after, t=total_videos, s=successful, f=len(failed): 
-                    self.update_batch_status_completed(vn, c, t, s, f))
-                    
-            except FileNotFoundError:
-                failed.append((video_name, "Video file not found - may have been moved"))
-                completed_after = idx + 1
-                self.after(0, lambda c=completed_after, t=total_videos, s=successful, f=len(failed): 
-                    self.update_batch_status_error(c, t, s, f))
-            except PermissionError:
-                failed.append((video_name, "Permission denied - check file access"))
-                completed_after = idx + 1
-                self.after(0, lambda c=completed_after, t=total_videos, s=successful, f=len(failed): 
-                    self.update_batch_status_error(c, t, s, f))
-            except Exception as e:
-                error_msg = ErrorHandler.format_error(
-                    "Unexpected Batch Processing Error",
-                    f"An unexpected error occurred: {str(e)}",
-                    is_fatal=False
-                )
-                # Extract summary for batch display
-                error_summary = error_msg.split("\n")[0] if "\n" in error_msg else str(e)[:50]
-                failed.append((video_name, error_summary))
-                # Update counts after exception
-                completed_after = idx + 1
-                self.after(0, lambda c=completed_after, t=total_videos, s=successful, f=len(failed): 
-                    self.update_batch_status_error(c, t, s, f))
+        def update_prog(video_name, msg, val):
+            self.ui_bus.publish("status", self.set_status, f"{video_name}: {msg}", val)
+        
+        def on_started(video_name, idx, total, completed):
+            self.ui_bus.publish("batch_status", self.update_batch_status_starting, video_name, idx, total, completed)
+        
+        def on_completed(video_name, completed, total, successful, failed_count, error_summary):
+            if error_summary is None:
+                self.ui_bus.publish("batch_status", self.update_batch_status_completed, video_name, completed, total, successful, failed_count)
+            else:
+                self.ui_bus.publish("batch_status", self.update_batch_status_error, completed, total, successful, failed_count)
+        
+        def write_report(video_path, result, rubric_key):
+            return self.generate_pdf_for_video(video_path, result, rubric_key, primary_key)
+        
+        pipeline = BatchPipeline(
+            client,
+            rubrics,
+            self.batch_model,
+            api_key,
+            write_report,
+            progress_callback=update_prog,
+            on_started=on_started,
+            on_completed=on_completed,
+            concurrency=config.get("batch_concurrency"),
+            force_refresh=force_refresh,
+            # Send the static prompt once per rubric instead of once per video
+            prompt_cache=PromptCache() if config.get("context_cache", True) and len(self.batch_videos) > 1 else None,
+            job_store=self.job_store,
+            batch_id=self.batch_id,
+            exporter=self.exporter
+        )
+        hits_before = ResultCache.stats()["hits"]
+        retries_before = RateLimiter.shared().throttled_count
+        successful, failed, total_videos = pipeline.run(self.batch_videos)
+        cache_hits = ResultCache.stats()["hits"] - hits_before
+        retries = RateLimiter.shared().throttled_count - retries_before
+        stage_summary = pipeline.summary()
         
         # Final status update
-        self.after(0, lambda: self.finish_batch_processing(successful, failed, total_videos))
+        self.ui_bus.post(lambda: self.finish_batch_processing(
+            successful, failed, total_videos, cache_hits, stage_summary, retries
+        ))
+    
+    def set_status(self, message, value):
+        """Show a progress message and value (applied from the UI bus)."""
+        self.lbl_status.configure(text=message)
+        self.progress.set(value)
     
     def update_batch_status_starting(self, video_name, idx, total, completed):
         """Update batch status when starting a video."""
@@ -1442,15 +1079,27 @@ class MedVATApp(ctk.CTk):
             text=f"Completed: {completed} / Total: {total} | Successful: {successful} | Failed: {failed}"
         )
     
-    def finish_batch_processing(self, successful, failed, total):
+    def finish_batch_processing(self, successful, failed, total, cache_hits=0, stage_summary=None, retries=0):
         """Finish batch processing and show results."""
         self.batch_processing = False
         self.btn_analyze.configure(state="normal", fg_color="green", text="RUN AI ANALYSIS")
         self.btn_file.configure(state="normal")
         self.btn_batch.configure(state="normal")
+        self.btn_import_folder.configure(state="normal")
         
         # Show completion message with actionable information
         message = f"Batch processing complete!\n\n✅ Successful: {successful}/{total}"
+        if cache_hits:
+            message += f"\n♻️ Reused cached results: {cache_hits}"
+        if stage_summary:
+            message += "\n\n⏱ Time per stage (median / 95th percentile):"
+            for stage, label in (("upload", "Upload"), ("processing", "Gemini processing"),
+                                 ("generate", "Analysis"), ("report", "PDF report"), ("video", "Whole video")):
+                if stage in stage_summary:
+                    stats = stage_summary[stage]
+                    message += f"\n  • {label}: {stats['median']:.0f}s / {stats['p95']:.0f}s"
+        if retries:
+            message += f"\n  • Rate-limited calls retried: {retries}"
         if failed:
             message += f"\n\n❌ Failed ({len(failed)}):"
             for video_name, error in failed[:5]:  # Show first 5 failures
@@ -1460,9 +1109,12 @@ class MedVATApp(ctk.CTk):
             if len(failed) > 5:
                 message += f"\n  ... and {len(failed) - 5} more failures"
             
-            message += "\n\n💡 TIP: Failed videos can be processed individually. Check error messages for specific issues."
+            message += "\n\n💡 TIP: Click \"Retry Failed\" to re-run only the failed videos. Videos that failed with network errors are retried automatically once the connection is back."
         
-        if successful == total:
+        if self.folder_watcher is not None:
+            # Watch mode runs unattended; don't block the next batch on a dialog
+            print(f"[Watch] Batch finished: {successful}/{total} successful")
+        elif successful == total:
             messagebox.showinfo("✅ Batch Processing Complete", message)
         elif successful > 0:
             messagebox.showwarning("⚠️ Batch Processing Complete (Partial Success)", message)
@@ -1476,114 +1128,139 @@ class MedVATApp(ctk.CTk):
         
         # Reset UI
         self.batch_videos = []
-        self.batch_frame.pack_forget()
+        if self.job_store is not None and self.batch_id is not None:
+            if self.job_store.counts(self.batch_id).get("failed", 0):
+                # Keep the batch open so its failures can be retried, now or after a restart
+                self.retry_batch_ids.append(self.batch_id)
+            else:
+                self.job_store.close_batch(self.batch_id)
+        # The next batch (a new selection or watched videos) starts fresh
+        self.batch_id = None
+        failed_count = sum(
+            self.job_store.counts(batch_id).get("failed", 0) for batch_id in self.retry_batch_ids
+        )
+        if failed_count:
+            self.lbl_batch_status.configure(text=f"{failed_count} video(s) failed")
+            self.btn_retry_failed.pack(anchor="w", pady=(5, 0))
+            network_failures = any(
+                self.job_store.jobs(batch_id, states=("failed",), error_class="network")
+                for batch_id in self.retry_batch_ids
+            )
+            if network_failures:
+                # Retry them automatically once the API is reachable again (one batch
+                # per reconnect; the next is picked up when that one finishes)
+                if self.connectivity_monitor is None:
+                    self.connectivity_monitor = ConnectivityMonitor(
+                        lambda: self.ui_bus.post(self.retry_failed_jobs, True)
+                    )
+                self.connectivity_monitor.start()
+        else:
+            self.batch_frame.pack_forget()
         self.lbl_file.configure(text="No file selected")
         self.btn_analyze.configure(state="disabled")
         self.lbl_status.configure(text="Ready")
         self.progress.set(0)
+        if self.folder_watcher is not None:
+            self.lbl_file.configure(text=f"Watching {os.path.basename(self.folder_watcher.root)}")
+            # Videos that became ready while this batch ran
+            self._start_watched_batch()
     
-    def generate_pdf_for_video(self, video_path, assessment_result):
-        """Generate PDF for a video without user interaction."""
+    def generate_pdf_for_video(self, video_path, assessment_result, rubric_key=None, primary_key=None):
+        """
+        Generate PDF for a video without user interaction.
+        
+        When rubric_key is given (multi-rubric jobs), the report uses that
+        rubric and its name gets the rubric as a suffix, e.g.
+        video_Chest_Tube_Insertion_VOP.pdf. Otherwise the report uses
+        primary_key (the batch's rubric), or the selected rubric.
+        """
+        # Runs on batch workers, so map the result in memory, never via the form
+        rubric = self.rubrics[rubric_key or primary_key or self.current_rubric_key]
         try:
-            # Populate form with results
-            self.assessment_form.populate_from_ai(assessment_result)
-            
-            # Get assessment data
-            items, summary = self.assessment_form.get_data()
-            
-            # Generate filename automatically from video file
-            video_dir = os.path.dirname(video_path)
-            video_basename = os.path.basename(video_path)
-            video_name_without_ext = os.path.splitext(video_basename)[0]
-            
-            # Generate PDF filename with auto-incrementing number if needed
-            base_pdf_name = video_name_without_ext
-            pdf_filename = os.path.join(video_dir, f"{base_pdf_name}.pdf")
-            
-            # Check if file exists and find next available number
-            if os.path.exists(pdf_filename):
-                import re
-                match = re.search(r'_(\d+)$', base_pdf_name)
-                if match:
-                    existing_number = int(match.group(1))
-                    base_name = base_pdf_name[:match.start()]
-                    counter = existing_number + 1
-                else:
-                    base_name = base_pdf_name
-                    counter = 1
-                
-                while os.path.exists(pdf_filename):
-                    pdf_filename = os.path.join(video_dir, f"{base_name}_{counter}.pdf")
-                    counter += 1
-            
-            # Generate PDF
-            doc = SimpleDocTemplate(pdf_filename, pagesize=LETTER)
-            elements = []
-            styles = getSampleStyleSheet()
-            
-            # Title
-            elements.append(Paragraph(f"<b>{self.rubrics[self.current_rubric_key]['title']}</b>", styles['Title']))
-            elements.append(Paragraph(f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M')}", styles['Normal']))
-            elements.append(Paragraph(f"File: {video_basename}", styles['Normal']))
-            elements.append(Spacer(1, 20))
-            
-            # Table
-            data = [["Criterion", "Score", "AI Assessment & Advice"]]
-            for item in items:
-                data.append([
-                    Paragraph(item['Criterion'], styles['Normal']),
-                    str(item['Score']),
-                    Paragraph(item['Feedback'], styles['Normal'])
-                ])
-            
-            t = Table(data, colWidths=[150, 50, 300])
-            t.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ]))
-            elements.append(t)
-            elements.append(Spacer(1, 20))
-            
-            # Summative
-            elements.append(Paragraph("<b>Holistic Summative Comment:</b>", styles['Heading2']))
-            elements.append(Paragraph(summary, styles['Normal']))
-            
-            doc.build(elements)
-            return pdf_filename
-            
+            items, summary = AssessmentModel.from_result(rubric, assessment_result).rows()
         except Exception as e:
             print(f"Error generating PDF for {video_path}: {e}")
             return None
+        # Rendered in the report pool; the batch finishes the video when it's written
+        return ReportRenderer.submit(video_path, rubric, items, summary, rubric_key)
 
-    def run_ai_thread(self, api_key):
-        client = GeminiClient(api_key)
+    def run_ai_thread(self, api_key, force_refresh=False):
+        client = self._make_client(api_key)
         
         def update_prog(msg, val):
-            self.lbl_status.configure(text=msg)
-            self.progress.set(val)
+            self.ui_bus.publish("status", self.set_status, msg, val)
         
         rubric = self.rubrics[self.current_rubric_key]
-        # Check if auto-detection is needed
-        auto_detect = rubric.get("auto_detect", False)
-        result = client.analyze_video(
-            self.selected_video_path, 
-            rubric, 
-            update_prog, 
-            self.selected_model,
-            auto_detect_pattern=auto_detect,
-            api_key=api_key
-        )
+        extra_keys = [key for key in self.extra_rubric_keys if key != self.current_rubric_key]
+        if extra_keys:
+            # One upload, one generation per rubric; extra rubrics go straight to PDF
+            rubrics = {self.current_rubric_key: rubric}
+            rubrics.update({key: self.rubrics[key] for key in extra_keys})
+            results = client.analyze_video_multi(
+                self.selected_video_path,
+                rubrics,
+                update_prog,
+                self.selected_model,
+                api_key=api_key,
+                force_refresh=force_refresh
+            )
+            result = results[self.current_rubric_key]
+            for key in extra_keys:
+                if "error" in results[key]:
+                    print(f"[Multi-Rubric] {key} failed: {results[key]['error'].splitlines()[0]}")
+                else:
+                    future = self.generate_pdf_for_video(self.selected_video_path, results[key], key)
+                    self._export_when_written(
+                        future, self.selected_video_path, key, self.selected_model, results[key],
+                        MedVATApp._result_key(client, self.selected_video_path, self.rubrics[key], self.selected_model)
+                    )
+        else:
+            # Check if auto-detection is needed
+            auto_detect = rubric.get("auto_detect", False)
+            result = client.analyze_video(
+                self.selected_video_path, 
+                rubric, 
+                update_prog, 
+                self.selected_model,
+                auto_detect_pattern=auto_detect,
+                api_key=api_key,
+                force_refresh=force_refresh,
+                # Fill in each criterion as soon as the model finishes it
+                on_assessment=lambda entry: self.ui_bus.publish(("item", entry.get("name")), self.assessment_form.update_item, entry)
+            )
+        
+        export_as = None
+        if "error" not in result:
+            export_as = (
+                self.selected_video_path, self.current_rubric_key, self.selected_model,
+                MedVATApp._result_key(client, self.selected_video_path, rubric, self.selected_model)
+            )
         
         # Update UI on main thread
-        self.after(0, lambda: self.finish_analysis(result))
+        self.ui_bus.post(self.finish_analysis, result, export_as)
 
-    def finish_analysis(self, result):
+    @staticmethod
+    def _result_key(client, video_path, rubric, model_name):
+        """The exported assessment's identity (see ResultExporter), or None if the video is gone."""
+        try:
+            return client.result_cache_key(video_path, rubric, model_name)
+        except OSError:
+            return None
+
+    def _export_when_written(self, future, video_path, rubric_key, model_name, result, result_key):
+        """Add an assessment to the cohort dataset once its report has been written."""
+        if self.exporter is None or future is None:
+            return
+        
+        def export(f):
+            if f.exception() is None:
+                self.exporter.export(video_path, rubric_key, self.rubrics[rubric_key], model_name, result,
+                                     result_key=result_key)
+        
+        future.add_done_callback(export)
+
+    def finish_analysis(self, result, export_as=None):
+        self.pending_export = None
         if "error" in result:
             # Show user-friendly error message
             error_msg = result["error"]
@@ -1607,8 +1284,19 @@ class MedVATApp(ctk.CTk):
             self.btn_analyze.configure(state="normal", fg_color="green")
         else:
             self.assessment_form.populate_from_ai(result)
+            self.pending_export = export_as
             self.btn_analyze.configure(state="normal", fg_color="green")
-            self.lbl_status.configure(text="Analysis Complete")
+            if result.get("detected_pattern"):
+                self.lbl_status.configure(text=f"Analysis Complete (pattern: {result['detected_pattern']})")
+            else:
+                self.lbl_status.configure(text="Analysis Complete")
+            if result.get("missing_criteria"):
+                messagebox.showwarning(
+                    "Incomplete AI Response",
+                    "The AI response did not include these criteria:\n\n• " +
+                    "\n• ".join(result["missing_criteria"]) +
+                    "\n\nThey have been left at their default scores. Please review them manually."
+                )
 
     def generate_pdf(self):
         items, summary = self.assessment_form.get_data()
@@ -1618,79 +1306,22 @@ class MedVATApp(ctk.CTk):
             messagebox.showwarning("No Video", "Please select a video file first.")
             return
         
-        # Get video directory and base name
-        video_dir = os.path.dirname(self.selected_video_path)
-        video_basename = os.path.basename(self.selected_video_path)
-        # Remove extension
-        video_name_without_ext = os.path.splitext(video_basename)[0]
-        
-        # Start with the video name as the PDF name
-        base_pdf_name = video_name_without_ext
-        pdf_filename = os.path.join(video_dir, f"{base_pdf_name}.pdf")
-        
-        # If file exists, append/increment number
-        if os.path.exists(pdf_filename):
-            import re
-            # Check if base name already ends with a number pattern
-            match = re.search(r'_(\d+)$', base_pdf_name)
-            if match:
-                # Extract the existing number and base name
-                existing_number = int(match.group(1))
-                base_name = base_pdf_name[:match.start()]
-                counter = existing_number + 1
-            else:
-                # No existing number, start from _1
-                base_name = base_pdf_name
-                counter = 1
-            
-            # Find next available filename
-            pdf_filename = os.path.join(video_dir, f"{base_name}_{counter}.pdf")
-            while os.path.exists(pdf_filename):
-                counter += 1
-                pdf_filename = os.path.join(video_dir, f"{base_name}_{counter}.pdf")
-        
-        filename = pdf_filename
-        
-        doc = SimpleDocTemplate(filename, pagesize=LETTER)
-        elements = []
-        styles = getSampleStyleSheet()
-        
-        # Title
-        elements.append(Paragraph(f"<b>{self.rubrics[self.current_rubric_key]['title']}</b>", styles['Title']))
-        elements.append(Paragraph(f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M')}", styles['Normal']))
-        if self.selected_video_path:
-            elements.append(Paragraph(f"File: {os.path.basename(self.selected_video_path)}", styles['Normal']))
-        elements.append(Spacer(1, 20))
-        
-        # Table
-        data = [["Criterion", "Score", "AI Assessment & Advice"]]
-        for item in items:
-            data.append([
-                Paragraph(item['Criterion'], styles['Normal']),
-                str(item['Score']),
-                Paragraph(item['Feedback'], styles['Normal'])
-            ])
-        
-        t = Table(data, colWidths=[150, 50, 300])
-        t.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ]))
-        elements.append(t)
-        elements.append(Spacer(1, 20))
-        
-        # Summative
-        elements.append(Paragraph("<b>Holistic Summative Comment:</b>", styles['Heading2']))
-        elements.append(Paragraph(summary, styles['Normal']))
-        
+        # Layout runs in the report pool; the window stays responsive meanwhile
+        self.btn_export.configure(state="disabled", text="Generating PDF...")
+        future = ReportRenderer.submit(self.selected_video_path, self.rubrics[self.current_rubric_key], items, summary)
+        if self.pending_export is not None and self.pending_export[:2] == (self.selected_video_path, self.current_rubric_key):
+            # Export the reviewed assessment, as written to the report
+            video_path, rubric_key, model_name, result_key = self.pending_export
+            # (once: exporting the PDF again doesn't add rows, see ResultExporter)
+            self._export_when_written(
+                future, video_path, rubric_key, model_name, self.assessment_form.model.to_result(), result_key
+            )
+        future.add_done_callback(lambda f: self.ui_bus.post(self._finish_pdf_export, f))
+    
+    def _finish_pdf_export(self, future):
+        self.btn_export.configure(state="normal", text="Export PDF Report")
         try:
-            doc.build(elements)
+            future.result()
             messagebox.showinfo("Success", "PDF generated successfully.")
         except PermissionError as e:
             error_msg = ErrorHandler.format_error(
@@ -1707,8 +1338,15 @@ class MedVATApp(ctk.CTk):
             )
             messagebox.showerror("PDF Generation Error", error_msg)
 
-if __name__ == "__main__":
+def main():
+    """Run the desktop app (started from medvat.py)."""
     app = MedVATApp()
     app.mainloop()
+    if app.exporter is not None:
+        # Write rows still buffered for the Parquet dataset
+        app.exporter.close()
+
+if __name__ == "__main__":
+    main()
 
 
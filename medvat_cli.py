@@ -0,0 +1,344 @@
+"""
+MedVAT headless batch runner.
+
+Runs the same staged batch pipeline as the desktop app's Batch button
+without importing tkinter/customtkinter, so overnight jobs can run on
+machines without a desktop session.
+
+Usage:
+    python medvat_cli.py videos/ --rubric "Suturing: Simple Interrupted"
+    python medvat_cli.py --manifest batch.txt --rubric "Chest Tube Insertion VOP" \\
+        --extra-rubric "Suturing: Simple Interrupted" --concurrency upload=2,generate=4 \\
+        --summary-json summary.json
+    python medvat_cli.py --list-rubrics
+    python medvat_cli.py --resume --retry-failed
+
+Every run is recorded in the job store (medvat_jobs.sqlite3). --resume
+continues the most recent batch that did not finish (interrupted runs,
+GUI batches included) with its rubrics and model; --retry-failed re-runs
+its failed videos.
+
+Progress goes to stderr; the JSON summary goes to --summary-json (use "-"
+for stdout).
+
+Exit codes:
+    0  every video was assessed and reported
+    1  some videos failed
+    2  usage or configuration error (nothing was processed)
+    3  every video failed
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from medvat_core import (
+    BatchJobStore, BatchPipeline, ConfigManager, GeminiClient, Metrics, PromptCache, RateLimiter,
+    ReportRenderer, ResultCache, ResultExporter, RubricManager, VideoScanner
+)
+
+DEFAULT_MODEL = "gemini-2.5-flash"
+
+EXIT_OK = 0
+EXIT_PARTIAL = 1
+EXIT_USAGE = 2
+EXIT_ALL_FAILED = 3
+
+
+class UsageError(Exception):
+    """Bad arguments or configuration; reported with exit code 2."""
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def find_videos(path, recursive=False, skip_reported=False, output_dir=None):
+    """Return the video files in a directory (sorted), or [path] for a file."""
+    if os.path.isdir(path):
+        return VideoScanner.scan(path, recursive, skip_reported, output_dir, verbose=False)
+    if os.path.isfile(path):
+        return [path]
+    raise UsageError(f"No such file or directory: {path}")
+
+
+def read_manifest(manifest_path):
+    """
+    Read video paths from a manifest: a text file with one path per line
+    (blank lines and # comments ignored) or a JSON list / {"videos": [...]}.
+    Relative paths are resolved against the manifest's directory.
+    """
+    try:
+        with open(manifest_path, "r") as f:
+            content = f.read()
+    except OSError as e:
+        raise UsageError(f"Could not read manifest {manifest_path}: {e}")
+
+    if manifest_path.lower().endswith(".json"):
+        try:
+            data = json.loads(content)
+        except json.JSONDecodeError as e:
+            raise UsageError(f"Manifest {manifest_path} is not valid JSON: {e}")
+        entries = data.get("videos", []) if isinstance(data, dict) else data
+        if not isinstance(entries, list):
+            raise UsageError(f"Manifest {manifest_path} must be a list or {{\"videos\": [...]}}")
+    else:
+        entries = [line.strip() for line in content.splitlines()]
+        entries = [line for line in entries if line and not line.startswith("#")]
+
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    return [os.path.join(base_dir, str(entry)) for entry in entries]
+
+
+def collect_videos(paths, manifest, recursive=False, skip_reported=False, output_dir=None):
+    videos = []
+    for path in paths:
+        videos.extend(find_videos(path, recursive, skip_reported, output_dir))
+    if manifest:
+        videos.extend(read_manifest(manifest))
+    # Keep the first occurrence of each file
+    seen = set()
+    unique = []
+    for video in videos:
+        key = os.path.abspath(video)
+        if key not in seen:
+            seen.add(key)
+            unique.append(video)
+    return unique
+
+
+def parse_concurrency(value):
+    """Parse "upload=2,generate=3" into a dict of stage -> worker count."""
+    concurrency = {}
+    for part in value.split(","):
+        if not part.strip():
+            continue
+        stage, _, workers = part.partition("=")
+        stage = stage.strip()
+        if stage not in BatchPipeline.DEFAULT_CONCURRENCY:
+            raise argparse.ArgumentTypeError(
+                f"unknown stage '{stage}' (expected {', '.join(BatchPipeline.DEFAULT_CONCURRENCY)})"
+            )
+        try:
+            concurrency[stage] = int(workers)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"'{part}' is not stage=count")
+        if concurrency[stage] < 1:
+            raise argparse.ArgumentTypeError(f"'{part}' needs at least one worker")
+    return concurrency
+
+
+def resolve_api_key(args, config):
+    return (args.api_key or os.environ.get("GEMINI_API_KEY")
+            or os.environ.get("GOOGLE_API_KEY") or config.get("api_key", ""))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Assess a batch of procedure videos with Gemini and write PDF reports, without the GUI."
+    )
+    parser.add_argument("paths", nargs="*", help="Video files or directories of videos")
+    parser.add_argument("--manifest", help="Text file (one path per line) or JSON list of videos")
+    parser.add_argument("-r", "--recursive", action="store_true", help="Also find videos in subdirectories")
+    parser.add_argument("--skip-reported", action="store_true",
+                        help="Skip videos in directories that already have a <video>.pdf report")
+    parser.add_argument("--rubric", help="Rubric key (see --list-rubrics)")
+    parser.add_argument("--extra-rubric", action="append", default=[],
+                        help="Also score every video against this rubric (repeatable)")
+    parser.add_argument("--list-rubrics", action="store_true", help="List rubric keys and exit")
+    parser.add_argument("--model", default=None, help=f"Gemini model (default: {DEFAULT_MODEL})")
+    parser.add_argument("--api-key", help="Gemini API key (default: GEMINI_API_KEY, GOOGLE_API_KEY, "
+                                          f"then {ConfigManager.CONFIG_FILE})")
+    parser.add_argument("--concurrency", type=parse_concurrency, default=None,
+                        help="Workers per stage, e.g. upload=2,generate=3,report=1 "
+                             "(default: batch_concurrency from the config)")
+    parser.add_argument("--output-dir", help="Write reports here instead of next to each video")
+    parser.add_argument("--force-refresh", action="store_true", help="Ignore cached results")
+    parser.add_argument("--export-dir", help="Append per-criterion results to this dataset folder "
+                                             f"(default: export.dir from the config, or {ResultExporter.EXPORT_DIR})")
+    parser.add_argument("--no-export", action="store_true", help="Don't append results to the export dataset")
+    parser.add_argument("--summary-json", help="Write the JSON summary to this file ('-' for stdout)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue the most recent unfinished batch from the job store")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="Re-run the failed videos of the most recent batch")
+    return parser
+
+
+def stored_batch(args, job_store):
+    """
+    Return (batch, videos) for --resume / --retry-failed: the stored batch
+    and its unfinished and/or failed videos.
+    """
+    if args.paths or args.manifest:
+        raise UsageError("--resume and --retry-failed take no videos; they use the stored batch")
+    batch = job_store.latest_batch(resumable=args.resume and not args.retry_failed)
+    if batch is None:
+        raise UsageError("No batch to resume" if args.resume else "No previous batch in the job store")
+    states = []
+    if args.resume:
+        states.extend(BatchJobStore.UNFINISHED_STATES)
+    if args.retry_failed:
+        states.append("failed")
+    videos = []
+    for job in job_store.jobs(batch["id"], states=states):
+        if os.path.isfile(job["path"]):
+            videos.append(job["path"])
+        else:
+            log(f"[Batch] Skipping {job['path']}: file no longer exists")
+            job_store.update(batch["id"], job["path"], "failed", error="Video file not found", error_class="file")
+    if not videos:
+        raise UsageError(f"Batch {batch['id']} has no videos left to run")
+    return batch, videos
+
+
+def run(args):
+    """Run the batch and return the summary dict."""
+    job_store = BatchJobStore()
+    try:
+        return run_batch(args, job_store)
+    finally:
+        # Also when arguments turn out to be invalid (UsageError)
+        job_store.close()
+
+
+def run_batch(args, job_store):
+    config = ConfigManager.load_config()
+    rubrics_available = RubricManager.get_rubrics()
+
+    batch = None
+    if args.resume or args.retry_failed:
+        batch, videos = stored_batch(args, job_store)
+        rubric_keys = batch["rubric_keys"]
+        args.model = args.model or batch["model"]
+        log(f"[Batch] Continuing batch {batch['id']} ({len(videos)} video(s))")
+    else:
+        if not args.rubric:
+            raise UsageError("--rubric is required (see --list-rubrics)")
+        rubric_keys = [args.rubric] + [key for key in args.extra_rubric if key != args.rubric]
+        videos = collect_videos(args.paths, args.manifest, args.recursive, args.skip_reported, args.output_dir)
+        if not videos:
+            if args.skip_reported:
+                raise UsageError("No videos without a report found")
+            raise UsageError("No videos given; pass files, directories or --manifest")
+    args.model = args.model or DEFAULT_MODEL
+    unknown = [key for key in rubric_keys if key not in rubrics_available]
+    if unknown:
+        raise UsageError(f"Unknown rubric: {', '.join(unknown)} (see --list-rubrics)")
+    rubrics = {key: rubrics_available[key] for key in rubric_keys}
+    missing = [video for video in videos if not os.path.isfile(video)]
+    if missing:
+        raise UsageError(f"Video not found: {missing[0]}" + (f" (and {len(missing) - 1} more)" if len(missing) > 1 else ""))
+
+    api_key = resolve_api_key(args, config)
+    if not api_key:
+        raise UsageError("No API key; pass --api-key or set GEMINI_API_KEY")
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    Metrics.configure(config.get("metrics"))
+    client = GeminiClient.from_config(api_key, config)
+    batch_id = batch["id"] if batch else job_store.create_batch(rubric_keys, args.model)
+    exporter = None if args.no_export else ResultExporter.from_config(config, args.export_dir)
+
+    reports = []
+
+    def write_report(video_path, result, rubric_key):
+        rubric = rubrics[rubric_key or rubric_keys[0]]
+        items, summary = ReportRenderer.rows_for_rubric(rubric["items"], result)
+        future = ReportRenderer.submit(video_path, rubric, items, summary, rubric_key, args.output_dir)
+        future.add_done_callback(lambda f: reports.append(f.result()) if f.exception() is None else None)
+        return future
+
+    def on_started(video_name, idx, total, completed):
+        log(f"[Batch] Starting {video_name} ({idx + 1}/{total})")
+
+    def on_completed(video_name, completed, total, successful, failed_count, error_summary):
+        status = "done" if error_summary is None else f"FAILED: {error_summary}"
+        log(f"[Batch] {completed}/{total} {video_name} {status}")
+
+    pipeline = BatchPipeline(
+        client,
+        rubrics,
+        args.model,
+        api_key,
+        write_report,
+        on_started=on_started,
+        on_completed=on_completed,
+        concurrency=args.concurrency or config.get("batch_concurrency"),
+        force_refresh=args.force_refresh,
+        prompt_cache=PromptCache() if config.get("context_cache", True) and len(videos) > 1 else None,
+        job_store=job_store,
+        batch_id=batch_id,
+        exporter=exporter
+    )
+
+    log(f"[Batch] {len(videos)} video(s), rubrics: {', '.join(rubric_keys)}, model: {args.model}")
+    started = time.monotonic()
+    hits_before = ResultCache.stats()["hits"]
+    retries_before = RateLimiter.shared().throttled_count
+    successful, failed, total = pipeline.run(videos)
+    if not failed:
+        job_store.close_batch(batch_id)
+
+    if successful == total:
+        exit_code = EXIT_OK
+    elif successful > 0:
+        exit_code = EXIT_PARTIAL
+    else:
+        exit_code = EXIT_ALL_FAILED
+    return {
+        "total": total,
+        "successful": successful,
+        "failed": [{"video": name, "error": error} for name, error in failed],
+        "reports": reports,
+        "batch_id": batch_id,
+        "rubrics": rubric_keys,
+        "model": args.model,
+        "cache_hits": ResultCache.stats()["hits"] - hits_before,
+        "rate_limited_retries": RateLimiter.shared().throttled_count - retries_before,
+        "stages": pipeline.summary(),
+        "export": {"dir": exporter.export_dir, "format": exporter.columnar_format,
+                   "rows": exporter.rows_written} if exporter else None,
+        "elapsed_seconds": round(time.monotonic() - started, 3),
+        "exit_code": exit_code
+    }
+
+
+def write_summary(summary, destination):
+    text = json.dumps(summary, indent=2)
+    if destination == "-":
+        print(text)
+    else:
+        with open(destination, "w") as f:
+            f.write(text + "\n")
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.list_rubrics:
+        for key in RubricManager.get_rubrics():
+            print(key)
+        return EXIT_OK
+
+    try:
+        summary = run(args)
+    except UsageError as e:
+        log(f"[Batch] Error: {e}")
+        if args.summary_json:
+            write_summary({"error": str(e), "exit_code": EXIT_USAGE}, args.summary_json)
+        return EXIT_USAGE
+
+    log(f"[Batch] {summary['successful']}/{summary['total']} successful in {summary['elapsed_seconds']:.0f}s")
+    for failure in summary["failed"]:
+        log(f"[Batch]   {failure['video']}: {failure['error']}")
+    if args.summary_json:
+        write_summary(summary, args.summary_json)
+    return summary["exit_code"]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,4424 @@
+"""
+MedVAT engine: rubrics, Gemini access, batch pipeline and PDF reports.
+
+Nothing in this module imports tkinter or customtkinter, so it can be used
+by the desktop app (medvat_app.py) and the headless runner (medvat_cli.py).
+The Gemini SDK and ReportLab are imported on first use, so importing this
+module is cheap.
+"""
+import threading
+import queue
+import collections
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+import time
+import json
+import os
+import re
+import hashlib
+import logging
+import logging.handlers
+import shutil
+import socket
+import sqlite3
+import subprocess
+from datetime import datetime, timedelta
+
+class RubricManager:
+    """
+    Manages the definitions of different assessment rubrics.
+    """
+    @staticmethod
+    def get_rubrics():
+        return {
+            "Suturing: Simple Interrupted": {
+                "title": "Simple Interrupted Suture Assessment",
+                "category": "Suturing",
+                "subcategory": "Simple Interrupted",
+                "items": [
+                    {"name": "Perpendicular needle passes", "type": "likert", "desc": "Needle enters/exits at ~90°, symmetric bites."},
+                    {"name": "Gentle tissue handling", "type": "likert", "desc": "Use of forceps without crushing or repeated grasping. Single clean grasp per edge, no trauma."},
+                    {"name": "Square, secure knots", "type": "likert", "desc": "Flat, square, properly tightened, not loose."},
+                    {"name": "Appropriate tension", "type": "likert", "desc": "Skin edges meet without squeezing or gaps. Edges just touch, no blanching or puckering."},
+                    {"name": "Even spacing", "type": "likert", "desc": "Distance between stitches. Each 0.5-1cm apart, uniform."},
+                    {"name": "Dermal and epidermal apposition", "type": "likert", "desc": "How well layers meet. Layers aligned; mild eversion fine but not required."},
+                    {"name": "Economy of motion", "type": "likert", "desc": "Efficiency during suturing. Hands stay close to field, minimal unnecessary motion."}
+                ]
+            },
+            "Suturing: Vertical Mattress": {
+                "title": "Vertical Mattress Suture Assessment",
+                "category": "Suturing",
+                "subcategory": "Vertical Mattress",
+                "items": [
+                    {"name": "Correct far-far and near-near", "type": "likert", "desc": "Placement of deep and superficial bites. Deep supports wound, shallow closes skin."},
+                    {"name": "Gentle tissue handling", "type": "likert", "desc": "Avoiding rough handling. Single, light grasps per edge."},
+                    {"name": "Square, secure knots", "type": "likert", "desc": "Knot integrity. Flat, tight, not slipping."},
+                    {"name": "Balanced deep/superficial tension", "type": "likert", "desc": "Relationship between inner and outer tension. Deep supports wound, superficial not strangling tissue."},
+                    {"name": "Even spacing", "type": "likert", "desc": "Stitch intervals. Consistent, 0.5-1cm apart."},
+                    {"name": "Proper eversion", "type": "likert", "desc": "Skin edges slightly raised. Uniform ridge, no inversion."},
+                    {"name": "Economy of motion", "type": "likert", "desc": "Efficiency. Few wasted movements, steady rhythm."}
+                ]
+            },
+            "Suturing: Subcuticular": {
+                "title": "Subcuticular Suture Assessment",
+                "category": "Suturing",
+                "subcategory": "Subcuticular",
+                "items": [
+                    {"name": "Consistent dermal bites", "type": "likert", "desc": "Depth and spacing of bites in continuous run. Smooth, even rhythm without irregular spacing."},
+                    {"name": "Entry/exit symmetry", "type": "likert", "desc": "How evenly left and right bites mirror. Same depth and offset each side."},
+                    {"name": "No unintended surface breaches", "type": "likert", "desc": "Whether suture stays beneath epidermis. Only start/finish exposed; no loops outside."},
+                    {"name": "Gentle tissue handling", "type": "likert", "desc": "Smooth needle driving and tension control. Controlled, atraumatic, no heavy pressure."},
+                    {"name": "Square, secure knots", "type": "likert", "desc": "Knot formation and concealment. Square, tight, hidden or buried."},
+                    {"name": "Flat skin approximation", "type": "likert", "desc": "Final cosmetic appearance. Smooth surface, no ridges or gaps."},
+                    {"name": "Economy of motion", "type": "likert", "desc": "Efficiency and organization. Continuous, confident workflow, few interruptions."}
+                ]
+            },
+            "Suturing: Auto-Detect": {
+                "title": "Suturing Assessment (Pattern Auto-Detected)",
+                "category": "Suturing",
+                "subcategory": "Auto-Detect",
+                "items": [
+                    {"name": "Perpendicular needle passes", "type": "likert", "desc": "Needle enters/exits at ~90°, symmetric bites."},
+                    {"name": "Gentle tissue handling", "type": "likert", "desc": "Use of forceps without crushing or repeated grasping."},
+                    {"name": "Square, secure knots", "type": "likert", "desc": "Flat, square, properly tightened, not loose."},
+                    {"name": "Appropriate tension", "type": "likert", "desc": "Skin edges meet without squeezing or gaps."},
+                    {"name": "Even spacing", "type": "likert", "desc": "Distance between stitches. Each 0.5-1cm apart, uniform."},
+                    {"name": "Economy of motion", "type": "likert", "desc": "Efficiency during suturing. Hands stay close to field, minimal unnecessary motion."}
+                ],
+                "auto_detect": True
+            },
+            "Chest Tube Insertion VOP": {
+                "title": "VOP - Chest Tube Insertion",
+                "category": "Procedures",
+                "subcategory": None,
+                "items": [
+                    {"name": "Selects appropriate site for incision - mid axillary", "type": "binary", "desc": ""},
+                    {"name": "Infiltrates local anesthetic at appropriate site", "type": "binary", "desc": ""},
+                    {"name": "2 cm transverse incision through skin", "type": "binary", "desc": ""},
+                    {"name": "Uses a Kelly to bluntly dissect down to chest wall", "type": "binary", "desc": ""},
+                    {"name": "Blunt dissection on top of rib one interspace higher than incision", "type": "binary", "desc": ""},
+                    {"name": "Dissects with gentle pressure through intercostals muscles, enters pleura", "type": "binary", "desc": ""},
+                    {"name": "Grasps tube with Kelly, carefully", "type": "binary", "desc": ""},
+                    {"name": "Advances chest tube past the last tube hole", "type": "binary", "desc": ""},
+                    {"name": "Secures chest tube with a suture", "type": "binary", "desc": ""},
+                    {"name": "Economy of Time and Motion", "type": "likert", "desc": "Many unnecessary / disorganized movements (1) → Organized time / motion, some unnecessary movements (3) → Maximum economy of movement and efficiency (5)"},
+                    {"name": "Final Rating / Demonstrates Proficiency", "type": "binary", "desc": ""}
+                ]
+            },
+            "Standardized Patient Encounter": {
+                "title": "SP Communication Assessment",
+                "category": "Communication",
+                "subcategory": None,
+                "items": [
+                    {"name": "Introduction & Role ID", "type": "likert", "desc": "Clear introduction."},
+                    {"name": "Open-ended questioning", "type": "likert", "desc": "Starts broad before narrowing."},
+                    {"name": "Empathy & Validation", "type": "likert", "desc": "Acknowledges patient emotion."},
+                    {"name": "No Medical Jargon", "type": "likert", "desc": "Uses lay terms."},
+                    {"name": "Closure & Teach-back", "type": "likert", "desc": "Ensures patient understanding."}
+                ]
+            }
+        }
+    
+    @staticmethod
+    def get_rubrics_by_category():
+        """Organize rubrics by category for hierarchical display."""
+        rubrics = RubricManager.get_rubrics()
+        categories = {}
+        
+        for key, rubric in rubrics.items():
+            category = rubric.get("category", "Other")
+            if category not in categories:
+                categories[category] = []
+            categories[category].append((key, rubric))
+        
+        return categories
+    
+    @staticmethod
+    def get_suturing_pattern_rubrics():
+        """Map each suturing technique name to its rubric, e.g. "Subcuticular" -> rubric."""
+        return {
+            rubric["subcategory"]: rubric
+            for rubric in RubricManager.get_rubrics().values()
+            if rubric.get("category") == "Suturing" and not rubric.get("auto_detect", False)
+        }
+
+class ErrorHandler:
+    """
+    Provides user-friendly error messages with actionable steps.
+    """
+    @staticmethod
+    def format_error(error_type, error_details, is_fatal=False):
+        """
+        Format error messages in plain English with actionable steps.
+        
+        Args:
+            error_type: Type of error (e.g., "Video Upload Failed", "API Error")
+            error_details: Detailed error message
+            is_fatal: Whether this error requires abandoning the assessment
+        
+        Returns:
+            Formatted error message with steps to resolve
+        """
+        base_message = f"{error_type}\n\nDetails: {error_details}\n\n"
+        
+        if is_fatal:
+            base_message += "⚠️ FATAL ERROR: This assessment cannot be completed.\n\n"
+        else:
+            base_message += "ℹ️ This error may be recoverable. Please try the steps below.\n\n"
+        
+        # Error-specific guidance
+        if "404" in error_details or "not found" in error_details.lower():
+            return base_message + """HOW TO FIX:
+1. Check that your API key has access to the selected model
+2. Try switching to a different model (e.g., gemini-2.5-flash)
+3. Verify your API key is correct and active
+4. Check Google AI Studio for model availability status"""
+        
+        elif "403" in error_details or "permission" in error_details.lower() or "forbidden" in error_details.lower():
+            return base_message + """HOW TO FIX:
+1. Verify your API key has the necessary permissions
+2. Check your Google Cloud project billing status
+3. Ensure your API key hasn't been revoked
+4. Try regenerating your API key from Google AI Studio"""
+        
+        elif "401" in error_details or "invalid" in error_details.lower() or "unauthorized" in error_details.lower():
+            return base_message + """HOW TO FIX:
+1. Check that your API key is correct (no extra spaces)
+2. Verify the API key is from Google AI Studio (not Google Cloud)
+3. Try pasting the API key again
+4. Generate a new API key if needed"""
+        
+        elif "timeout" in error_details.lower() or "timed out" in error_details.lower():
+            return base_message + """HOW TO FIX:
+1. Check your internet connection
+2. The video may be too large - try a shorter video
+3. Wait a few minutes and try again
+4. Check Google AI service status"""
+        
+        elif "file" in error_details.lower() and ("not found" in error_details.lower() or "cannot" in error_details.lower()):
+            return base_message + """HOW TO FIX:
+1. Verify the video file still exists at the original location
+2. Check that you have read permissions for the file
+3. Ensure the file isn't open in another program
+4. Try selecting the file again"""
+        
+        elif "json" in error_details.lower() or "parse" in error_details.lower() or "extra data" in error_details.lower():
+            return base_message + """HOW TO FIX:
+1. This is usually a temporary AI response issue
+2. Try running the analysis again
+3. If it persists, try switching to a different model
+4. The video assessment may need to be abandoned if this continues"""
+        
+        elif "video processing failed" in error_details.lower() or "upload" in error_details.lower():
+            return base_message + """HOW TO FIX:
+1. Check that the video file is a valid format (MP4, MOV, AVI, MKV)
+2. Ensure the video file isn't corrupted
+3. Try converting the video to MP4 format
+4. Check file size - very large files may timeout"""
+        
+        elif "quota" in error_details.lower() or "limit" in error_details.lower() or "rate limit" in error_details.lower():
+            return base_message + """HOW TO FIX:
+1. You've reached your API usage limit
+2. Wait a few minutes before trying again
+3. Check your Google AI Studio quota limits
+4. Consider upgrading your API tier if needed"""
+        
+        else:
+            return base_message + """HOW TO FIX:
+1. Try running the analysis again
+2. Check your internet connection
+3. Verify your API key is valid
+4. If the error persists, try restarting the application
+5. Contact support if the problem continues"""
+
+    # Checked in order; the first class whose patterns appear wins
+    ERROR_CLASSES = (
+        ("file", ("video file not found", "permission denied", "no such file")),
+        ("auth", ("401", "403", "unauthorized", "forbidden", "api key")),
+        ("quota", ("429", "quota", "resource has been exhausted", "rate limit")),
+        ("network", ("timeout", "timed out", "connection", "network", "unreachable", "name resolution",
+                     "temporarily unavailable", "503", "ssl", "socket")),
+        ("response", ("json", "parse", "extra data", "malformed")),
+        ("server", ("500", "internal error", "video processing failed")),
+    )
+
+    @staticmethod
+    def classify(error_details):
+        """
+        Sort an error message into a class used to decide how to retry it:
+        file, auth, quota, network, response, server or other.
+        """
+        text = (error_details or "").lower()
+        for error_class, patterns in ErrorHandler.ERROR_CLASSES:
+            if any(pattern in text for pattern in patterns):
+                return error_class
+        return "other"
+
+class ConfigManager:
+    """
+    Manages saving and loading configuration (API key).
+    """
+    CONFIG_FILE = "medvat_config.json"
+    
+    @staticmethod
+    def load_config():
+        """Load configuration from file."""
+        if os.path.exists(ConfigManager.CONFIG_FILE):
+            try:
+                with open(ConfigManager.CONFIG_FILE, 'r') as f:
+                    return json.load(f)
+            except Exception:
+                return {}
+        return {}
+    
+    @staticmethod
+    def save_config(config):
+        """Save configuration to file."""
+        try:
+            with open(ConfigManager.CONFIG_FILE, 'w') as f:
+                json.dump(config, f, indent=2)
+        except Exception as e:
+            print(f"Error saving config: {e}")
+
+class Metrics:
+    """
+    Per-stage timings and counters for uploads, processing waits, pattern
+    detection, generation, parsing and reports.
+    
+    Every event is appended to a rotating JSONL file in the app's cache
+    folder (next to this module, whatever the working directory);
+    aggregates can also be served in Prometheus text format on a local
+    port (start_server).
+    """
+    LOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "medvat_cache", "medvat_metrics.jsonl")
+    MAX_LOG_BYTES = 5 * 1024 * 1024
+    LOG_BACKUPS = 3
+    BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+    enabled = True
+    _lock = threading.Lock()
+    _logger = None
+    _durations = {}  # (stage, outcome) -> {"count", "sum", "buckets"}
+    _counters = {}  # (name, sorted label items) -> value
+    _server = None
+
+    @staticmethod
+    def configure(settings):
+        """Apply the "metrics" config block: {"enabled", "prometheus_port"}."""
+        settings = settings or {}
+        Metrics.enabled = settings.get("enabled", True)
+        if Metrics.enabled and settings.get("prometheus_port"):
+            Metrics.start_server(settings["prometheus_port"])
+
+    @staticmethod
+    def record(stage, seconds, outcome="ok", bytes_count=None, **labels):
+        """Record one finished stage with its duration and outcome."""
+        if not Metrics.enabled:
+            return
+        with Metrics._lock:
+            entry = Metrics._durations.setdefault(
+                (stage, outcome), {"count": 0, "sum": 0.0, "buckets": [0] * len(Metrics.BUCKETS)}
+            )
+            entry["count"] += 1
+            entry["sum"] += seconds
+            for i, bound in enumerate(Metrics.BUCKETS):
+                if seconds <= bound:
+                    entry["buckets"][i] += 1
+            if bytes_count:
+                key = ("stage_bytes_total", (("stage", stage),))
+                Metrics._counters[key] = Metrics._counters.get(key, 0) + bytes_count
+        event = {"stage": stage, "seconds": round(seconds, 3), "outcome": outcome}
+        if bytes_count is not None:
+            event["bytes"] = bytes_count
+        event.update(labels)
+        Metrics._write(event)
+
+    @staticmethod
+    def increment(name, amount=1, **labels):
+        """Add to a counter such as api_retries_total."""
+        if not Metrics.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with Metrics._lock:
+            Metrics._counters[key] = Metrics._counters.get(key, 0) + amount
+
+    @staticmethod
+    def event(kind, **fields):
+        """Write a free-form event (e.g. a batch summary) to the log."""
+        if Metrics.enabled:
+            Metrics._write(dict(fields, event=kind))
+
+    @staticmethod
+    def _write(event):
+        event["ts"] = datetime.now().isoformat(timespec="milliseconds")
+        try:
+            with Metrics._lock:
+                if Metrics._logger is None:
+                    logger = logging.getLogger("medvat.metrics")
+                    logger.setLevel(logging.INFO)
+                    logger.propagate = False
+                    os.makedirs(os.path.dirname(Metrics.LOG_FILE), exist_ok=True)
+                    handler = logging.handlers.RotatingFileHandler(
+                        Metrics.LOG_FILE, maxBytes=Metrics.MAX_LOG_BYTES, backupCount=Metrics.LOG_BACKUPS
+                    )
+                    handler.setFormatter(logging.Formatter("%(message)s"))
+                    logger.addHandler(handler)
+                    Metrics._logger = logger
+            Metrics._logger.info(json.dumps(event, default=str))
+        except Exception as e:
+            print(f"[Metrics] Could not write metrics log: {e}")
+
+    @staticmethod
+    def render_prometheus():
+        """Return all aggregates in Prometheus text exposition format."""
+        def label_text(items):
+            return ",".join('%s="%s"' % (key, str(value).replace('"', "'")) for key, value in items)
+        
+        with Metrics._lock:
+            durations = {key: dict(value, buckets=list(value["buckets"])) for key, value in Metrics._durations.items()}
+            counters = dict(Metrics._counters)
+        lines = [
+            "# HELP medvat_stage_seconds Time spent per pipeline stage",
+            "# TYPE medvat_stage_seconds histogram"
+        ]
+        for (stage, outcome), entry in sorted(durations.items()):
+            labels = label_text((("stage", stage), ("outcome", outcome)))
+            for bound, count in zip(Metrics.BUCKETS, entry["buckets"]):
+                lines.append(f'medvat_stage_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'medvat_stage_seconds_bucket{{{labels},le="+Inf"}} {entry["count"]}')
+            lines.append(f"medvat_stage_seconds_sum{{{labels}}} {entry['sum']:.3f}")
+            lines.append(f"medvat_stage_seconds_count{{{labels}}} {entry['count']}")
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f"# TYPE medvat_{name} counter")
+            for (counter_name, items), value in sorted(counters.items()):
+                if counter_name == name:
+                    lines.append(f"medvat_{name}{{{label_text(items)}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def start_server(port):
+        """Serve /metrics on 127.0.0.1:port from a background thread."""
+        if Metrics._server is not None:
+            return
+        import http.server  # Only needed when the endpoint is enabled
+        
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = Metrics.render_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        try:
+            Metrics._server = http.server.ThreadingHTTPServer(("127.0.0.1", int(port)), Handler)
+        except OSError as e:
+            print(f"[Metrics] Could not start metrics server on port {port}: {e}")
+            return
+        threading.Thread(target=Metrics._server.serve_forever, daemon=True).start()
+        print(f"[Metrics] Serving Prometheus metrics on http://127.0.0.1:{port}/metrics")
+
+class GeminiBackend:
+    """
+    Interface for everything the app asks of the Gemini API. GenAIBackend
+    talks to google.generativeai; other implementations (e.g. the offline
+    fake in benchmarks/fake_gemini.py) can be installed with set_current()
+    or by passing backend= to GeminiClient.
+    
+    File objects returned by upload_file/get_file/list_files need .name,
+    .state.name, .size_bytes and optionally .video_metadata; responses need
+    .text and optionally .usage_metadata (stream=True yields chunks with .text).
+    """
+    _current = None
+    _current_lock = threading.Lock()
+
+    @staticmethod
+    def current():
+        """Return the backend used by the whole process."""
+        with GeminiBackend._current_lock:
+            if GeminiBackend._current is None:
+                GeminiBackend._current = GenAIBackend()
+            return GeminiBackend._current
+
+    @staticmethod
+    def set_current(backend):
+        with GeminiBackend._current_lock:
+            GeminiBackend._current = backend
+
+    def configure(self, api_key):
+        raise NotImplementedError
+
+    def upload_file(self, path):
+        raise NotImplementedError
+
+    def get_file(self, name):
+        raise NotImplementedError
+
+    def list_files(self):
+        raise NotImplementedError
+
+    def delete_file(self, name):
+        raise NotImplementedError
+
+    def list_models(self):
+        raise NotImplementedError
+
+    def get_model(self, name):
+        """Return metadata for one model ("models/<id>"); raises if it doesn't exist."""
+        raise NotImplementedError
+
+    def generate_content(self, model_name, contents, generation_config=None, stream=False, timeout=600, cached_content=None):
+        raise NotImplementedError
+
+    def create_cached_content(self, model_name, contents, ttl, display_name=None):
+        """Return a cache object with update(ttl=...) and delete()."""
+        raise NotImplementedError
+
+class GenAIBackend(GeminiBackend):
+    """
+    GeminiBackend backed by the google.generativeai module. The SDK (and its
+    gRPC/protobuf stack) is imported on the first call, not at startup.
+    """
+    def __init__(self):
+        self._genai = None
+        self._import_lock = threading.Lock()
+
+    @property
+    def genai(self):
+        if self._genai is None:
+            with self._import_lock:
+                if self._genai is None:
+                    started = time.monotonic()
+                    import google.generativeai as genai
+                    self._genai = genai
+                    print(f"[Gemini] SDK loaded in {time.monotonic() - started:.2f}s")
+        return self._genai
+
+    def configure(self, api_key):
+        self.genai.configure(api_key=api_key)
+
+    def upload_file(self, path):
+        return self.genai.upload_file(path=path)
+
+    def get_file(self, name):
+        return self.genai.get_file(name)
+
+    def list_files(self):
+        return list(self.genai.list_files())
+
+    def delete_file(self, name):
+        self.genai.delete_file(name)
+
+    def list_models(self):
+        return list(self.genai.list_models())
+
+    def get_model(self, name):
+        return self.genai.get_model(name)
+
+    def generate_content(self, model_name, contents, generation_config=None, stream=False, timeout=600, cached_content=None):
+        if cached_content is not None:
+            model = self.genai.GenerativeModel.from_cached_content(cached_content=cached_content)
+        else:
+            model = self.genai.GenerativeModel(model_name=model_name)
+        return model.generate_content(
+            contents,
+            generation_config=generation_config,
+            stream=stream,
+            request_options={"timeout": timeout}
+        )
+
+    def create_cached_content(self, model_name, contents, ttl, display_name=None):
+        return self.genai.caching.CachedContent.create(
+            model=model_name if model_name.startswith("models/") else f"models/{model_name}",
+            display_name=display_name,
+            contents=contents,
+            ttl=ttl
+        )
+
+class RateLimiter:
+    """
+    Process-wide limiter that every Gemini API call goes through.
+    
+    Enforces requests-per-minute and tokens-per-minute budgets over a
+    sliding one-minute window, and caps concurrent uploads/generations with
+    an AIMD limit: each successful call adds 1/limit (so roughly +1 per
+    "round"), while a 429 or a latency spike cuts the limit (halve / x0.75).
+    Rate-limited calls pause every worker briefly and are retried with
+    exponential backoff instead of failing the video.
+    """
+    DEFAULT_LIMITS = {"rpm": 60, "tpm": 1000000, "max_concurrency": 8}
+    WINDOW_SECONDS = 60  # rpm/tpm are measured over this window
+    HEAVY_CALLS = ("upload", "generate")  # Calls that take a concurrency slot
+    INITIAL_CONCURRENCY = 2
+    MIN_CONCURRENCY = 1
+    DECREASE_COOLDOWN = 5  # Seconds between multiplicative cuts
+    LATENCY_FACTOR = 2.5  # Latency this many times the average counts as a spike
+    LATENCY_MIN_SAMPLES = 5
+    MAX_RETRIES = 4
+    BASE_BACKOFF = 5
+    MAX_BACKOFF = 60
+    # Rough token cost of video input (frames + audio) for TPM accounting
+    VIDEO_TOKENS_PER_SECOND = 300
+    DEFAULT_VIDEO_SECONDS = 300
+    OUTPUT_TOKEN_ALLOWANCE = 2000
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    @staticmethod
+    def shared():
+        """Return the limiter shared by the whole process."""
+        with RateLimiter._shared_lock:
+            if RateLimiter._shared is None:
+                RateLimiter._shared = RateLimiter()
+            return RateLimiter._shared
+
+    def __init__(self, limits=None):
+        self._cond = threading.Condition()
+        self._requests = collections.deque()  # Timestamps of recent calls
+        self._tokens = collections.deque()  # (timestamp, tokens) of recent calls
+        self._token_total = 0
+        self._active = 0
+        self._limit = float(RateLimiter.INITIAL_CONCURRENCY)
+        self._last_decrease = 0
+        self._paused_until = 0
+        self._latency = {}  # kind -> (average, samples)
+        self.throttled_count = 0
+        self.configure(limits)
+
+    def configure(self, limits=None):
+        """Apply rpm/tpm/max_concurrency overrides (e.g. config["rate_limits"])."""
+        merged = dict(RateLimiter.DEFAULT_LIMITS)
+        merged.update({key: value for key, value in (limits or {}).items() if key in merged})
+        with self._cond:
+            self.rpm = max(1, int(merged["rpm"]))
+            self.tpm = max(1, int(merged["tpm"]))
+            self.max_concurrency = max(RateLimiter.MIN_CONCURRENCY, int(merged["max_concurrency"]))
+            self._limit = min(self._limit, self.max_concurrency)
+            self._cond.notify_all()
+
+    def concurrency_limit(self):
+        """Current number of uploads/generations allowed at once."""
+        with self._cond:
+            return int(self._limit)
+
+    def call(self, kind, fn, *args, tokens=0, **kwargs):
+        """
+        Run fn(*args, **kwargs) within the limits, retrying on 429s.
+        kind names the call ("generate", "upload", "get_file", ...); tokens
+        is the estimated token cost for TPM accounting.
+        """
+        for attempt in range(RateLimiter.MAX_RETRIES + 1):
+            self._acquire(kind, tokens)
+            started = time.time()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                self._failed(kind, e, started, attempt)
+                continue
+            self._release(kind, time.time() - started, False)
+            return result
+
+    def call_stream(self, kind, fn, *args, tokens=0, **kwargs):
+        """
+        Like call(), for a streaming response: returns a RateLimitedStream
+        that holds the concurrency slot, and times the call, until the
+        stream has been read to the end. Rate-limit errors raised before
+        the first chunk are retried.
+        """
+        for attempt in range(RateLimiter.MAX_RETRIES + 1):
+            self._acquire(kind, tokens)
+            started = time.time()
+            try:
+                response = fn(*args, **kwargs)
+                chunks = iter(response)
+                first = next(chunks, RateLimitedStream.END)
+            except Exception as e:
+                self._failed(kind, e, started, attempt)
+                continue
+            return RateLimitedStream(self, kind, started, response, chunks, first)
+
+    def _failed(self, kind, error, started, attempt):
+        """Release a failed call's slot; re-raise unless it should be retried."""
+        throttled = RateLimiter.is_rate_limit_error(error)
+        self._release(kind, time.time() - started, throttled)
+        if not throttled or attempt == RateLimiter.MAX_RETRIES:
+            Metrics.increment("api_errors_total", call=kind, throttled=throttled)
+            raise error
+        Metrics.increment("api_retries_total", call=kind)
+        delay = min(RateLimiter.MAX_BACKOFF, RateLimiter.BASE_BACKOFF * (2 ** attempt))
+        print(f"[Rate Limiter] {kind} rate limited, retrying in {delay}s (attempt {attempt + 1})")
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.time() + delay)
+
+    def record_tokens(self, delta):
+        """Correct the TPM window once the actual token count is known."""
+        if not delta:
+            return
+        with self._cond:
+            self._tokens.append((time.time(), delta))
+            self._token_total += delta
+            self._cond.notify_all()
+
+    @staticmethod
+    def is_rate_limit_error(error):
+        text = str(error).lower()
+        return (
+            type(error).__name__ in ("ResourceExhausted", "TooManyRequests")
+            or "429" in text
+            or "resource exhausted" in text
+            or "rate limit" in text
+        )
+
+    @staticmethod
+    def estimate_tokens(video_file, prompt):
+        """Estimate the token cost of a generation for the TPM budget."""
+        seconds = RateLimiter.DEFAULT_VIDEO_SECONDS
+        try:
+            seconds = video_file.video_metadata.video_duration.total_seconds() or seconds
+        except Exception:
+            pass
+        return int(seconds * RateLimiter.VIDEO_TOKENS_PER_SECOND + len(prompt) / 4 + RateLimiter.OUTPUT_TOKEN_ALLOWANCE)
+
+    def _prune(self, now):
+        window = RateLimiter.WINDOW_SECONDS
+        while self._requests and now - self._requests[0] >= window:
+            self._requests.popleft()
+        while self._tokens and now - self._tokens[0][0] >= window:
+            self._token_total -= self._tokens.popleft()[1]
+
+    def _acquire(self, kind, tokens):
+        heavy = kind in RateLimiter.HEAVY_CALLS
+        with self._cond:
+            while True:
+                now = time.time()
+                self._prune(now)
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif len(self._requests) >= self.rpm:
+                    wait = self._requests[0] + RateLimiter.WINDOW_SECONDS - now
+                elif tokens and self._tokens and self._token_total + tokens > self.tpm:
+                    wait = self._tokens[0][0] + RateLimiter.WINDOW_SECONDS - now
+                elif heavy and self._active >= int(self._limit):
+                    wait = None  # Until a slot is released
+                else:
+                    break
+                self._cond.wait(None if wait is None else max(wait, 0.05))
+            self._requests.append(now)
+            if tokens:
+                self._tokens.append((now, tokens))
+                self._token_total += tokens
+            if heavy:
+                self._active += 1
+
+    def _release(self, kind, latency, throttled):
+        with self._cond:
+            if kind in RateLimiter.HEAVY_CALLS:
+                self._active -= 1
+            now = time.time()
+            average, samples = self._latency.get(kind, (latency, 0))
+            spike = (
+                samples >= RateLimiter.LATENCY_MIN_SAMPLES
+                and latency > average * RateLimiter.LATENCY_FACTOR
+            )
+            if throttled:
+                self.throttled_count += 1
+                self._decrease(0.5, now)
+            elif spike and kind in RateLimiter.HEAVY_CALLS:
+                self._decrease(0.75, now)
+            elif kind in RateLimiter.HEAVY_CALLS:
+                self._limit = min(self.max_concurrency, self._limit + 1 / self._limit)
+            if not throttled:
+                # Running mean for the first samples, then an EWMA
+                weight = max(1 / (samples + 1), 0.1)
+                self._latency[kind] = (average + (latency - average) * weight, samples + 1)
+            self._cond.notify_all()
+
+    def _decrease(self, factor, now):
+        # One cut per cooldown, so a burst of concurrent failures counts once
+        if now - self._last_decrease < RateLimiter.DECREASE_COOLDOWN:
+            return
+        self._last_decrease = now
+        previous = int(self._limit)
+        self._limit = max(RateLimiter.MIN_CONCURRENCY, self._limit * factor)
+        if int(self._limit) < previous:
+            print(f"[Rate Limiter] Concurrency limit reduced to {int(self._limit)}")
+
+class RateLimitedStream:
+    """
+    A streamed response from RateLimiter.call_stream(). Iterating yields the
+    chunks; the limiter slot is released, with the full streaming time as
+    the call's latency, once the stream ends, fails or is abandoned.
+    Other attributes (e.g. usage_metadata) come from the response.
+    """
+    END = object()
+
+    def __init__(self, limiter, kind, started, response, chunks, first):
+        self._limiter = limiter
+        self._kind = kind
+        self._started = started
+        self._response = response
+        self._chunks = chunks
+        self._first = first
+        self._released = False
+
+    def __iter__(self):
+        try:
+            if self._first is not RateLimitedStream.END:
+                yield self._first
+                for chunk in self._chunks:
+                    yield chunk
+        except Exception as e:
+            self._release(RateLimiter.is_rate_limit_error(e))
+            raise
+        finally:
+            self._release(False)
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def __del__(self):
+        self._release(False)
+
+    def _release(self, throttled):
+        if self._released:
+            return
+        self._released = True
+        self._limiter._release(self._kind, time.time() - self._started, throttled)
+
+class UploadRegistry:
+    """
+    Remembers which videos are already uploaded to Gemini, keyed by a fast
+    content hash, so retries and re-runs reuse the remote file instead of
+    uploading the same video again.
+    """
+    REGISTRY_FILE = "medvat_uploads.json"
+    HASH_SAMPLE_SIZE = 1024 * 1024  # Hash 1 MB from the start, middle and end
+    TTL_SECONDS = 24 * 60 * 60  # Delete our remote copy a day after upload
+    REMOTE_LIFETIME = 48 * 60 * 60  # Gemini expires uploaded files after 48 hours
+    EXPIRY_MARGIN = 60 * 60  # Don't reuse a file that expires within the hour
+    MAX_ENTRIES = 50
+
+    _lock = threading.RLock()
+    _hash_memo = {}
+
+    @staticmethod
+    def content_hash(video_path):
+        """
+        Hash the file size plus three 1 MB samples of the video.
+        Reading a few MB instead of the whole file keeps this fast for
+        multi-hundred-MB recordings while still telling videos apart.
+        """
+        stat = os.stat(video_path)
+        memo_key = (os.path.abspath(video_path), stat.st_size, stat.st_mtime_ns)
+        cached = UploadRegistry._hash_memo.get(memo_key)
+        if cached:
+            return cached
+
+        sample = UploadRegistry.HASH_SAMPLE_SIZE
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(str(stat.st_size).encode())
+        with open(video_path, 'rb') as f:
+            if stat.st_size <= sample * 3:
+                digest.update(f.read())
+            else:
+                for offset in (0, stat.st_size // 2, stat.st_size - sample):
+                    f.seek(offset)
+                    digest.update(f.read(sample))
+
+        content_hash = digest.hexdigest()
+        UploadRegistry._hash_memo[memo_key] = content_hash
+        return content_hash
+
+    @staticmethod
+    def _load():
+        if os.path.exists(UploadRegistry.REGISTRY_FILE):
+            try:
+                with open(UploadRegistry.REGISTRY_FILE, 'r') as f:
+                    return json.load(f)
+            except Exception:
+                return {}
+        return {}
+
+    @staticmethod
+    def _save(entries):
+        try:
+            tmp_file = UploadRegistry.REGISTRY_FILE + ".tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump(entries, f, indent=2)
+            os.replace(tmp_file, UploadRegistry.REGISTRY_FILE)
+        except Exception as e:
+            print(f"[Upload Registry] Error saving registry: {e}")
+
+    @staticmethod
+    def _is_reusable(entry, now):
+        expires_at = min(
+            entry["uploaded_at"] + UploadRegistry.TTL_SECONDS,
+            entry["remote_expires_at"] - UploadRegistry.EXPIRY_MARGIN
+        )
+        return now < expires_at
+
+    @staticmethod
+    def reuse(content_hash):
+        """
+        Return the remote file for this video if it is still usable
+        (ACTIVE or PROCESSING), otherwise None.
+        """
+        with UploadRegistry._lock:
+            entry = UploadRegistry._load().get(content_hash)
+        if not entry or not UploadRegistry._is_reusable(entry, time.time()):
+            return None
+
+        try:
+            video_file = RateLimiter.shared().call("get_file", GeminiBackend.current().get_file, entry["name"])
+        except Exception as e:
+            print(f"[Upload Registry] Remote file {entry['name']} no longer available: {e}")
+            UploadRegistry.forget(content_hash)
+            return None
+
+        if video_file.state.name in ("ACTIVE", "PROCESSING"):
+            print(f"[Upload Registry] Reusing {entry['name']} for {os.path.basename(entry.get('path', ''))}")
+            return video_file
+
+        UploadRegistry.forget(content_hash)
+        return None
+
+    @staticmethod
+    def register(content_hash, video_file, video_path):
+        """Record a freshly uploaded file."""
+        now = time.time()
+        remote_expires_at = now + UploadRegistry.REMOTE_LIFETIME
+        expiration_time = getattr(video_file, "expiration_time", None)
+        if expiration_time is not None:
+            try:
+                remote_expires_at = expiration_time.timestamp()
+            except Exception:
+                pass
+
+        with UploadRegistry._lock:
+            entries = UploadRegistry._load()
+            entries[content_hash] = {
+                "name": video_file.name,
+                "path": os.path.abspath(video_path),
+                "uploaded_at": now,
+                "remote_expires_at": remote_expires_at
+            }
+            UploadRegistry._save(entries)
+
+    @staticmethod
+    def forget(content_hash, delete_remote=False):
+        """Drop an entry, optionally deleting the remote file too."""
+        with UploadRegistry._lock:
+            entries = UploadRegistry._load()
+            entry = entries.pop(content_hash, None)
+            if entry is None:
+                return
+            UploadRegistry._save(entries)
+        if delete_remote:
+            try:
+                RateLimiter.shared().call("delete_file", GeminiBackend.current().delete_file, entry["name"])
+            except Exception as e:
+                print(f"[Upload Registry] Could not delete {entry['name']}: {e}")
+
+    @staticmethod
+    def evict_expired():
+        """
+        Delete remote files past their TTL and trim the registry to
+        MAX_ENTRIES, oldest first. Requires genai to be configured.
+        """
+        now = time.time()
+        with UploadRegistry._lock:
+            entries = UploadRegistry._load()
+            by_age = sorted(entries.items(), key=lambda kv: kv[1]["uploaded_at"], reverse=True)
+            keep = {}
+            evicted = []
+            for content_hash, entry in by_age:
+                if len(keep) < UploadRegistry.MAX_ENTRIES and UploadRegistry._is_reusable(entry, now):
+                    keep[content_hash] = entry
+                else:
+                    evicted.append(entry)
+            if not evicted:
+                return
+            UploadRegistry._save(keep)
+
+        for entry in evicted:
+            # Files past Gemini's own expiry are already gone
+            if now >= entry["remote_expires_at"]:
+                continue
+            try:
+                RateLimiter.shared().call("delete_file", GeminiBackend.current().delete_file, entry["name"])
+                print(f"[Upload Registry] Deleted expired upload {entry['name']}")
+            except Exception as e:
+                print(f"[Upload Registry] Could not delete {entry['name']}: {e}")
+
+class VideoTranscoder:
+    """
+    Optional pre-upload stage that shrinks recordings with a local ffmpeg.
+    
+    Phone and GoPro footage (4K/60fps HEVC) is far beyond what the model
+    samples, so a 720p, low-fps H.264 copy uploads and processes in a
+    fraction of the time. Transcodes are cached by the source content hash.
+    
+    The Files API needs a seekable file of known size, so ffmpeg writes
+    straight into the cache instead of piping into the upload; the cached
+    artifact is the only copy made.
+    """
+    CACHE_DIR = os.path.join("medvat_cache", "transcoded")
+    DEFAULT_PROFILE = {
+        "max_height": 720,  # Applied to the shorter side, so portrait video works too
+        "fps": 10,
+        "crf": 28,
+        "preset": "veryfast",
+        "audio_bitrate": "64k"  # Keep speech for SP encounters
+    }
+    MIN_SOURCE_MB = 20  # Smaller files aren't worth re-encoding
+    MAX_CACHE_BYTES = 5 * 1024 * 1024 * 1024
+    FFMPEG_TIMEOUT = 60 * 60
+
+    @staticmethod
+    def is_available():
+        return shutil.which("ffmpeg") is not None
+
+    @staticmethod
+    def profile_tag(profile):
+        """Short, stable id for a profile so different settings don't share cache entries."""
+        settings = dict(VideoTranscoder.DEFAULT_PROFILE)
+        settings.update(profile or {})
+        return hashlib.blake2b(json.dumps(settings, sort_keys=True).encode(), digest_size=4).hexdigest()
+
+    @staticmethod
+    def prepare(video_path, content_hash, profile=None, progress_callback=None):
+        """
+        Return (path_to_upload, upload_key). Falls back to the original file
+        and its content hash when ffmpeg is missing, the file is small, the
+        transcode fails, or the result isn't actually smaller.
+        """
+        source_size = os.path.getsize(video_path)
+        if source_size < VideoTranscoder.MIN_SOURCE_MB * 1024 * 1024:
+            return video_path, content_hash
+        if not VideoTranscoder.is_available():
+            print("[Transcoder] ffmpeg not found on PATH, uploading original video")
+            return video_path, content_hash
+
+        settings = dict(VideoTranscoder.DEFAULT_PROFILE)
+        settings.update(profile or {})
+        upload_key = f"{content_hash}-{VideoTranscoder.profile_tag(settings)}"
+        output_path = os.path.join(VideoTranscoder.CACHE_DIR, f"{upload_key}.mp4")
+
+        if not os.path.exists(output_path):
+            if progress_callback:
+                progress_callback("Compressing video before upload...", 0.05)
+            if not VideoTranscoder._transcode(video_path, output_path, settings):
+                return video_path, content_hash
+            VideoTranscoder._trim_cache()
+        else:
+            # Touch so cache trimming treats it as recently used
+            os.utime(output_path, None)
+
+        output_size = os.path.getsize(output_path)
+        if output_size >= source_size:
+            return video_path, content_hash
+        print(f"[Transcoder] {os.path.basename(video_path)}: {source_size / 1e6:.1f} MB -> {output_size / 1e6:.1f} MB")
+        return output_path, upload_key
+
+    @staticmethod
+    def _transcode(video_path, output_path, settings):
+        os.makedirs(VideoTranscoder.CACHE_DIR, exist_ok=True)
+        # Unique partial name so concurrent uploads of the same video don't collide
+        partial_path = f"{output_path}.{os.getpid()}-{threading.get_ident()}.part"
+        height = int(settings["max_height"])
+        scale = f"scale='if(gt(iw,ih),-2,min({height},iw))':'if(gt(iw,ih),min({height},ih),-2)'"
+        command = [
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+            "-i", video_path,
+            "-vf", f"{scale},fps={settings['fps']}",
+            "-c:v", "libx264", "-preset", str(settings["preset"]), "-crf", str(settings["crf"]),
+            "-pix_fmt", "yuv420p",
+            "-c:a", "aac", "-b:a", str(settings["audio_bitrate"]), "-ac", "1",
+            "-movflags", "+faststart",
+            "-f", "mp4", partial_path
+        ]
+        try:
+            completed = subprocess.run(
+                command,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                timeout=VideoTranscoder.FFMPEG_TIMEOUT
+            )
+            if completed.returncode != 0:
+                print(f"[Transcoder] ffmpeg failed: {completed.stderr.decode(errors='replace')[-300:]}")
+                return False
+            os.replace(partial_path, output_path)
+            return True
+        except Exception as e:
+            print(f"[Transcoder] Error transcoding {video_path}: {e}")
+            return False
+        finally:
+            if os.path.exists(partial_path):
+                try:
+                    os.remove(partial_path)
+                except OSError:
+                    pass
+
+    @staticmethod
+    def _trim_cache():
+        """Delete least recently used transcodes beyond MAX_CACHE_BYTES."""
+        try:
+            entries = []
+            with os.scandir(VideoTranscoder.CACHE_DIR) as it:
+                for entry in it:
+                    if entry.is_file() and entry.name.endswith(".mp4"):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= VideoTranscoder.MAX_CACHE_BYTES:
+                    break
+                os.remove(path)
+                total -= size
+        except Exception as e:
+            print(f"[Transcoder] Error trimming cache: {e}")
+
+class VideoSegmenter:
+    """
+    Splits long recordings into overlapping windows with a local ffmpeg so
+    each window can be analyzed separately and within the model timeout.
+    
+    Windows are cut with stream copy (no re-encode), so each one really
+    starts at the keyframe at or before its nominal start. split() probes
+    that keyframe and returns it as the window's start, so timestamps are
+    rebased onto the original timeline without up to a GOP of drift.
+    """
+    CACHE_DIR = os.path.join("medvat_cache", "segments")
+    WINDOW_SECONDS = 8 * 60
+    OVERLAP_SECONDS = 30
+    THRESHOLD_SECONDS = 12 * 60  # Only segment recordings longer than this
+
+    @staticmethod
+    def is_available():
+        return shutil.which("ffmpeg") is not None and shutil.which("ffprobe") is not None
+
+    KEYFRAME_SEARCH_SECONDS = 60  # How far before a cut to look for its keyframe
+
+    @staticmethod
+    def _ffprobe(args):
+        """Run ffprobe with args; return its output, or None if it failed."""
+        if shutil.which("ffprobe") is None:
+            return None
+        try:
+            completed = subprocess.run(
+                ["ffprobe", "-v", "error"] + args,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                timeout=60
+            )
+            if completed.returncode != 0:
+                return None
+            return completed.stdout.decode()
+        except Exception:
+            return None
+
+    @staticmethod
+    def probe_duration(video_path):
+        """Return the duration in seconds using ffprobe, or None."""
+        output = VideoSegmenter._ffprobe(
+            ["-show_entries", "format=duration", "-of", "default=noprint_wrappers=1:nokey=1", video_path]
+        )
+        try:
+            return float(output.strip())
+        except (AttributeError, ValueError):
+            return None
+
+    @staticmethod
+    def probe_start_time(video_path):
+        """Return the container's start timestamp in seconds (0 if unknown)."""
+        output = VideoSegmenter._ffprobe(
+            ["-show_entries", "format=start_time", "-of", "default=noprint_wrappers=1:nokey=1", video_path]
+        )
+        try:
+            return float(output.strip())
+        except (AttributeError, ValueError):
+            return 0.0
+
+    @staticmethod
+    def keyframe_before(video_path, seconds, start_time=0.0):
+        """
+        Return the time (from the start of the video) of the last video
+        keyframe at or before seconds, which is where a stream-copy cut
+        requested at seconds really starts. Returns None if it can't be probed.
+        """
+        if seconds <= 0:
+            return 0.0
+        target = start_time + seconds
+        low = max(start_time, target - VideoSegmenter.KEYFRAME_SEARCH_SECONDS)
+        # Only keyframes are decoded, over a bounded interval, so this is fast
+        output = VideoSegmenter._ffprobe([
+            "-select_streams", "v:0", "-skip_frame", "nokey",
+            "-read_intervals", f"{low:.3f}%{target + 0.001:.3f}",
+            "-show_entries", "frame=best_effort_timestamp_time", "-of", "csv=p=0", video_path
+        ])
+        if output is None:
+            return None
+        keyframes = []
+        for line in output.splitlines():
+            try:
+                keyframes.append(float(line.strip().strip(",")))
+            except ValueError:
+                continue
+        keyframes = [t for t in keyframes if t <= target + 0.001]
+        if not keyframes:
+            return None
+        return max(0.0, max(keyframes) - start_time)
+
+    @staticmethod
+    def plan(duration, window=None, overlap=None):
+        """Return [(start, end), ...] windows covering the whole duration."""
+        window = window or VideoSegmenter.WINDOW_SECONDS
+        overlap = overlap if overlap is not None else VideoSegmenter.OVERLAP_SECONDS
+        step = max(1, window - overlap)
+        windows = []
+        start = 0.0
+        while True:
+            end = min(duration, start + window)
+            windows.append((start, end))
+            if end >= duration:
+                break
+            start += step
+        # Fold a tiny trailing window into the previous one
+        if len(windows) > 1 and windows[-1][1] - windows[-1][0] < overlap * 2:
+            last_start = windows[-2][0]
+            windows = windows[:-2] + [(last_start, duration)]
+        return windows
+
+    @staticmethod
+    def split(video_path, content_hash, duration, window=None, overlap=None):
+        """
+        Cut the video into windows, reusing earlier cuts of the same content.
+        Returns [(segment_path, start, end), ...] or None if ffmpeg failed.
+        start is where the clip really begins (its keyframe), not the
+        nominal window start, so clip timestamps can be rebased with it.
+        """
+        segment_dir = os.path.join(VideoSegmenter.CACHE_DIR, content_hash)
+        os.makedirs(segment_dir, exist_ok=True)
+        extension = os.path.splitext(video_path)[1] or ".mp4"
+        start_time = VideoSegmenter.probe_start_time(video_path)
+        segments = []
+        for idx, (start, end) in enumerate(VideoSegmenter.plan(duration, window, overlap)):
+            segment_path = os.path.join(segment_dir, f"{idx:03d}_{int(start)}_{int(end)}{extension}")
+            if not os.path.exists(segment_path):
+                partial_path = f"{segment_path}.{os.getpid()}-{threading.get_ident()}.part{extension}"
+                command = [
+                    "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+                    "-ss", f"{start:.3f}", "-i", video_path, "-t", f"{end - start:.3f}",
+                    "-c", "copy", "-avoid_negative_ts", "make_zero",
+                    partial_path
+                ]
+                try:
+                    completed = subprocess.run(
+                        command,
+                        stdout=subprocess.DEVNULL,
+                        stderr=subprocess.PIPE,
+                        timeout=VideoTranscoder.FFMPEG_TIMEOUT
+                    )
+                    if completed.returncode != 0:
+                        print(f"[Segmenter] ffmpeg failed: {completed.stderr.decode(errors='replace')[-300:]}")
+                        return None
+                    os.replace(partial_path, segment_path)
+                except Exception as e:
+                    print(f"[Segmenter] Error cutting {video_path}: {e}")
+                    return None
+                finally:
+                    if os.path.exists(partial_path):
+                        try:
+                            os.remove(partial_path)
+                        except OSError:
+                            pass
+            actual_start = VideoSegmenter.keyframe_before(video_path, start, start_time)
+            if actual_start is None:
+                print(f"[Segmenter] Could not find the keyframe before {start:.0f}s, using the nominal start")
+                actual_start = start
+            segments.append((segment_path, actual_start, end))
+        return segments
+
+class SegmentMerger:
+    """
+    Combines per-window results into one assessment on the original timeline.
+    
+    - [MM:SS] timestamps are shifted by each window's real start (its first keyframe).
+    - Binary items are "Yes" if the step was observed done in any window.
+    - Likert items average the windows where the item was observed,
+      weighted by window length.
+    - Observations inside an overlap that the previous window already
+      reported are dropped, so they don't appear twice.
+    """
+    TIMESTAMP_RE = re.compile(r'\[(\d{1,3}):(\d{2})(?::(\d{2}))?\]')
+
+    @staticmethod
+    def format_timestamp(seconds):
+        seconds = max(0, int(round(seconds)))
+        return f"[{seconds // 60:02d}:{seconds % 60:02d}]"
+
+    @staticmethod
+    def parse_timestamp(match):
+        first, second, third = match.group(1), match.group(2), match.group(3)
+        if third is not None:
+            return int(first) * 3600 + int(second) * 60 + int(third)
+        return int(first) * 60 + int(second)
+
+    @staticmethod
+    def rebase(text, offset):
+        """Shift every [MM:SS] / [H:MM:SS] timestamp in text by offset seconds."""
+        return SegmentMerger.TIMESTAMP_RE.sub(
+            lambda m: SegmentMerger.format_timestamp(SegmentMerger.parse_timestamp(m) + offset),
+            text or ""
+        )
+
+    @staticmethod
+    def fragments(text):
+        """
+        Split advice into (seconds, text) fragments at each timestamp.
+        Text before the first timestamp gets seconds=None.
+        """
+        text = text or ""
+        matches = list(SegmentMerger.TIMESTAMP_RE.finditer(text))
+        if not matches:
+            return [(None, text.strip())] if text.strip() else []
+        parts = []
+        if text[:matches[0].start()].strip():
+            parts.append((None, text[:matches[0].start()].strip()))
+        for idx, match in enumerate(matches):
+            end = matches[idx + 1].start() if idx + 1 < len(matches) else len(text)
+            parts.append((SegmentMerger.parse_timestamp(match), text[match.start():end].strip()))
+        return parts
+
+    @staticmethod
+    def merge(rubric_data, segment_results):
+        """
+        Args:
+            rubric_data: The rubric every window was assessed against
+            segment_results: [(start, end, result), ...] in timeline order,
+                results already parsed (no error dicts)
+        
+        Returns one result in the normal assessments/summative_comment shape.
+        Criteria no window scored have no score; run the result through
+        ResponseParser.validate to list them as missing.
+        """
+        assessments = []
+        for item in rubric_data['items']:
+            name = item['name']
+            observed = []  # (start, end, score, advice)
+            everything = []
+            previous_end = None
+            previous_had_fragments = False
+            advice_parts = []
+            for start, end, result in segment_results:
+                entry = next((a for a in result.get('assessments', []) if a.get('name') == name), None)
+                if entry is None:
+                    previous_end = end
+                    previous_had_fragments = False
+                    continue
+                # Windows without a usable score add advice but don't vote
+                score = ResponseParser._normalize_score(entry.get('score'), item['type'])
+                if score is not None:
+                    record = (start, end, score)
+                    everything.append(record)
+                    if entry.get('observed', True):
+                        observed.append(record)
+
+                kept = []
+                for seconds, fragment in SegmentMerger.fragments(entry.get('advice', '')):
+                    if fragment.lower().startswith("not observed"):
+                        continue
+                    in_overlap = (
+                        seconds is not None and previous_end is not None
+                        and seconds + start < previous_end
+                    )
+                    if in_overlap and previous_had_fragments:
+                        continue
+                    kept.append(SegmentMerger.rebase(fragment, start))
+                advice_parts.extend(kept)
+                previous_end = end
+                previous_had_fragments = bool(kept)
+
+            # Drop exact repeats (e.g. the same general remark in every window)
+            unique_parts = list(dict.fromkeys(part for part in advice_parts if part))
+            entry = {"name": name, "advice": " ".join(unique_parts)}
+            # With no window scoring it, the entry gets no score and validate() lists it as missing
+            scored = observed or everything
+            if scored and item['type'] == 'binary':
+                entry["score"] = 1 if any(s >= 1 for _, _, s in scored) else 0
+            elif scored:
+                total_weight = sum(max(1.0, e - s) for s, e, _ in scored)
+                weighted = sum(max(1.0, e - s) * sc for s, e, sc in scored) / total_weight
+                entry["score"] = int(min(5, max(1, round(weighted))))
+            assessments.append(entry)
+
+        summaries = []
+        for start, end, result in segment_results:
+            comment = SegmentMerger.rebase(result.get('summative_comment', ''), start).strip()
+            if comment:
+                summaries.append(
+                    f"{SegmentMerger.format_timestamp(start)}-{SegmentMerger.format_timestamp(end)} {comment}"
+                )
+
+        return {
+            "assessments": assessments,
+            "summative_comment": "\n\n".join(summaries),
+            "segments": len(segment_results)
+        }
+
+class IncrementalAssessmentParser:
+    """
+    Consumes streamed response text and reports every entry of the
+    top-level "assessments" array as soon as its closing brace arrives,
+    long before the whole JSON document is complete.
+    
+    The scan is incremental (each character is looked at once) and
+    string-aware, so braces inside advice text don't confuse it.
+    """
+    def __init__(self, on_assessment):
+        self.on_assessment = on_assessment
+        self.emitted = 0
+        self._buffer = ""
+        self._pos = 0
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_key = None
+        self._in_assessments = False
+        self._item_start = None
+
+    def text(self):
+        """The full response text received so far."""
+        return self._buffer
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        buffer = self._buffer
+        for i in range(self._pos, len(buffer)):
+            char = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._stack == ['{']:
+                        # Strings directly in the top-level object (keys and values)
+                        self._last_key = buffer[self._string_start + 1:i]
+                continue
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char == '{':
+                if self._in_assessments and len(self._stack) == 2:
+                    self._item_start = i
+                self._stack.append('{')
+            elif char == '[':
+                if self._stack == ['{'] and self._last_key == "assessments":
+                    self._in_assessments = True
+                self._stack.append('[')
+            elif char in '}]':
+                if self._stack:
+                    self._stack.pop()
+                if char == '}' and self._item_start is not None and len(self._stack) == 2:
+                    self._emit(buffer[self._item_start:i + 1])
+                    self._item_start = None
+                elif char == ']' and self._in_assessments and len(self._stack) == 1:
+                    self._in_assessments = False
+        self._pos = len(buffer)
+
+    def _emit(self, item_text):
+        try:
+            entry = json.loads(item_text)
+        except json.JSONDecodeError:
+            return
+        self.emitted += 1
+        try:
+            self.on_assessment(entry)
+        except Exception as e:
+            print(f"[Streaming] Error handling streamed assessment: {e}")
+
+class ResponseParser:
+    """
+    Turns model output into an assessment dict: extracts the first JSON
+    object in a single string-aware pass (ignoring code fences and any
+    surrounding prose), repairs output that was cut off mid-document, and
+    checks the result against the rubric.
+    """
+    @staticmethod
+    def extract(text):
+        """
+        Return (data, repaired) for the first JSON object in text.
+        Raises ValueError if no object can be recovered.
+        """
+        start = text.find('{')
+        if start == -1:
+            raise ValueError("No JSON object found in the response")
+        
+        stack = []
+        in_string = False
+        escape = False
+        # Last position the document can be cut at and still be closed
+        # cleanly, with the brackets open at that point
+        safe_end = None
+        safe_stack = ()
+        for i in range(start, len(text)):
+            char = text[i]
+            if in_string:
+                if escape:
+                    escape = False
+                elif char == '\\':
+                    escape = True
+                elif char == '"':
+                    in_string = False
+                continue
+            if char == '"':
+                in_string = True
+            elif char in '{[':
+                stack.append('}' if char == '{' else ']')
+                safe_end, safe_stack = i + 1, tuple(stack)
+            elif char in '}]':
+                if not stack:
+                    break
+                stack.pop()
+                if not stack:
+                    return json.loads(text[start:i + 1]), False
+                safe_end, safe_stack = i + 1, tuple(stack)
+            elif char == ',':
+                safe_end, safe_stack = i, tuple(stack)
+        
+        if safe_end is None:
+            raise ValueError("Response ended before any JSON content")
+        # Truncated: drop the unfinished trailing value and close what's open
+        repaired_text = text[start:safe_end] + "".join(reversed(safe_stack))
+        try:
+            return json.loads(repaired_text), True
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Could not repair truncated response: {e}")
+
+    @staticmethod
+    def validate(result, rubric_data):
+        """
+        Normalize scores and make sure every rubric criterion is present.
+        Criteria the model left out, or returned without a usable score
+        (e.g. an entry cut off by truncation), get no score, so the form
+        keeps its default, and are listed under "missing_criteria".
+        Names are matched ignoring case and spacing.
+        """
+        entries = {}
+        for entry in result.get('assessments', []):
+            if isinstance(entry, dict) and isinstance(entry.get('name'), str):
+                entries.setdefault(" ".join(entry['name'].split()).casefold(), entry)
+        
+        assessments = []
+        missing = []
+        for item in rubric_data.get('items', []):
+            entry = entries.get(" ".join(item['name'].split()).casefold())
+            score = None if entry is None else ResponseParser._normalize_score(entry.get('score'), item['type'])
+            if score is None:
+                missing.append(item['name'])
+                advice = (entry or {}).get('advice') or ''
+                assessments.append({
+                    "name": item['name'],
+                    "advice": "Not assessed: this criterion was missing from the AI response. Please review and score it manually."
+                              + (f"\n{advice}" if advice else "")
+                })
+                continue
+            entry['name'] = item['name']
+            entry['score'] = score
+            entry.setdefault('advice', '')
+            assessments.append(entry)
+        
+        result['assessments'] = assessments
+        result.setdefault('summative_comment', '')
+        if missing:
+            result['missing_criteria'] = missing
+        else:
+            result.pop('missing_criteria', None)
+        return result
+
+    @staticmethod
+    def _normalize_score(score, item_type):
+        if isinstance(score, str):
+            text = score.strip().lower()
+            if text in ("yes", "true"):
+                score = 1
+            elif text in ("no", "false"):
+                score = 0
+            else:
+                try:
+                    score = float(text)
+                except ValueError:
+                    return None
+        if isinstance(score, bool):
+            score = int(score)
+        if not isinstance(score, (int, float)):
+            return None
+        if item_type == 'binary':
+            return 1 if score >= 1 else 0
+        return min(5, max(1, int(round(score))))
+
+class ResultCache:
+    """
+    On-disk cache of finished assessments, keyed by the video content hash,
+    a hash of the rubric, the model name and the prompt version, so
+    re-opening or re-running an unchanged assessment costs no API time.
+    
+    Entries are evicted by age and, least recently used first, by total size.
+    """
+    CACHE_DIR = os.path.join("medvat_cache", "results")
+    # Bump when response handling changes in ways build_prompt() doesn't show
+    PROMPT_VERSION = "2"
+    MAX_AGE_SECONDS = 90 * 24 * 60 * 60
+    MAX_BYTES = 200 * 1024 * 1024
+    EVICT_EVERY = 20  # Check size/age limits every N writes
+
+    hits = 0
+    misses = 0
+    _writes = 0
+    _lock = threading.Lock()
+
+    @staticmethod
+    def make_key(content_hash, rubric_data, model_name, variant=""):
+        """
+        Combine everything that changes the answer into one key. The prompt
+        hash covers the rubric-specific instruction blocks, so editing them
+        invalidates old results automatically.
+        """
+        rubric_hash = hashlib.sha256(json.dumps(rubric_data, sort_keys=True).encode()).hexdigest()
+        prompt_hash = hashlib.sha256(GeminiClient.build_prompt(rubric_data).encode()).hexdigest()
+        parts = [ResultCache.PROMPT_VERSION, content_hash, rubric_hash, model_name or "", prompt_hash, variant]
+        return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+    @staticmethod
+    def _path(key):
+        return os.path.join(ResultCache.CACHE_DIR, f"{key}.json")
+
+    @staticmethod
+    def get(key):
+        """Return the cached result, or None on a miss."""
+        path = ResultCache._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > ResultCache.MAX_AGE_SECONDS:
+                raise FileNotFoundError(path)
+            with open(path, 'r') as f:
+                result = json.load(f)["result"]
+            # Touch so size eviction treats it as recently used
+            os.utime(path, None)
+        except Exception:
+            with ResultCache._lock:
+                ResultCache.misses += 1
+            Metrics.increment("result_cache_total", outcome="miss")
+            return None
+        with ResultCache._lock:
+            ResultCache.hits += 1
+        Metrics.increment("result_cache_total", outcome="hit")
+        return result
+
+    @staticmethod
+    def put(key, result, **metadata):
+        """Store a successful result (error results are never cached)."""
+        if "error" in result:
+            return
+        try:
+            os.makedirs(ResultCache.CACHE_DIR, exist_ok=True)
+            path = ResultCache._path(key)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({"created_at": time.time(), "metadata": metadata, "result": result}, f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"[Result Cache] Error saving result: {e}")
+            return
+        with ResultCache._lock:
+            ResultCache._writes += 1
+            evict_now = ResultCache._writes % ResultCache.EVICT_EVERY == 0
+        if evict_now:
+            ResultCache.evict()
+
+    @staticmethod
+    def evict():
+        """Delete entries past MAX_AGE_SECONDS, then the oldest beyond MAX_BYTES."""
+        try:
+            entries = []
+            now = time.time()
+            with os.scandir(ResultCache.CACHE_DIR) as it:
+                for entry in it:
+                    if not entry.name.endswith(".json"):
+                        continue
+                    stat = entry.stat()
+                    if now - stat.st_mtime > ResultCache.MAX_AGE_SECONDS:
+                        os.remove(entry.path)
+                    else:
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= ResultCache.MAX_BYTES:
+                    break
+                os.remove(path)
+                total -= size
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"[Result Cache] Error evicting entries: {e}")
+
+    @staticmethod
+    def stats():
+        """Return hit/miss counters for this session."""
+        with ResultCache._lock:
+            return {"hits": ResultCache.hits, "misses": ResultCache.misses}
+
+class PromptCache:
+    """
+    Gemini context caches for the static assessment prompt (rubric JSON,
+    procedure-specific directives and output format), so a batch sends those
+    tokens once per (model, prompt) instead of once per video.
+    
+    A cache is only created once a prompt is used a second time, so one-off
+    prompts (single videos, segment windows) never pay for one. Caches are
+    refreshed before their TTL runs out and deleted by close(). If creating a
+    cache fails (e.g. the prompt is below the model's minimum cacheable size)
+    that prompt is sent inline for the rest of the run.
+    """
+    TTL_SECONDS = 30 * 60
+    REFRESH_MARGIN = 5 * 60
+    CREATE_AFTER_USES = 2
+    # Sent with each video in place of the cached instructions
+    VIDEO_INSTRUCTION = "Assess the video above strictly following the instructions and rubric already provided. Return ONLY the JSON."
+
+    def __init__(self, ttl_seconds=None):
+        self.ttl_seconds = ttl_seconds or PromptCache.TTL_SECONDS
+        self._entries = {}  # (model, prompt hash) -> entry dict
+        self._lock = threading.Lock()
+
+    def cached_content_for(self, model_name, prompt):
+        """
+        Return the cached-content object holding prompt, or None if the
+        prompt should be sent inline.
+        """
+        key = (model_name, hashlib.sha256(prompt.encode()).hexdigest())
+        with self._lock:
+            entry = self._entries.setdefault(key, {"uses": 0, "cache": None, "expires": 0, "failed": False})
+            entry["uses"] += 1
+            if entry["failed"] or (entry["cache"] is None and entry["uses"] < PromptCache.CREATE_AFTER_USES):
+                return None
+            
+            if entry["cache"] is not None and entry["expires"] - time.time() < PromptCache.REFRESH_MARGIN:
+                try:
+                    RateLimiter.shared().call("cache", entry["cache"].update, ttl=timedelta(seconds=self.ttl_seconds))
+                    entry["expires"] = time.time() + self.ttl_seconds
+                except Exception as e:
+                    # Probably expired already; make a new one below
+                    print(f"[Prompt Cache] Could not refresh cache: {e}")
+                    entry["cache"] = None
+            
+            if entry["cache"] is None:
+                try:
+                    entry["cache"] = RateLimiter.shared().call(
+                        "cache",
+                        GeminiBackend.current().create_cached_content,
+                        model_name,
+                        [prompt],
+                        timedelta(seconds=self.ttl_seconds),
+                        display_name=f"medvat-{key[1][:12]}"
+                    )
+                    entry["expires"] = time.time() + self.ttl_seconds
+                    print(f"[Prompt Cache] Cached prompt for {model_name} ({len(prompt)} chars)")
+                except Exception as e:
+                    print(f"[Prompt Cache] Caching unavailable, sending prompt inline: {e}")
+                    entry["failed"] = True
+                    return None
+            return entry["cache"]
+
+    def close(self):
+        """Delete every cache created by this instance."""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries = {}
+        for entry in entries:
+            if entry["cache"] is None:
+                continue
+            try:
+                RateLimiter.shared().call("cache", entry["cache"].delete)
+            except Exception as e:
+                print(f"[Prompt Cache] Error deleting cache: {e}")
+
+class ModelCatalogue:
+    """
+    Models available to each API key, persisted so restarts and model
+    switches don't need an API call. Entries are keyed by a fingerprint of
+    the key (the key itself is never written) and refreshed in the
+    background once they are older than TTL_SECONDS.
+    """
+    CATALOGUE_FILE = "medvat_models.json"
+    TTL_SECONDS = 24 * 60 * 60
+    MAX_ENTRIES = 10
+
+    _lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(api_key):
+        return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+    @staticmethod
+    def _load():
+        if os.path.exists(ModelCatalogue.CATALOGUE_FILE):
+            try:
+                with open(ModelCatalogue.CATALOGUE_FILE, 'r') as f:
+                    return json.load(f)
+            except Exception:
+                return {}
+        return {}
+
+    @staticmethod
+    def _save(entries):
+        try:
+            tmp_file = ModelCatalogue.CATALOGUE_FILE + ".tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump(entries, f, indent=2)
+            os.replace(tmp_file, ModelCatalogue.CATALOGUE_FILE)
+        except Exception as e:
+            print(f"[Model Catalogue] Error saving catalogue: {e}")
+
+    @staticmethod
+    def lookup(api_key):
+        """
+        Return (models, is_fresh) for this key, or (None, False) if it has
+        never been catalogued.
+        """
+        if not api_key:
+            return None, False
+        with ModelCatalogue._lock:
+            entry = ModelCatalogue._load().get(ModelCatalogue.fingerprint(api_key))
+        if not entry:
+            return None, False
+        return entry["models"], time.time() - entry["fetched_at"] < ModelCatalogue.TTL_SECONDS
+
+    @staticmethod
+    def is_listed(api_key, model_name, allow_stale=False):
+        """True/False from the catalogue, or None if there is no (fresh) entry."""
+        models, is_fresh = ModelCatalogue.lookup(api_key)
+        if models is None or not (is_fresh or allow_stale):
+            return None
+        return model_name.split('/')[-1] in models
+
+    @staticmethod
+    def refresh(api_key):
+        """
+        Query the API for the key's models and store them.
+        Returns (models_list, error_message) like fetch_available_models;
+        fallback lists returned on errors are not stored.
+        """
+        models, error_msg = GeminiClient.fetch_available_models(api_key)
+        if api_key and error_msg is None:
+            with ModelCatalogue._lock:
+                entries = ModelCatalogue._load()
+                entries[ModelCatalogue.fingerprint(api_key)] = {"models": models, "fetched_at": time.time()}
+                if len(entries) > ModelCatalogue.MAX_ENTRIES:
+                    oldest = sorted(entries, key=lambda key: entries[key]["fetched_at"])
+                    for key in oldest[:len(entries) - ModelCatalogue.MAX_ENTRIES]:
+                        del entries[key]
+                ModelCatalogue._save(entries)
+        return models, error_msg
+
+class GeminiClient:
+    """
+    Handles the interaction with the Google Gemini API.
+    """
+    def __init__(self, api_key, transcode_profile=None, structured_output=True, backend=None):
+        """
+        Args:
+            api_key: Gemini API key
+            transcode_profile: Settings for VideoTranscoder, or None to upload
+                videos as they are
+            structured_output: Constrain responses to a JSON schema built
+                from the rubric
+            backend: GeminiBackend to install for the process (default: the
+                google.generativeai backend)
+        """
+        if backend is not None:
+            GeminiBackend.set_current(backend)
+        GeminiBackend.current().configure(api_key)
+        self.transcode_profile = transcode_profile
+        self.structured_output = structured_output
+        # Set by BatchPipeline for the duration of a batch
+        self.prompt_cache = None
+    
+    @staticmethod
+    def from_config(api_key, config=None):
+        """Create a GeminiClient using the rate limit, transcode and output settings from the config."""
+        if config is None:
+            config = ConfigManager.load_config()
+        RateLimiter.shared().configure(config.get("rate_limits"))
+        transcode = config.get("transcode", {})
+        profile = None
+        if transcode.get("enabled", False):
+            profile = {key: value for key, value in transcode.items() if key != "enabled"}
+        return GeminiClient(
+            api_key,
+            transcode_profile=profile,
+            structured_output=config.get("structured_output", True)
+        )
+    
+    @staticmethod
+    def fetch_available_models(api_key):
+        """
+        Query the API for available models that support generateContent.
+        Returns (models_list, error_message)
+        """
+        # Safe fallback defaults
+        FALLBACK_MODELS = ["gemini-2.5-flash", "gemini-1.5-pro", "gemini-1.5-flash"]
+        
+        if not api_key:
+            print("[Model Discovery] No API key provided, using fallback models")
+            return FALLBACK_MODELS, None
+        
+        try:
+            GeminiBackend.current().configure(api_key)
+            
+            # Query available models
+            print("[Model Discovery] Querying API for available models...")
+            models_list = RateLimiter.shared().call("list_models", GeminiBackend.current().list_models)
+            
+            if not models_list:
+                print("[Model Discovery] No models returned from API, using fallback")
+                return FALLBACK_MODELS, "No models returned from API"
+            
+            # Filter models that support generateContent
+            available_models = []
+            for model in models_list:
+                try:
+                    # Safely access supported_generation_methods attribute
+                    supported_methods = getattr(model, 'supported_generation_methods', [])
+                    
+                    # Check if model supports generateContent method
+                    if supported_methods and 'generateContent' in supported_methods:
+                        model_name = getattr(model, 'name', '')
+                        # Extract just the model name (remove 'models/' prefix if present)
+                        if '/' in model_name:
+                            model_name = model_name.split('/')[-1]
+                        if model_name:
+                            available_models.append(model_name)
+                            print(f"[Model Discovery] Found: {model_name}")
+                except Exception as e:
+                    print(f"[Model Discovery] Error processing model: {e}")
+                    continue
+            
+            if available_models:
+                print(f"[Model Discovery] Success! Found {len(available_models)} models with generateContent support:")
+                for model in available_models:
+                    print(f"  - {model}")
+                return available_models, None
+            else:
+                print("[Model Discovery] No models found with generateContent support, using fallback")
+                return FALLBACK_MODELS, "No models found with generateContent support"
+                
+        except Exception as e:
+            error_msg = str(e)
+            print(f"[Model Discovery] Error querying models: {error_msg}")
+            print(f"[Model Discovery] Falling back to default models: {FALLBACK_MODELS}")
+            
+            # Check for specific error types
+            if "401" in error_msg or "invalid" in error_msg.lower() or "unauthorized" in error_msg.lower():
+                return FALLBACK_MODELS, "Invalid API key"
+            elif "403" in error_msg or "permission" in error_msg.lower():
+                return FALLBACK_MODELS, "API key lacks permission to list models"
+            else:
+                return FALLBACK_MODELS, f"API error: {error_msg[:100]}"
+    
+    @staticmethod
+    def check_model_availability(api_key, model_name):
+        """
+        Check whether the model is available with the given API key, without
+        spending an inference request: answer from a fresh model catalogue
+        if there is one, otherwise fetch the model's metadata.
+        Returns (is_available, error_message)
+        """
+        listed = ModelCatalogue.is_listed(api_key, model_name)
+        if listed is not None:
+            return listed, None if listed else f"Model {model_name} not available for this API key"
+        try:
+            backend = GeminiBackend.current()
+            backend.configure(api_key)
+            model = RateLimiter.shared().call(
+                "get_model",
+                backend.get_model,
+                model_name if model_name.startswith("models/") else f"models/{model_name}"
+            )
+            supported_methods = getattr(model, 'supported_generation_methods', None)
+            if supported_methods and 'generateContent' not in supported_methods:
+                return False, f"Model {model_name} does not support generateContent"
+            return True, None
+        except Exception as e:
+            error_msg = str(e)
+            # Check for common error patterns
+            if "404" in error_msg or "not found" in error_msg.lower():
+                return False, f"Model {model_name} not available (404)"
+            elif "403" in error_msg or "permission" in error_msg.lower():
+                return False, f"API key lacks access to {model_name}"
+            elif "401" in error_msg or "invalid" in error_msg.lower():
+                return False, "Invalid API key"
+            else:
+                return False, f"Error: {error_msg[:100]}"
+
+    def analyze_video(self, video_path, rubric_data, progress_callback, model_name="gemini-2.5-flash", auto_detect_pattern=False, api_key=None, segmented=None, on_assessment=None, force_refresh=False):
+        """
+        Upload, process and assess one video.
+        
+        segmented: True/False forces segmented analysis on/off; None (default)
+        segments recordings longer than VideoSegmenter.THRESHOLD_SECONDS
+        when ffmpeg is available.
+        on_assessment: Optional fn(entry) called with each criterion as the
+        response streams in. Segmented analysis doesn't stream, since its
+        windows are only meaningful once merged.
+        force_refresh: Ignore (and overwrite) a cached result for this video.
+        """
+        try:
+            if api_key:
+                GeminiBackend.current().configure(api_key)
+            
+            # Serve unchanged re-runs from the local result cache
+            if not force_refresh:
+                cached = self.cached_result(video_path, rubric_data, model_name, auto_detect_pattern)
+                if cached is not None:
+                    progress_callback("Loaded cached assessment (no API call needed).", 1.0)
+                    return cached
+            
+            # Long recordings are analyzed as overlapping windows in parallel
+            result = None
+            video_duration = VideoSegmenter.probe_duration(video_path) if os.path.exists(video_path) else None
+            if segmented is not False and not auto_detect_pattern and video_duration:
+                duration = video_duration if segmented else self.long_video_duration(video_path, video_duration)
+                if duration:
+                    result = self.analyze_video_segmented(
+                        video_path, rubric_data, progress_callback, model_name, api_key=api_key, duration=duration
+                    )
+            
+            if result is None:
+                # 1. Upload File (or reuse an earlier upload of the same video)
+                video_file, content_hash, error = self.upload_video(video_path, progress_callback)
+                if error:
+                    return error
+                
+                # 2. Wait for Processing
+                video_file, error = self.wait_for_processing(video_file, content_hash, progress_callback, video_duration)
+                if error:
+                    return error
+                
+                # 3. Detect pattern, prompt the model and parse its response
+                result = self.generate_assessment(
+                    video_file,
+                    rubric_data,
+                    progress_callback,
+                    model_name,
+                    auto_detect_pattern=auto_detect_pattern,
+                    api_key=api_key,
+                    on_assessment=on_assessment
+                )
+            
+            self.store_result(video_path, rubric_data, model_name, result, auto_detect_pattern)
+            return result
+        except Exception as e:
+            error_msg = ErrorHandler.format_error(
+                "Unexpected Analysis Error",
+                f"An unexpected error occurred during video analysis: {str(e)}",
+                is_fatal=True
+            )
+            return {"error": error_msg, "fatal": True}
+    
+    def result_cache_key(self, video_path, rubric_data, model_name, auto_detect_pattern=None):
+        """ResultCache key for this video, rubric, model and upload settings."""
+        if auto_detect_pattern is None:
+            auto_detect_pattern = rubric_data.get("auto_detect", False)
+        if self.transcode_profile is not None:
+            input_variant = VideoTranscoder.profile_tag(self.transcode_profile)
+        else:
+            input_variant = "original"
+        content_hash = UploadRegistry.content_hash(video_path)
+        return ResultCache.make_key(
+            content_hash, rubric_data, model_name, f"{input_variant}:auto_detect={bool(auto_detect_pattern)}"
+        )
+    
+    def cached_result(self, video_path, rubric_data, model_name, auto_detect_pattern=None):
+        """Return a cached assessment for this video and rubric, or None."""
+        if not os.path.exists(video_path):
+            return None
+        return ResultCache.get(self.result_cache_key(video_path, rubric_data, model_name, auto_detect_pattern))
+    
+    def store_result(self, video_path, rubric_data, model_name, result, auto_detect_pattern=None):
+        """Cache a successful, complete assessment."""
+        if "error" in result or result.get("missing_criteria") or not os.path.exists(video_path):
+            return
+        ResultCache.put(
+            self.result_cache_key(video_path, rubric_data, model_name, auto_detect_pattern),
+            result,
+            video=os.path.basename(video_path),
+            rubric=rubric_data.get("title", ""),
+            model=model_name
+        )
+    
+    def long_video_duration(self, video_path, duration=None):
+        """
+        Return the duration if the video should be analyzed in segments, else
+        None. Pass duration if it was already probed.
+        """
+        if not VideoSegmenter.is_available():
+            return None
+        duration = duration or VideoSegmenter.probe_duration(video_path)
+        if duration and duration > VideoSegmenter.THRESHOLD_SECONDS:
+            return duration
+        return None
+    
+    def analyze_video_segmented(self, video_path, rubric_data, progress_callback, model_name="gemini-2.5-flash", api_key=None, duration=None, max_workers=3):
+        """
+        Analyze a long recording as overlapping windows in parallel, then
+        merge the per-window results onto the original timeline.
+        Falls back to whole-video analysis if the video can't be split.
+        """
+        try:
+            if api_key:
+                GeminiBackend.current().configure(api_key)
+            
+            progress_callback("Splitting long recording into segments...", 0.05)
+            if duration is None:
+                duration = VideoSegmenter.probe_duration(video_path)
+            content_hash = UploadRegistry.content_hash(video_path)
+            segments = VideoSegmenter.split(video_path, content_hash, duration) if duration else None
+            if not segments:
+                print("[Segmenter] Could not split video, analyzing it whole")
+                return self.analyze_video(video_path, rubric_data, progress_callback, model_name, api_key=api_key, segmented=False)
+            
+            total = len(segments)
+            finished = []
+            lock = threading.Lock()
+            
+            def quiet_progress(msg, val):
+                pass
+            
+            def analyze_segment(idx, segment_path, start, end):
+                video_file, segment_hash, error = self.upload_video(segment_path, quiet_progress)
+                if error:
+                    return error
+                video_file, error = self.wait_for_processing(video_file, segment_hash, quiet_progress, end - start)
+                if error:
+                    return error
+                segment_note = f"""
+            SEGMENT CONTEXT:
+            
+            This clip is segment {idx + 1} of {total} from a longer recording. It covers {SegmentMerger.format_timestamp(start)} to {SegmentMerger.format_timestamp(end)} of the original video.
+            - Timestamps in your advice must be relative to the start of THIS clip (the clip starts at [00:00]).
+            - Some rubric items may not happen in this clip. Add "observed": true to an assessment if the item was performed or could be judged in this clip. Otherwise add "observed": false and use the advice "Not observed in this segment".
+            """
+                prompt = GeminiClient.build_prompt(rubric_data, extra_instructions=segment_note)
+                schema = GeminiClient.response_schema(rubric_data, segment=True)
+                result = self._run_prompt(video_file, prompt, quiet_progress, model_name, schema=schema)
+                with lock:
+                    finished.append(idx)
+                    progress_callback(f"Analyzed segment {len(finished)}/{total}...", 0.1 + 0.85 * len(finished) / total)
+                return result
+            
+            progress_callback(f"Analyzing {total} segments using {model_name}...", 0.1)
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, total))) as pool:
+                futures = [pool.submit(analyze_segment, idx, *segment) for idx, segment in enumerate(segments)]
+                results = [future.result() for future in futures]
+            
+            errors = [result for result in results if "error" in result]
+            if errors:
+                # Prefer reporting a fatal error if there is one
+                return next((error for error in errors if error.get("fatal")), errors[0])
+            
+            merged = SegmentMerger.merge(
+                rubric_data,
+                [(start, end, result) for (_, start, end), result in zip(segments, results)]
+            )
+            progress_callback("Analysis Complete.", 1.0)
+            # Same checks as a single-pass result: unscored criteria become missing_criteria
+            return ResponseParser.validate(merged, rubric_data)
+        except Exception as e:
+            error_msg = ErrorHandler.format_error(
+                "Unexpected Analysis Error",
+                f"An unexpected error occurred during segmented video analysis: {str(e)}",
+                is_fatal=True
+            )
+            return {"error": error_msg, "fatal": True}
+    
+    def analyze_video_multi(self, video_path, rubrics, progress_callback, model_name="gemini-2.5-flash", api_key=None, max_workers=3, force_refresh=False):
+        """
+        Assess one video against several rubrics. The video is uploaded and
+        processed once, then one generation per rubric runs concurrently
+        against the same remote file.
+        
+        Args:
+            rubrics: Dict of rubric key -> rubric data
+        
+        Returns:
+            Dict of rubric key -> result (assessment or error dict)
+        """
+        try:
+            if api_key:
+                GeminiBackend.current().configure(api_key)
+            
+            # Only rubrics without a cached result need the model
+            results = {}
+            if not force_refresh:
+                for key, rubric in rubrics.items():
+                    cached = self.cached_result(video_path, rubric, model_name)
+                    if cached is not None:
+                        results[key] = cached
+            remaining = {key: rubric for key, rubric in rubrics.items() if key not in results}
+            if not remaining:
+                progress_callback("Loaded cached assessments (no API call needed).", 1.0)
+                return results
+            
+            video_file, content_hash, error = self.upload_video(video_path, progress_callback)
+            if error:
+                return {key: results.get(key, error) for key in rubrics}
+            
+            video_file, error = self.wait_for_processing(
+                video_file, content_hash, progress_callback, VideoSegmenter.probe_duration(video_path)
+            )
+            if error:
+                return {key: results.get(key, error) for key in rubrics}
+            
+            generated = self.generate_assessments(video_file, remaining, progress_callback, model_name, api_key, max_workers)
+            for key, result in generated.items():
+                self.store_result(video_path, rubrics[key], model_name, result)
+            results.update(generated)
+            return {key: results[key] for key in rubrics}
+        except Exception as e:
+            error_msg = ErrorHandler.format_error(
+                "Unexpected Analysis Error",
+                f"An unexpected error occurred during video analysis: {str(e)}",
+                is_fatal=True
+            )
+            return {key: {"error": error_msg, "fatal": True} for key in rubrics}
+    
+    def generate_assessments(self, video_file, rubrics, progress_callback, model_name="gemini-2.5-flash", api_key=None, max_workers=3):
+        """
+        Run generate_assessment for each rubric concurrently on one ACTIVE video.
+        Returns dict of rubric key -> result.
+        """
+        progress_callback(f"Assessing against {len(rubrics)} rubrics using {model_name}...", 0.6)
+        
+        def rubric_progress(key):
+            return lambda msg, val: progress_callback(f"[{key}] {msg}", val)
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(rubrics)))) as pool:
+            futures = {
+                key: pool.submit(
+                    self.generate_assessment,
+                    video_file,
+                    rubric,
+                    rubric_progress(key),
+                    model_name,
+                    auto_detect_pattern=rubric.get("auto_detect", False),
+                    api_key=api_key
+                )
+                for key, rubric in rubrics.items()
+            }
+            results = {key: future.result() for key, future in futures.items()}
+        
+        progress_callback("Analysis Complete.", 1.0)
+        return results
+    
+    def upload_video(self, video_path, progress_callback):
+        """
+        Upload a video, or reuse an earlier upload of the same content.
+        Returns (video_file, content_hash, error_result)
+        """
+        # Clear out uploads from earlier runs that have passed their TTL
+        UploadRegistry.evict_expired()
+        
+        progress_callback("Uploading video to Gemini...", 0.1)
+        try:
+            # Check if file exists
+            if not os.path.exists(video_path):
+                error_msg = ErrorHandler.format_error(
+                    "Video File Not Found",
+                    f"The video file could not be found at: {video_path}",
+                    is_fatal=True
+                )
+                return None, None, {"error": error_msg, "fatal": True}
+            
+            content_hash = UploadRegistry.content_hash(video_path)
+            upload_path = video_path
+            if self.transcode_profile is not None:
+                # Registry key changes too, so raw and compressed uploads stay apart
+                upload_path, content_hash = VideoTranscoder.prepare(
+                    video_path, content_hash, self.transcode_profile, progress_callback
+                )
+            
+            video_file = UploadRegistry.reuse(content_hash)
+            if video_file is not None:
+                progress_callback("Reusing previously uploaded video...", 0.3)
+                Metrics.increment("uploads_reused_total")
+            else:
+                # Check file size (warn if very large)
+                file_size = os.path.getsize(upload_path)
+                file_size_mb = file_size / (1024 * 1024)
+                if file_size_mb > 100:
+                    print(f"Warning: Large video file ({file_size_mb:.1f} MB) may take longer to process")
+                
+                started = time.monotonic()
+                try:
+                    video_file = RateLimiter.shared().call("upload", GeminiBackend.current().upload_file, upload_path)
+                except Exception:
+                    Metrics.record("upload", time.monotonic() - started, "error", file_size, video=os.path.basename(video_path))
+                    raise
+                Metrics.record("upload", time.monotonic() - started, "ok", file_size, video=os.path.basename(video_path))
+                UploadRegistry.register(content_hash, video_file, video_path)
+        except FileNotFoundError:
+            error_msg = ErrorHandler.format_error(
+                "Video File Not Found",
+                f"The video file could not be found. It may have been moved or deleted.",
+                is_fatal=True
+            )
+            return None, None, {"error": error_msg, "fatal": True}
+        except PermissionError:
+            error_msg = ErrorHandler.format_error(
+                "File Access Denied",
+                f"You don't have permission to read the video file. Check file permissions.",
+                is_fatal=True
+            )
+            return None, None, {"error": error_msg, "fatal": True}
+        except Exception as e:
+            error_msg = ErrorHandler.format_error(
+                "Video Upload Failed",
+                f"Could not upload video file: {str(e)}",
+                is_fatal=True
+            )
+            return None, None, {"error": error_msg, "fatal": True}
+        
+        return video_file, content_hash, None
+    
+    def wait_for_processing(self, video_file, content_hash, progress_callback, duration_seconds=None):
+        """
+        Wait until Gemini has finished processing an uploaded video.
+        Returns (video_file, error_result)
+        """
+        return self.wait_for_processing_async(video_file, content_hash, progress_callback, duration_seconds).result()
+    
+    def wait_for_processing_async(self, video_file, content_hash, progress_callback, duration_seconds=None):
+        """
+        Hand an uploaded video to the shared ProcessingPoller.
+        duration_seconds (from ffprobe, when known) lets long but small
+        videos wait longer than their file size alone would allow.
+        Returns a Future that resolves to (video_file, error_result).
+        """
+        progress_callback("Processing video (this may take a moment)...", 0.3)
+        outcome = Future()
+        if video_file.state.name != "PROCESSING":
+            outcome.set_result(self._processing_outcome(video_file, content_hash))
+            return outcome
+        
+        started = time.monotonic()
+        
+        def on_done(watch_future):
+            waited = time.monotonic() - started
+            try:
+                final_file = watch_future.result()
+            except TimeoutError:
+                Metrics.record("processing", waited, "timeout", file=video_file.name)
+                UploadRegistry.forget(content_hash, delete_remote=True)
+                error_msg = ErrorHandler.format_error(
+                    "Video Processing Timeout",
+                    "The video processing took too long. This may be due to a very large file or server issues.",
+                    is_fatal=True
+                )
+                outcome.set_result((None, {"error": error_msg, "fatal": True}))
+                return
+            except Exception as e:
+                Metrics.record("processing", waited, "error", file=video_file.name)
+                error_msg = ErrorHandler.format_error(
+                    "Video Processing Error",
+                    f"Error checking video processing status: {str(e)}",
+                    is_fatal=True
+                )
+                outcome.set_result((None, {"error": error_msg, "fatal": True}))
+                return
+            Metrics.record("processing", waited, final_file.state.name.lower(), file=video_file.name)
+            outcome.set_result(self._processing_outcome(final_file, content_hash))
+        
+        size_bytes = getattr(video_file, "size_bytes", 0) or 0
+        ProcessingPoller.shared().watch(video_file, size_bytes, duration_seconds).add_done_callback(on_done)
+        return outcome
+    
+    def _processing_outcome(self, video_file, content_hash):
+        if video_file.state.name == "FAILED":
+            UploadRegistry.forget(content_hash, delete_remote=True)
+            error_msg = ErrorHandler.format_error(
+                "Video Processing Failed",
+                "Google's servers could not process your video file. This may be due to file format, corruption, or size issues.",
+                is_fatal=True
+            )
+            return None, {"error": error_msg, "fatal": True}
+        
+        return video_file, None
+    
+    def generate_assessment(self, video_file, rubric_data, progress_callback, model_name="gemini-2.5-flash", auto_detect_pattern=False, api_key=None, on_assessment=None):
+        """
+        Assess an uploaded, ACTIVE video against the rubric.
+        Returns the parsed assessment, or a dict with "error" and "fatal".
+        """
+        try:
+            # 2.5. Auto-detect suturing pattern if needed. The detection and
+            # the assessment run as one fused request; a dedicated detection
+            # call is only made when the fused answer is inconclusive.
+            detected_pattern = None
+            if auto_detect_pattern:
+                progress_callback("Detecting suturing pattern and assessing...", 0.4)
+                candidates = RubricManager.get_suturing_pattern_rubrics()
+                candidates["Unknown"] = rubric_data
+                fused_prompt = GeminiClient.build_prompt(rubric_data, candidate_rubrics=candidates)
+                fused_schema = GeminiClient.response_schema(rubric_data, candidate_rubrics=candidates)
+                result = self._run_prompt(video_file, fused_prompt, progress_callback, model_name, on_assessment, fused_schema)
+                if "error" in result:
+                    return result
+                
+                detected_pattern = result.get("detected_pattern")
+                if detected_pattern != "Unknown" and GeminiClient._covers_rubric(result, candidates.get(detected_pattern)):
+                    Metrics.increment("pattern_detection_total", method="fused", outcome="detected")
+                    progress_callback(f"Detected pattern: {detected_pattern}", 1.0)
+                    return ResponseParser.validate(result, candidates[detected_pattern])
+                
+                Metrics.increment("pattern_detection_total", method="fused", outcome="inconclusive")
+                # Keep a usable generic assessment in case detection stays inconclusive
+                generic_result = result if GeminiClient._covers_rubric(result, rubric_data) else None
+                
+                progress_callback("Pattern unclear, running dedicated detection...", 0.5)
+                detected_pattern = GeminiClient._detect_suturing_pattern(video_file, model_name, api_key)
+                if detected_pattern in candidates:
+                    # Update rubric_data with detected pattern's rubric
+                    rubric_data = candidates[detected_pattern]
+                    progress_callback(f"Detected pattern: {detected_pattern}", 0.5)
+                elif generic_result is not None:
+                    generic_result["detected_pattern"] = "Unknown"
+                    progress_callback("Pattern detection inconclusive, using generic rubric", 1.0)
+                    return ResponseParser.validate(generic_result, rubric_data)
+                else:
+                    progress_callback("Pattern detection inconclusive, using generic rubric", 0.5)
+            
+            # 3. Construct Prompt
+            progress_callback(f"Analyzing content against rubric using {model_name}...", 0.6)
+            prompt = GeminiClient.build_prompt(rubric_data)
+            schema = GeminiClient.response_schema(rubric_data)
+            
+            # 4. Generate Content and parse the response
+            result = self._run_prompt(video_file, prompt, progress_callback, model_name, on_assessment, schema)
+            if "error" in result:
+                return result
+            if detected_pattern:
+                result["detected_pattern"] = detected_pattern
+            # Fill in anything the model skipped rather than re-running the video
+            return ResponseParser.validate(result, rubric_data)
+        except Exception as e:
+            error_msg = ErrorHandler.format_error(
+                "Unexpected Analysis Error",
+                f"An unexpected error occurred during video analysis: {str(e)}",
+                is_fatal=True
+            )
+            return {"error": error_msg, "fatal": True}
+    
+    @staticmethod
+    def _covers_rubric(result, rubric_data):
+        """True if the result scores every item of the rubric."""
+        if not rubric_data:
+            return False
+        entries = {item.get('name'): item for item in result.get('assessments', []) if isinstance(item, dict)}
+        return all(
+            item['name'] in entries
+            and ResponseParser._normalize_score(entries[item['name']].get('score'), item['type']) is not None
+            for item in rubric_data['items']
+        )
+    
+    @staticmethod
+    def response_schema(rubric_data, candidate_rubrics=None, segment=False):
+        """
+        Build the response schema for structured output. Criterion names are
+        restricted to the rubric's items; score ranges are given per item in
+        the description since the schema format has no numeric bounds.
+        """
+        rubrics = list(candidate_rubrics.values()) if candidate_rubrics else [rubric_data]
+        names = []
+        score_rules = []
+        for rubric in rubrics:
+            for item in rubric['items']:
+                if item['name'] in names:
+                    continue
+                names.append(item['name'])
+                score_range = "0 (No) or 1 (Yes)" if item['type'] == 'binary' else "1-5"
+                score_rules.append(f"{item['name']}: {score_range}")
+        
+        assessment = {
+            "type": "object",
+            "properties": {
+                "name": {"type": "string", "enum": names},
+                "score": {"type": "integer", "description": "Allowed scores per criterion: " + "; ".join(score_rules)},
+                "advice": {"type": "string"}
+            },
+            "required": ["name", "score", "advice"]
+        }
+        if segment:
+            assessment["properties"]["observed"] = {"type": "boolean"}
+            assessment["required"].append("observed")
+        
+        schema = {
+            "type": "object",
+            "properties": {
+                "assessments": {"type": "array", "items": assessment},
+                "summative_comment": {"type": "string"}
+            },
+            "required": ["assessments", "summative_comment"]
+        }
+        if candidate_rubrics:
+            schema["properties"]["detected_pattern"] = {"type": "string", "enum": list(candidate_rubrics)}
+            schema["required"].insert(0, "detected_pattern")
+        return schema
+    
+    @staticmethod
+    def build_prompt(rubric_data, candidate_rubrics=None, extra_instructions=""):
+        """
+        Build the assessment prompt for a rubric.
+        
+        With candidate_rubrics (technique name -> rubric), the prompt asks the
+        model to identify the suturing technique first and assess against the
+        matching rubric, returning the technique as 'detected_pattern'.
+        extra_instructions is appended after the rubric-specific directives
+        (used for segment context).
+        """
+        rubric_title = rubric_data.get('title', '')
+        if candidate_rubrics:
+            rubric_text = json.dumps(candidate_rubrics, indent=2)
+            rubric_heading = """SUTURING PATTERN DETECTION:
+            
+            First identify which suturing technique is being used in the video:
+            - "Simple Interrupted" - Individual separate stitches, each tied independently
+            - "Vertical Mattress" - Deep and superficial bites creating a vertical pattern, often with visible eversion
+            - "Subcuticular" - Continuous running suture beneath the skin surface, minimal visible suture material
+            - "Unknown" - If you cannot determine the technique
+            
+            Then assess the performance strictly against the rubric for that technique below, using the exact item names of that rubric only.
+            
+            CANDIDATE RUBRICS (keyed by technique):"""
+            pattern_field = '"detected_pattern": "Simple Interrupted | Vertical Mattress | Subcuticular | Unknown",'
+        else:
+            rubric_text = json.dumps(rubric_data, indent=2)
+            rubric_heading = "RUBRIC DEFINITION:"
+            pattern_field = ""
+        
+        # Build rubric-specific instructions based on procedure type
+        special_instructions = ""
+        
+        if "Chest Tube" in rubric_title:
+            special_instructions = """
+            
+            CRITICAL ASSESSMENT DIRECTIVE: PATIENT IMPACT & FINESSE
+            
+            You must evaluate not just *if* a step was done, but *how* it was done, with a specific focus on patient trauma and pain.
+            
+            1. **Dissection Finesse (The "One-Pass" Rule):**
+               - **Ideal:** The practitioner should spread the intercostal muscles firmly and decisively in 1-2 motions to create the track.
+               - **Red Flag (Pain/Trauma):** Watch closely for "pecking," "searching," or repetitive small spreading motions with the Kelly clamp deep in the tissue.
+               - **Assessment Impact:** If you see multiple (>3) separate spreading maneuvers at the same depth, you must downgrade "Economy of Motion" and flag "Dissects with gentle pressure" as a potential failure due to excessive trauma, even if they eventually enter the pleura.
+               - **Rationale:** Repeated spreading of the intercostal muscles is excruciatingly painful for a conscious patient and increases the risk of intercostal nerve injury.
+            
+            2. **Economy of Motion as a Proxy for Competence:**
+               - Do not rate "Economy of Motion" highly just because the student is moving quickly.
+               - Look for *purposeful* movement. Fumbling with the suture, losing the tail, or repeatedly picking up/putting down instruments are signs of cognitive load overload and should lower the score.
+               - Watch the blunt dissection closely. Count the number of spreading maneuvers.
+               - Ideal technique is 'push, spread, advance.' Repetitive 'pecking' is incorrect.
+               - Flag any motion that looks like it would cause unnecessary pain in a conscious patient.
+            
+            3. **Holistic Impact:**
+               - If a step is technically completed (e.g., the tube goes in) but the technique was traumatic (excessive force, repetitive spreading), the specific step (e.g., "Enters pleura") should be marked as **"No"** or **"Marginal,"** and the feedback must explicitly mention "patient pain" or "excessive tissue trauma."
+            
+            CALIBRATION UPDATE: THE "NOVICE CURVE"
+            
+            You are evaluating a resident in training. Be critical of technique, but pragmatic about scoring.
+            
+            1. **The "Pecking" Rule:**
+               - Repetitive "pecking" or small spreading motions during dissection are common in novices.
+               - **Scoring:** If the dissection remains safely over the rib and enters the pleura without damaging surrounding structures, mark the step as **"YES"** (Pass).
+               - **Feedback:** Do NOT fail the step solely for pecking. Instead, use the "Feedback" box to strongly critique the inefficiency and mention the potential for increased patient pain.
+               - **Fail Criteria:** Only mark "No" if the motion creates a false track, slips off the rib dangerously, or is violent/uncontrolled.
+            
+            2. **Proficiency Threshold:**
+               - A student can demonstrate "Proficiency" (Pass) even with imperfect economy of motion.
+               - Proficiency means "Safe to perform under supervision," not "Master surgeon."
+               - If the tube is in safely and secured, lean towards a "Yes" on proficiency unless a critical safety violation occurred.
+            
+            """
+        elif "Suturing" in rubric_title:
+            special_instructions = """
+            
+            CRITICAL ASSESSMENT DIRECTIVE: PATIENT IMPACT & FINESSE
+            
+            You must evaluate not just *if* a step was done, but *how* it was done, with a specific focus on patient trauma and tissue handling.
+            
+            1. **Tissue Handling Finesse:**
+               - Watch for excessive force or repeated grasping of tissue with forceps, which causes trauma.
+               - Multiple attempts to grasp the same tissue indicate poor technique and should lower scores.
+               - Look for signs of crushing or tearing tissue during manipulation.
+            
+            2. **Economy of Motion:**
+               - Do not rate "Economy of Motion" highly just because the student is moving quickly.
+               - Look for *purposeful* movement. Dropping instruments, fumbling with sutures, or repeatedly adjusting position are signs of inefficiency and should lower the score.
+               - Each motion should have clear intent and contribute to progress.
+            
+            3. **Holistic Impact:**
+               - If sutures are placed but tissue handling was traumatic (excessive force, repeated grasping), mark "Gentle tissue handling" as low and explicitly mention "patient trauma" or "tissue damage" in feedback.
+            
+            CALIBRATION DIRECTIVE: DISTINGUISHING "CLUMSY" FROM "UNSAFE"
+            
+            You are evaluating a *novice resident*, not an expert surgeon. You must distinguish between "inefficient/clumsy" (which is acceptable for a pass) and "dangerous/traumatic" (which is a fail).
+            
+            1. **The "Good Enough" Standard:**
+               - If the student achieves the clinical goal (e.g., places sutures correctly, closes wound) but takes 2-3 extra attempts or looks stiff/hesitant, mark the step as **"Pass"** (score 3-4 for likert, "Yes" for binary) but note the inefficiency in the feedback.
+               - Only mark a step as **"Fail"** (score 1-2 for likert, "No" for binary) if the action was *ineffective* (sutures don't hold, wound doesn't close) or *dangerous* (visible tissue damage, excessive bleeding from technique).
+            
+            2. **Evaluating "Clumsiness" vs. "Trauma":**
+               - Multiple attempts to grasp tissue or place a suture is inefficient but not automatically a failure unless it causes visible tissue damage or is excessive (>5-6 attempts for the same action).
+               - If they fumble but eventually place sutures correctly without causing harm, score as **"Pass"** but downgrade "Economy of Motion" and "Gentle tissue handling" scores.
+            
+            3. **Holistic Proficiency:**
+               - A student can be "Proficient" (score 3-4) even with poor economy of motion, provided they are safe and achieve the clinical goal. Do not fail the entire procedure solely for slowness, stiffness, or minor inefficiencies.
+            
+            """
+        elif "Patient Encounter" in rubric_title or "SP" in rubric_title:
+            special_instructions = """
+            
+            CRITICAL ASSESSMENT DIRECTIVE: PATIENT EXPERIENCE & COMMUNICATION
+            
+            You must evaluate not just *if* communication occurred, but *how* it impacted the patient experience.
+            
+            1. **Empathy & Validation:**
+               - Look for genuine acknowledgment of patient emotions, not just perfunctory responses.
+               - Watch for non-verbal cues that show the practitioner is truly listening and responding to patient concerns.
+            
+            2. **Communication Efficiency:**
+               - Do not rate highly just because questions were asked quickly.
+               - Look for *purposeful* communication that builds rapport and gathers necessary information without causing patient distress.
+               - Repetitive questioning or asking the same thing multiple ways indicates poor communication skills.
+            
+            3. **Holistic Impact:**
+               - If communication occurred but the patient appeared uncomfortable, anxious, or confused, mark relevant items lower and explicitly mention "patient distress" or "communication breakdown" in feedback.
+            
+            """
+        else:
+            # Generic patient-focused instructions for other procedures
+            special_instructions = """
+            
+            CRITICAL ASSESSMENT DIRECTIVE: PATIENT IMPACT & FINESSE
+            
+            You must evaluate not just *if* steps were completed, but *how* they were performed, with a specific focus on patient safety, comfort, and tissue trauma.
+            
+            1. **Technique Finesse:**
+               - Watch for signs of excessive force, repetitive unnecessary motions, or fumbling that could cause patient discomfort or trauma.
+               - Multiple attempts to complete the same step indicate poor technique and should lower scores.
+            
+            2. **Economy of Motion:**
+               - Do not rate "Economy of Motion" highly just because the student is moving quickly.
+               - Look for *purposeful* movement. Dropping instruments, fumbling, or repeatedly adjusting position are signs of inefficiency and should lower the score.
+            
+            3. **Holistic Impact:**
+               - If steps are technically completed but the technique was traumatic or inefficient, mark relevant items lower and explicitly mention "patient trauma," "excessive force," or "inefficient technique" in feedback.
+            
+            CALIBRATION DIRECTIVE: DISTINGUISHING "CLUMSY" FROM "UNSAFE"
+            
+            You are evaluating a *novice resident*, not an expert surgeon. You must distinguish between "inefficient/clumsy" (which is acceptable for a pass) and "dangerous/traumatic" (which is a fail).
+            
+            1. **The "Good Enough" Standard:**
+               - If the student achieves the clinical goal but takes 2-3 extra attempts or looks stiff/hesitant, mark the step as **"Pass"** (score 3-4 for likert, "Yes" for binary) but note the inefficiency in the feedback.
+               - Only mark a step as **"Fail"** (score 1-2 for likert, "No" for binary) if the action was *ineffective* (didn't achieve the goal) or *dangerous* (risked patient harm).
+            
+            2. **Evaluating Inefficiency vs. Danger:**
+               - Multiple attempts or fumbling is inefficient but not automatically a failure unless it causes harm or is excessive (>5-6 attempts for the same action).
+               - If they eventually complete the step safely and effectively, score as **"Pass"** but downgrade efficiency-related scores.
+            
+            3. **Holistic Proficiency:**
+               - A student can be "Proficient" (score 3-4) even with poor economy of motion, provided they are safe and achieve the clinical goal. Do not fail the entire procedure solely for slowness, stiffness, or minor inefficiencies.
+            
+            """
+        
+        prompt = f"""
+        You are an expert medical evaluator. Watch the attached video and assess the performance based strictly on the following rubric.
+        
+        Your goal is to provide feedback that a student can verify. If you claim they 'pecked' during dissection, tell them exactly when it happened so they can watch the video and see it themselves.
+        
+        {rubric_heading}
+        
+        {rubric_text}
+        
+        {special_instructions}
+        
+        {extra_instructions}
+        
+        INSTRUCTIONS:
+        
+        1. Provide a score for each item.
+           - For 'likert' type: Score 1 (Novice) to 5 (Expert).
+           - For 'binary' type: Score 1 (Yes/Done) or 0 (No/Not Done).
+           - **CRITICAL:** Evaluate not just whether steps were completed, but HOW they were performed. Consider patient trauma, pain, and tissue damage in your scoring.
+           - **CALIBRATION:** Remember you are evaluating a novice resident. Distinguish between "inefficient/clumsy" (acceptable for pass, score 3-4) and "dangerous/traumatic" (fail, score 1-2). If the clinical goal is achieved safely, even with inefficiency, mark as Pass but note inefficiency in feedback.
+        
+        2. **GENERAL SAFETY DIRECTIVE: INSTRUMENT HYGIENE & SAFETY**
+           - Regardless of the specific procedure, you must continuously monitor for 'Instrument Hygiene' violations. If any of the following occur, you must flag them immediately in the commentary and potentially fail the relevant step or the entire proficiency rating if the action is dangerous.
+           
+           a. **Inappropriate Dual-Use:**
+              - Instruments must only be used for their intended purpose.
+              - **CRITICAL FAIL:** Using an instrument to dissect, cut, or spread tissue while it is *simultaneously* holding another object (e.g., a tube, a needle, or gauze). This blunts the instrument, crushes the object, and risks uncontrolled trauma.
+              - **Example:** Dissecting with a Kelly clamp while it is gripping a chest tube.
+           
+           b. **Uncontrolled Sharps:**
+              - Watch for needles or scalpels being waved in the air, left on the patient drape, or handled with fingers instead of instruments (unless appropriate).
+              - **Flag:** Ideally, sharps should be "parked" safely or handed off immediately after use.
+           c. **Loss of Tension/Control:**
+              - Watch for instruments slipping, requiring repeated re-grasping, or being used with a loose grip that allows the tip to wander.
+              - **Comment:** Note any "fumbling" or "resetting" of the grip as an efficiency issue.
+           
+           **If a Critical Fail (Rule 2a - Inappropriate Dual-Use) is observed:**
+              - Mark the relevant step (e.g., "Grasps tube" or "Dissects") as **"No"**.
+              - Mark "Proficiency" (if present) as **"No"**.
+              - In the feedback, use the phrase: **"CRITICAL SAFETY VIOLATION: Instrument Hygiene."**
+        
+        3. Provide 'actionable_advice' for every single item based on visual evidence.
+           - **MANDATORY:** If you observe signs of patient trauma, excessive force, repetitive unnecessary motions, or inefficiency, you MUST explicitly mention these in your advice.
+           - **CALIBRATION:** When noting inefficiency (multiple attempts, fumbling), distinguish between "needs improvement" (for clumsy but safe technique) and "critical error" (for dangerous technique). Provide constructive feedback that helps the resident improve.
+           - Focus on specific techniques that would reduce patient discomfort and improve outcomes.
+        
+        4. Provide a 'summative_comment' for the whole procedure.
+           - Include an assessment of overall patient impact and technique finesse.
+           - **CALIBRATION:** Acknowledge that novice residents may be slow or clumsy but still proficient if they are safe and achieve the clinical goal. Only fail if there are safety concerns or the procedure was ineffective.
+           - Highlight any concerns about patient trauma or inefficient technique, but frame them appropriately for a learning context.
+        
+        5. **MANDATORY TIMESTAMP REQUIREMENT:**
+           - For any criterion where the score indicates poor performance (e.g., 'No' for binary, or <=3 for Likert), you MUST provide a specific timestamp (MM:SS format) in the 'advice' field citing exactly where the error or inefficient behavior occurred.
+           - Example format: "[01:15] The student fumbled the needle driver..."
+           - Example format: "[02:32] You performed 5 small spreading motions here instead of one decisive spread..."
+           - If multiple issues occur at different times, include multiple timestamps: "[01:15] First issue... [02:30] Second issue..."
+           - This makes feedback verifiable and actionable. A student can watch the video at that timestamp and see exactly what you're referring to.
+           - Note: Scores of 4-5 (Likert) or 'Yes' (binary) do not require timestamps unless there are specific improvement suggestions.
+        
+        OUTPUT FORMAT:
+        
+        Return ONLY valid JSON. Do not use Markdown code blocks. The JSON must match this structure:
+        
+        {{
+            {pattern_field}
+            "assessments": [
+                {{ "name": "Criterion Name", "score": 3, "advice": "[01:15] Observation and advice with timestamp..." }},
+                ...
+            ],
+            "summative_comment": "Overall feedback..."
+        }}
+        
+        **CRITICAL:** Every 'advice' field for scores indicating poor performance (binary 'No' or Likert <=3) MUST include at least one timestamp in [MM:SS] format. This is mandatory for verifiable feedback.
+        """
+        
+        return prompt
+    
+    def _run_prompt(self, video_file, prompt, progress_callback, model_name, on_assessment=None, schema=None):
+        """
+        Send the video and prompt to the model and parse the JSON answer.
+        
+        With on_assessment, the response is streamed and each completed
+        entry of "assessments" is passed to on_assessment(entry) as soon as
+        it arrives. schema (see response_schema) constrains the output when
+        structured output is enabled.
+        
+        Returns the parsed dict, or a dict with "error" and "fatal".
+        """
+        generation_config = None
+        if schema is not None and self.structured_output:
+            generation_config = {
+                "response_mime_type": "application/json",
+                "response_schema": schema
+            }
+        # 4. Generate Content
+        started = time.monotonic()
+        try:
+            cached_content = None
+            if self.prompt_cache is not None:
+                cached_content = self.prompt_cache.cached_content_for(model_name, prompt)
+            if cached_content is not None:
+                # Instructions come from the cached context
+                contents = [video_file, PromptCache.VIDEO_INSTRUCTION]
+            else:
+                contents = [video_file, prompt]
+            limiter = RateLimiter.shared()
+            estimated_tokens = RateLimiter.estimate_tokens(video_file, prompt)
+            if on_assessment is None:
+                response = limiter.call(
+                    "generate",
+                    GeminiBackend.current().generate_content,
+                    model_name,
+                    contents,
+                    generation_config=generation_config,
+                    timeout=600,
+                    cached_content=cached_content,
+                    tokens=estimated_tokens
+                )
+                response_text = response.text
+            else:
+                # The slot is held until the whole stream has been read
+                response = limiter.call_stream(
+                    "generate",
+                    GeminiBackend.current().generate_content,
+                    model_name,
+                    contents,
+                    generation_config=generation_config,
+                    stream=True,
+                    timeout=600,
+                    cached_content=cached_content,
+                    tokens=estimated_tokens
+                )
+                parser = IncrementalAssessmentParser(on_assessment)
+                for chunk in response:
+                    try:
+                        chunk_text = chunk.text
+                    except ValueError:
+                        # Chunks without text parts (e.g. final metadata)
+                        continue
+                    parser.feed(chunk_text)
+                response_text = parser.text()
+            # Replace the estimate with the real usage once it's known
+            total_tokens = None
+            try:
+                total_tokens = response.usage_metadata.total_token_count
+                limiter.record_tokens(total_tokens - estimated_tokens)
+            except Exception:
+                pass
+        except Exception as e:
+            Metrics.record("generate", time.monotonic() - started, "error", model=model_name)
+            error_str = str(e)
+            # The upload stays registered so a retry can reuse it
+            
+            # Determine if fatal
+            is_fatal = False
+            if "404" in error_str or "not found" in error_str.lower():
+                is_fatal = True
+            elif "403" in error_str or "permission" in error_str.lower():
+                is_fatal = True
+            elif "401" in error_str or "invalid" in error_str.lower():
+                is_fatal = True
+            
+            error_msg = ErrorHandler.format_error(
+                "AI Analysis Failed",
+                error_str,
+                is_fatal=is_fatal
+            )
+            return {"error": error_msg, "fatal": is_fatal}
+        
+        Metrics.record(
+            "generate", time.monotonic() - started, "ok", len(response_text.encode()),
+            model=model_name, tokens=total_tokens, streamed=on_assessment is not None,
+            prompt_cached=cached_content is not None
+        )
+        
+        # 5. Cleanup happens later via UploadRegistry.evict_expired(), so
+        # re-runs with another model or rubric skip the upload entirely
+        progress_callback("Analysis Complete.", 1.0)
+        
+        # Parse JSON, recovering what we can from truncated output
+        started = time.monotonic()
+        try:
+            result, repaired = ResponseParser.extract(response_text)
+        except (ValueError, json.JSONDecodeError) as e:
+            Metrics.record("parse", time.monotonic() - started, "error", len(response_text))
+            error_msg = ErrorHandler.format_error(
+                "AI Response Parsing Error",
+                f"The AI returned a response that couldn't be parsed as JSON. This is usually a temporary issue. Error: {str(e)}",
+                is_fatal=False
+            )
+            return {"error": error_msg, "fatal": False}
+        if repaired:
+            print("[Parser] Response was truncated; kept the complete part")
+        Metrics.record("parse", time.monotonic() - started, "repaired" if repaired else "ok", len(response_text))
+        return result
+    
+    @staticmethod
+    def _detect_suturing_pattern(video_file, model_name, api_key=None):
+        """
+        Detect which suturing pattern is being used in the video.
+        Returns: "Simple Interrupted", "Vertical Mattress", "Subcuticular", or None
+        """
+        started = time.monotonic()
+        try:
+            if api_key:
+                GeminiBackend.current().configure(api_key)
+            
+            detection_prompt = """
+            Watch this surgical video and identify which suturing technique is being used.
+            
+            Possible techniques:
+            1. Simple Interrupted - Individual separate stitches, each tied independently
+            2. Vertical Mattress - Deep and superficial bites creating a vertical pattern, often with visible eversion
+            3. Subcuticular - Continuous running suture beneath the skin surface, minimal visible suture material
+            
+            Respond with ONLY one of these exact strings:
+            - "Simple Interrupted"
+            - "Vertical Mattress"  
+            - "Subcuticular"
+            - "Unknown" (if you cannot determine)
+            
+            Do not provide any explanation, just the technique name.
+            """
+            
+            response = RateLimiter.shared().call(
+                "generate",
+                GeminiBackend.current().generate_content,
+                model_name,
+                [video_file, detection_prompt],
+                timeout=60,
+                tokens=RateLimiter.estimate_tokens(video_file, detection_prompt)
+            )
+            
+            detected = response.text.strip()
+            # Clean up any markdown or extra text
+            detected = detected.replace("```", "").strip()
+            
+            valid_patterns = ["Simple Interrupted", "Vertical Mattress", "Subcuticular"]
+            for pattern in valid_patterns:
+                if pattern.lower() in detected.lower():
+                    Metrics.record("detect", time.monotonic() - started, "detected", method="dedicated", pattern=pattern)
+                    return pattern
+            
+            Metrics.record("detect", time.monotonic() - started, "unknown", method="dedicated")
+            return None
+        except Exception as e:
+            print(f"[Pattern Detection] Error: {e}")
+            Metrics.record("detect", time.monotonic() - started, "error", method="dedicated")
+            return None
+
+class ProcessingPoller:
+    """
+    Tracks every upload that is still PROCESSING on Gemini's side and
+    refreshes them all from one background thread, instead of one polling
+    loop per video.
+    
+    Each file is re-checked on its own adaptive schedule: large files start
+    with a longer interval and every unchanged check backs off further.
+    Timeouts scale with file size (and duration when known).
+    """
+    MIN_INTERVAL = 1.0
+    MAX_INTERVAL = 15.0
+    BACKOFF = 1.5
+    MB_PER_INTERVAL_SECOND = 100  # A 500 MB file starts at a 6 s interval
+    BASE_TIMEOUT = 120
+    TIMEOUT_PER_MB = 1.0
+    TIMEOUT_PER_VIDEO_MINUTE = 20
+    MAX_TIMEOUT = 60 * 60
+    MAX_CHECK_ERRORS = 3
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    @staticmethod
+    def shared():
+        """Return the process-wide poller, starting it on first use."""
+        with ProcessingPoller._shared_lock:
+            if ProcessingPoller._shared is None:
+                ProcessingPoller._shared = ProcessingPoller()
+            return ProcessingPoller._shared
+
+    @staticmethod
+    def timeout_for(size_bytes, duration_seconds=None):
+        """How long to wait for PROCESSING before giving up on a file."""
+        size_mb = size_bytes / (1024 * 1024)
+        timeout = ProcessingPoller.BASE_TIMEOUT + size_mb * ProcessingPoller.TIMEOUT_PER_MB
+        if duration_seconds:
+            timeout += (duration_seconds / 60) * ProcessingPoller.TIMEOUT_PER_VIDEO_MINUTE
+        return min(timeout, ProcessingPoller.MAX_TIMEOUT)
+
+    def __init__(self):
+        self._pending = {}  # remote file name -> tracking entry
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def watch(self, video_file, size_bytes=0, duration_seconds=None):
+        """
+        Start tracking an uploaded file.
+        Returns a Future resolving to the file once it is ACTIVE or FAILED,
+        or raising TimeoutError if processing exceeds the size-based limit.
+        """
+        future = Future()
+        now = time.monotonic()
+        timeout = ProcessingPoller.timeout_for(size_bytes, duration_seconds)
+        size_mb = size_bytes / (1024 * 1024)
+        interval = min(
+            ProcessingPoller.MAX_INTERVAL,
+            ProcessingPoller.MIN_INTERVAL + size_mb / ProcessingPoller.MB_PER_INTERVAL_SECOND
+        )
+        with self._lock:
+            entry = self._pending.get(video_file.name)
+            if entry:
+                # Same remote file requested twice (e.g. a reused upload)
+                entry["futures"].append(future)
+            else:
+                self._pending[video_file.name] = {
+                    "futures": [future],
+                    "interval": interval,
+                    "next_check": now + interval,
+                    "deadline": now + timeout,
+                    "timeout": timeout,
+                    "errors": 0
+                }
+        self._wakeup.set()
+        return future
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                next_checks = [entry["next_check"] for entry in self._pending.values()]
+            if next_checks:
+                delay = max(0.0, min(next_checks) - time.monotonic())
+                self._wakeup.wait(delay)
+            else:
+                self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                self._sweep()
+            except Exception as e:
+                print(f"[Processing Poller] Sweep error: {e}")
+
+    def _sweep(self):
+        now = time.monotonic()
+        with self._lock:
+            due = [name for name, entry in self._pending.items() if entry["next_check"] <= now]
+        if not due:
+            return
+
+        states = {}
+        if len(due) > 1:
+            # One list call refreshes every pending file at once
+            try:
+                remote_files = RateLimiter.shared().call("list_files", GeminiBackend.current().list_files)
+                for remote_file in remote_files:
+                    if remote_file.name in due:
+                        states[remote_file.name] = remote_file
+            except Exception as e:
+                print(f"[Processing Poller] list_files failed, checking files individually: {e}")
+
+        for name in due:
+            error = None
+            remote_file = states.get(name)
+            if remote_file is None:
+                try:
+                    remote_file = RateLimiter.shared().call("get_file", GeminiBackend.current().get_file, name)
+                except Exception as e:
+                    error = e
+            self._update(name, remote_file, error)
+
+    def _update(self, name, remote_file, error):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._pending.get(name)
+            if entry is None:
+                return
+            if error is not None:
+                entry["errors"] += 1
+                if entry["errors"] < ProcessingPoller.MAX_CHECK_ERRORS:
+                    entry["next_check"] = now + entry["interval"]
+                    return
+            elif remote_file.state.name == "PROCESSING":
+                if now < entry["deadline"]:
+                    entry["interval"] = min(ProcessingPoller.MAX_INTERVAL, entry["interval"] * ProcessingPoller.BACKOFF)
+                    entry["next_check"] = min(now + entry["interval"], entry["deadline"])
+                    return
+                error = TimeoutError(f"{name} still PROCESSING after {entry['timeout']:.0f}s")
+            del self._pending[name]
+
+        for future in entry["futures"]:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(remote_file)
+
+class BatchJobStore:
+    """
+    Crash-safe record of batch jobs in SQLite, so a batch survives closing
+    the app, a crash or a dropped connection.
+    
+    Each video in a batch moves through
+    
+        queued -> uploaded (remote file name) -> generated -> reported
+    
+    or ends as failed, with the error and its ErrorHandler.classify() class.
+    Every transition is committed immediately. Resuming a batch re-submits
+    its unfinished videos; the upload registry and result cache make each
+    one continue from its last completed stage.
+    """
+    DB_FILE = "medvat_jobs.sqlite3"
+    UNFINISHED_STATES = ("queued", "uploaded", "generated")
+
+    def __init__(self, path=None):
+        self.path = path or BatchJobStore.DB_FILE
+        self._lock = threading.Lock()
+        # Autocommit: each statement is its own transaction
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS batches (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created_at REAL NOT NULL,
+                    finished_at REAL,
+                    model TEXT NOT NULL,
+                    rubric_keys TEXT NOT NULL
+                )""")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    batch_id INTEGER NOT NULL REFERENCES batches(id),
+                    path TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    remote_name TEXT,
+                    error TEXT,
+                    error_class TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 1,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (batch_id, path)
+                )""")
+
+    def create_batch(self, rubric_keys, model_name):
+        """Start a new batch; returns its id."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO batches (created_at, model, rubric_keys) VALUES (?, ?, ?)",
+                (time.time(), model_name, json.dumps(list(rubric_keys)))
+            )
+            return cursor.lastrowid
+
+    def add_job(self, batch_id, path):
+        """Queue a video; a video already in the batch is queued again."""
+        with self._lock:
+            self._conn.execute("""
+                INSERT INTO jobs (batch_id, path, state, updated_at) VALUES (?, ?, 'queued', ?)
+                ON CONFLICT (batch_id, path) DO UPDATE SET
+                    state = 'queued', error = NULL, error_class = NULL,
+                    attempts = attempts + 1, updated_at = excluded.updated_at
+                """, (batch_id, os.path.abspath(path), time.time()))
+            self._conn.execute("UPDATE batches SET finished_at = NULL WHERE id = ?", (batch_id,))
+
+    def update(self, batch_id, path, state, remote_name=None, error=None, error_class=None):
+        """Record a state transition for one video."""
+        with self._lock:
+            self._conn.execute("""
+                UPDATE jobs SET state = ?, remote_name = COALESCE(?, remote_name),
+                    error = ?, error_class = ?, updated_at = ?
+                WHERE batch_id = ? AND path = ?
+                """, (state, remote_name, error, error_class, time.time(), batch_id, os.path.abspath(path)))
+
+    def batch(self, batch_id):
+        """Return the batch as a dict (rubric_keys decoded), or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM batches WHERE id = ?", (batch_id,)).fetchone()
+        if row is None:
+            return None
+        batch = dict(row)
+        batch["rubric_keys"] = json.loads(batch["rubric_keys"])
+        return batch
+
+    def jobs(self, batch_id, states=None, error_class=None):
+        """Return the batch's jobs as dicts, optionally filtered."""
+        query = "SELECT * FROM jobs WHERE batch_id = ?"
+        params = [batch_id]
+        if states:
+            query += f" AND state IN ({', '.join('?' * len(states))})"
+            params.extend(states)
+        if error_class:
+            query += " AND error_class = ?"
+            params.append(error_class)
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(query + " ORDER BY rowid", params)]
+
+    def counts(self, batch_id):
+        """Return {state: number of jobs}."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT state, COUNT(*) FROM jobs WHERE batch_id = ? GROUP BY state", (batch_id,)
+            ).fetchall()
+        return {state: count for state, count in rows}
+
+    def latest_batch(self, resumable=False):
+        """
+        Return the most recent batch, or with resumable=True the most recent
+        one that was not closed and still has unfinished videos.
+        """
+        query = "SELECT id FROM batches"
+        params = []
+        if resumable:
+            query += f""" WHERE finished_at IS NULL AND EXISTS (
+                SELECT 1 FROM jobs WHERE jobs.batch_id = batches.id
+                AND jobs.state IN ({', '.join('?' * len(BatchJobStore.UNFINISHED_STATES))}))"""
+            params.extend(BatchJobStore.UNFINISHED_STATES)
+        with self._lock:
+            row = self._conn.execute(query + " ORDER BY id DESC LIMIT 1", params).fetchone()
+        return self.batch(row[0]) if row else None
+
+    def close_batch(self, batch_id):
+        """Mark a batch as done so it is no longer offered for resuming."""
+        with self._lock:
+            self._conn.execute("UPDATE batches SET finished_at = ? WHERE id = ?", (time.time(), batch_id))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class ConnectivityMonitor:
+    """
+    Waits in the background for the Gemini API host to become reachable,
+    then calls on_online() once (e.g. to retry videos that failed with
+    network errors).
+    """
+    HOST = "generativelanguage.googleapis.com"
+    PORT = 443
+    INTERVAL_SECONDS = 30
+    TIMEOUT_SECONDS = 5
+
+    def __init__(self, on_online):
+        self.on_online = on_online
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def is_online():
+        try:
+            socket.create_connection(
+                (ConnectivityMonitor.HOST, ConnectivityMonitor.PORT),
+                timeout=ConnectivityMonitor.TIMEOUT_SECONDS
+            ).close()
+            return True
+        except OSError:
+            return False
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(ConnectivityMonitor.INTERVAL_SECONDS):
+            if ConnectivityMonitor.is_online():
+                print("[Connectivity] API reachable again")
+                self.on_online()
+                return
+
+class VideoScanner:
+    """
+    Fast recursive discovery of video files for bulk import.
+    
+    Walks directories with os.scandir, which returns file types with each
+    entry, so directories with tens of thousands of entries are listed
+    without a stat() call per file. Videos that already have a report
+    (next to them, or in output_dir, under any name ReportRenderer gives
+    it) can be skipped, using the same directory listing.
+    """
+    VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv")
+    _rubric_suffixes = None  # Lower-cased "_<Rubric>" report name suffixes
+
+    @staticmethod
+    def is_video(name):
+        return name.lower().endswith(VideoScanner.VIDEO_EXTENSIONS) and not name.startswith(".")
+
+    @staticmethod
+    def _listing(directory):
+        """Return (video paths, lower-cased names, subdirectories) of one directory."""
+        videos, names, subdirs = [], set(), []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    names.add(entry.name.lower())
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if not entry.name.startswith("."):
+                                subdirs.append(entry.path)
+                        elif VideoScanner.is_video(entry.name) and entry.is_file():
+                            videos.append(entry.path)
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(f"[Scan] Cannot read {directory}: {e}")
+        return videos, names, subdirs
+
+    @staticmethod
+    def scan(root, recursive=True, skip_reported=True, output_dir=None, verbose=True):
+        """
+        Return the video files under root, sorted by path.
+        
+        Args:
+            root: Directory to scan
+            recursive: Also scan subdirectories (hidden ones are skipped)
+            skip_reported: Leave out videos that already have a report
+            output_dir: Where reports are written, if not next to the videos
+            verbose: Log a summary of the scan
+        """
+        started = time.monotonic()
+        reported = None
+        if skip_reported and output_dir:
+            reported = VideoScanner.report_stems(VideoScanner._listing(output_dir)[1]) if os.path.isdir(output_dir) else set()
+        found = []
+        skipped = 0
+        scanned_dirs = 0
+        pending = [root]
+        while pending:
+            directory = pending.pop()
+            videos, names, subdirs = VideoScanner._listing(directory)
+            scanned_dirs += 1
+            if skip_reported and videos and not output_dir:
+                reported = VideoScanner.report_stems(names)
+            for path in videos:
+                if skip_reported and VideoScanner.has_report(path, reported):
+                    skipped += 1
+                else:
+                    found.append(path)
+            if recursive:
+                pending.extend(subdirs)
+        found.sort()
+        if verbose:
+            print(f"[Scan] {root}: {len(found)} video(s) to process, {skipped} already reported, "
+                  f"{scanned_dirs} folder(s) in {time.monotonic() - started:.2f}s")
+        return found
+
+    @staticmethod
+    def report_stems(names):
+        """
+        Return the lower-cased video names (without extension) that have a
+        report among names, the lower-cased file names of a report folder.
+        
+        Matches every name ReportRenderer.pdf_path_for gives a report:
+        <video>.pdf and <video>_<Rubric>.pdf, either with a _<n> duplicate
+        number. A name like case_2.pdf counts for video case only if there
+        is no video case_2 in the same folder.
+        """
+        if VideoScanner._rubric_suffixes is None:
+            VideoScanner._rubric_suffixes = [
+                "_" + ReportRenderer.rubric_suffix(key).lower() for key in RubricManager.get_rubrics()
+            ]
+        video_stems = {os.path.splitext(name)[0] for name in names if VideoScanner.is_video(name)}
+        stems = set()
+        for name in names:
+            if not name.endswith(".pdf"):
+                continue
+            candidates = [name[:-len(".pdf")]]
+            numbered = re.match(r'(.+)_\d+$', candidates[0])
+            if numbered and candidates[0] not in video_stems:
+                candidates.append(numbered.group(1))
+            for candidate in candidates:
+                stems.add(candidate)
+                for suffix in VideoScanner._rubric_suffixes:
+                    if candidate.endswith(suffix) and len(candidate) > len(suffix):
+                        stems.add(candidate[:-len(suffix)])
+        return stems
+
+    @staticmethod
+    def has_report(video_path, reported):
+        """Whether the video is among reported (see report_stems)."""
+        stem = os.path.splitext(os.path.basename(video_path))[0]
+        return stem.lower() in reported
+
+class FolderWatcher:
+    """
+    Watches a folder tree for new videos and hands them over once they are
+    fully written.
+    
+    Recording stations copy files in over seconds or minutes, so a video
+    only counts as ready once its size and modification time are unchanged
+    across two polls and it hasn't been modified for SETTLE_SECONDS. Each
+    ready video is reported once through on_ready(paths); videos that
+    already have a report are ignored.
+    """
+    POLL_SECONDS = 5
+    SETTLE_SECONDS = 10
+
+    def __init__(self, root, on_ready, recursive=True, output_dir=None):
+        self.root = root
+        self.on_ready = on_ready
+        self.recursive = recursive
+        self.output_dir = output_dir
+        self._seen = {}  # path -> (size, mtime) at the last poll
+        self._handed_over = set()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        print(f"[Watch] Watching {self.root}")
+
+    def stop(self):
+        self._stop.set()
+        print(f"[Watch] Stopped watching {self.root}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                ready = self.poll()
+                if ready and not self._stop.is_set():
+                    self.on_ready(ready)
+            except Exception as e:
+                print(f"[Watch] Poll failed: {e}")
+            self._stop.wait(FolderWatcher.POLL_SECONDS)
+
+    def poll(self):
+        """Scan once and return videos that became ready since the last poll."""
+        now = time.time()
+        current = {}
+        ready = []
+        for path in VideoScanner.scan(self.root, self.recursive, output_dir=self.output_dir, verbose=False):
+            if path in self._handed_over:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue  # Moved or deleted since the scan
+            signature = (stat.st_size, stat.st_mtime)
+            current[path] = signature
+            if (self._seen.get(path) == signature and stat.st_size > 0
+                    and now - stat.st_mtime >= FolderWatcher.SETTLE_SECONDS):
+                ready.append(path)
+        self._seen = current
+        for path in ready:
+            self._handed_over.add(path)
+            del self._seen[path]
+        if ready:
+            print(f"[Watch] {len(ready)} new video(s) ready")
+        return ready
+
+class BatchPipeline:
+    """
+    Runs a batch of videos through separately bounded stages connected by
+    queues, so uploads, server-side processing, generation and report
+    writing for different videos overlap:
+
+        upload -> processing wait -> generate -> report
+
+    Upload, generate and report have their own worker pools sized by
+    `concurrency`; the processing wait is handled by the shared
+    ProcessingPoller, so waiting videos don't hold a thread each.
+
+    When several rubrics are given, each processed video fans out into one
+    generate/report task per rubric; the video counts as successful only
+    when every rubric's report was written.
+    """
+    DEFAULT_CONCURRENCY = {"upload": 2, "generate": 3, "report": 1}
+    STAGES = ("upload", "generate", "report")
+
+    def __init__(self, client, rubrics, model_name, api_key, report_callback,
+                 progress_callback=None, on_started=None, on_completed=None, concurrency=None,
+                 force_refresh=False, prompt_cache=None, job_store=None, batch_id=None, exporter=None):
+        """
+        Args:
+            client: GeminiClient used for every stage
+            rubrics: Dict of rubric key -> rubric applied to every video
+            model_name: Gemini model used for generation
+            api_key: API key passed through to GeminiClient
+            report_callback: fn(video_path, result, rubric_key) -> pdf path or None,
+                or a Future for it (e.g. ReportRenderer.submit). rubric_key is
+                None for single-rubric batches.
+            progress_callback: fn(video_name, message, value) for per-video progress
+            on_started: fn(video_name, index, total, completed)
+            on_completed: fn(video_name, completed, total, successful, failed_count, error_summary)
+            concurrency: Dict overriding DEFAULT_CONCURRENCY per stage
+            force_refresh: Ignore cached results and re-run every assessment
+            prompt_cache: Optional PromptCache shared by every generation in
+                the batch; its caches are deleted when the batch finishes
+            job_store, batch_id: Optional BatchJobStore (and the batch in it)
+                that records each video's progress
+            exporter: Optional ResultExporter that receives each assessment
+                once its report is written; flushed when the batch finishes
+        """
+        self.client = client
+        self.rubrics = rubrics
+        self.model_name = model_name
+        self.api_key = api_key
+        self.report_callback = report_callback
+        self.progress_callback = progress_callback
+        self.on_started = on_started
+        self.on_completed = on_completed
+        self.force_refresh = force_refresh
+        self.prompt_cache = prompt_cache
+        self.job_store = job_store
+        self.batch_id = batch_id
+        self.exporter = exporter
+
+        self.concurrency = dict(BatchPipeline.DEFAULT_CONCURRENCY)
+        for stage, workers in (concurrency or {}).items():
+            if stage in self.concurrency:
+                self.concurrency[stage] = max(1, int(workers))
+
+        self.queues = {stage: queue.Queue() for stage in BatchPipeline.STAGES}
+        self.workers = []
+        self.total = 0
+        self.completed = 0
+        self.successful = 0
+        self.failed = []
+        # Seconds spent per stage and per video (submit to finish)
+        self.stage_times = {stage: [] for stage in ("upload", "processing", "generate", "report")}
+        self.video_times = []
+        self._closed = False
+        self._lock = threading.Lock()
+        self._done = threading.Condition(self._lock)
+
+    def start(self):
+        """Start the worker pool for every stage."""
+        if self.prompt_cache is not None:
+            self.client.prompt_cache = self.prompt_cache
+        handlers = {
+            "upload": self._upload_stage,
+            "generate": self._generate_stage,
+            "report": self._report_stage,
+        }
+        for stage in BatchPipeline.STAGES:
+            for _ in range(self.concurrency[stage]):
+                worker = threading.Thread(
+                    target=self._worker_loop,
+                    args=(stage, handlers[stage]),
+                    daemon=True
+                )
+                worker.start()
+                self.workers.append(worker)
+        return self
+
+    def submit(self, video_path):
+        """Queue a video for processing. May be called while the batch runs."""
+        with self._lock:
+            job = {
+                "index": self.total,
+                "path": video_path,
+                "name": os.path.basename(video_path),
+                "submitted_at": time.monotonic()
+            }
+            self.total += 1
+        if self.job_store is not None:
+            self.job_store.add_job(self.batch_id, video_path)
+        self.queues["upload"].put(job)
+
+    def close(self):
+        """Signal that no more videos will be submitted."""
+        with self._lock:
+            self._closed = True
+            self._done.notify_all()
+
+    def wait(self):
+        """
+        Block until every submitted video has finished and close() was called,
+        then stop the workers. Returns (successful, failed, total).
+        """
+        with self._lock:
+            while not (self._closed and self.completed >= self.total):
+                self._done.wait()
+        for stage in BatchPipeline.STAGES:
+            for _ in range(self.concurrency[stage]):
+                self.queues[stage].put(None)
+        # Let workers finish their last timing and completion callbacks
+        for worker in self.workers:
+            worker.join()
+        if self.prompt_cache is not None:
+            self.client.prompt_cache = None
+            self.prompt_cache.close()
+        if self.exporter is not None:
+            self.exporter.close()
+        Metrics.event(
+            "batch",
+            total=self.total,
+            successful=self.successful,
+            failed=len(self.failed),
+            stages=self.summary()
+        )
+        return self.successful, list(self.failed), self.total
+
+    def summary(self):
+        """Return {stage: {"count", "median", "p95", "total"}} in seconds."""
+        with self._lock:
+            timings = dict(self.stage_times, video=list(self.video_times))
+        summary = {}
+        for stage, times in timings.items():
+            if not times:
+                continue
+            ordered = sorted(times)
+            summary[stage] = {
+                "count": len(ordered),
+                "median": ordered[len(ordered) // 2],
+                "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                "total": sum(ordered)
+            }
+        return summary
+
+    def run(self, video_paths):
+        """Convenience wrapper: process a fixed list of videos and wait."""
+        self.start()
+        for video_path in video_paths:
+            self.submit(video_path)
+        self.close()
+        return self.wait()
+
+    def _worker_loop(self, stage, handler):
+        stage_queue = self.queues[stage]
+        while True:
+            job = stage_queue.get()
+            if job is None:
+                break
+            started = time.monotonic()
+            deferred = False
+            try:
+                # Handlers return True when they finish the job (and time it) later
+                deferred = handler(job)
+            except FileNotFoundError:
+                self._finish(job, "Video file not found - may have been moved")
+            except PermissionError:
+                self._finish(job, "Permission denied - check file access")
+            except Exception as e:
+                error_msg = ErrorHandler.format_error(
+                    "Unexpected Batch Processing Error",
+                    f"An unexpected error occurred: {str(e)}",
+                    is_fatal=False
+                )
+                # Extract summary for batch display
+                error_summary = error_msg.split("\n")[0] if "\n" in error_msg else str(e)[:50]
+                self._finish(job, error_summary, str(e))
+            finally:
+                if not deferred:
+                    self._record_time(stage, time.monotonic() - started)
+
+    def _record_time(self, stage, seconds):
+        with self._lock:
+            self.stage_times[stage].append(seconds)
+
+    def _record(self, job, state, **fields):
+        if self.job_store is None:
+            return
+        try:
+            self.job_store.update(self.batch_id, job["path"], state, **fields)
+        except Exception as e:
+            print(f"[Batch] Could not record '{state}' for {job['name']}: {e}")
+
+    def _progress(self, job):
+        def update_prog(msg, val):
+            if self.progress_callback:
+                self.progress_callback(job["name"], msg, val)
+        return update_prog
+
+    def _upload_stage(self, job):
+        if self.on_started:
+            with self._lock:
+                completed = self.completed
+                total = self.total
+            self.on_started(job["name"], job["index"], total, completed)
+
+        # Rubrics with a cached result go straight to the report stage
+        job["cached"] = {}
+        if not self.force_refresh:
+            for rubric_key, rubric in self.rubrics.items():
+                cached = self.client.cached_result(job["path"], rubric, self.model_name)
+                if cached is not None:
+                    job["cached"][rubric_key] = cached
+            if len(job["cached"]) == len(self.rubrics):
+                self._record(job, "generated")
+                self._fan_out(job)
+                return
+
+        # Long recordings skip the whole-file upload; the generate stage
+        # uploads and analyzes their segments instead
+        job["duration"] = VideoSegmenter.probe_duration(job["path"])
+        job["segment_duration"] = self.client.long_video_duration(job["path"], job["duration"])
+        if job["segment_duration"]:
+            self._fan_out(job)
+            return
+
+        video_file, content_hash, error = self.client.upload_video(job["path"], self._progress(job))
+        if error:
+            self._finish_with_result(job, error)
+            return
+        job["uploaded_at"] = time.monotonic()
+        self._record(job, "uploaded", remote_name=video_file.name)
+        future = self.client.wait_for_processing_async(video_file, content_hash, self._progress(job), job["duration"])
+        future.add_done_callback(lambda f, job=job: self._on_processed(job, f))
+
+    def _on_processed(self, job, future):
+        # Runs on the poller thread, so only hand the job on
+        self._record_time("processing", time.monotonic() - job["uploaded_at"])
+        try:
+            video_file, error = future.result()
+        except Exception as e:
+            self._finish(job, f"Video Processing Error: {str(e)[:50]}")
+            return
+        if error:
+            self._finish_with_result(job, error)
+            return
+        job["video_file"] = video_file
+        self._fan_out(job)
+
+    def _fan_out(self, job):
+        # Per-rubric tasks share this dict to know when the video is done
+        job["outcome"] = {"pending": len(self.rubrics), "errors": [], "details": []}
+        cached = job.get("cached", {})
+        for rubric_key in self.rubrics:
+            if rubric_key in cached:
+                self.queues["report"].put(dict(job, rubric_key=rubric_key, result=cached[rubric_key]))
+            else:
+                self.queues["generate"].put(dict(job, rubric_key=rubric_key))
+
+    def _generate_stage(self, task):
+        started = time.monotonic()
+        rubric = self.rubrics[task["rubric_key"]]
+        auto_detect = rubric.get("auto_detect", False)
+        progress = self._progress(task)
+        if len(self.rubrics) > 1:
+            progress = lambda msg, val, p=progress, key=task["rubric_key"]: p(f"[{key}] {msg}", val)
+        if task.get("segment_duration"):
+            if auto_detect:
+                # Pattern detection needs the whole video
+                result = self.client.analyze_video(
+                    task["path"], rubric, progress, self.model_name,
+                    auto_detect_pattern=True, api_key=self.api_key, segmented=False
+                )
+            else:
+                result = self.client.analyze_video_segmented(
+                    task["path"], rubric, progress, self.model_name,
+                    api_key=self.api_key, duration=task["segment_duration"]
+                )
+        else:
+            result = self.client.generate_assessment(
+                task["video_file"],
+                rubric,
+                progress,
+                self.model_name,
+                auto_detect_pattern=auto_detect,
+                api_key=self.api_key
+            )
+        if "error" in result:
+            self._finish_with_result(task, result)
+            return
+        self.client.store_result(task["path"], rubric, self.model_name, result)
+        self._record(task, "generated")
+        task["result"] = result
+        task["analysis_seconds"] = time.monotonic() - started
+        self.queues["report"].put(task)
+
+    def _report_stage(self, task):
+        rubric_key = task["rubric_key"] if len(self.rubrics) > 1 else None
+        started = time.monotonic()
+        pdf_path = self.report_callback(task["path"], task["result"], rubric_key)
+        if isinstance(pdf_path, Future):
+            # Rendering continues in the report pool; this worker moves on
+            pdf_path.add_done_callback(lambda f, task=task: self._on_report_written(task, f, started))
+            return True
+        self._report_written(task, pdf_path)
+        return False
+
+    def _on_report_written(self, task, future, started):
+        self._record_time("report", time.monotonic() - started)
+        try:
+            pdf_path = future.result()
+        except Exception:
+            pdf_path = None
+        self._report_written(task, pdf_path)
+
+    def _report_written(self, task, pdf_path):
+        if pdf_path:
+            self._export(task)
+            self._finish(task, None)
+        else:
+            self._finish(task, "PDF generation failed - check file permissions")
+
+    def _export(self, task):
+        if self.exporter is None:
+            return
+        rubric = self.rubrics[task["rubric_key"]]
+        try:
+            result_key = self.client.result_cache_key(task["path"], rubric, self.model_name)
+        except OSError:
+            result_key = None
+        self.exporter.export(
+            task["path"], task["rubric_key"], rubric, self.model_name, task["result"],
+            result_key=result_key,
+            video_duration=task.get("duration"),
+            analysis_seconds=task.get("analysis_seconds"),
+            video_elapsed=time.monotonic() - task["submitted_at"]
+        )
+
+    def _finish_with_result(self, job, result):
+        error_msg = result.get("error", "Analysis failed")
+        # Extract just the error type for summary
+        if "FATAL ERROR" in error_msg:
+            error_summary = error_msg.split("\n\n")[0]  # Get first line
+        else:
+            error_summary = error_msg.split("\n")[0] if "\n" in error_msg else error_msg[:50]
+        self._finish(job, error_summary, error_msg)
+
+    def _finish(self, job, error_summary, error_detail=None):
+        with self._lock:
+            outcome = job.get("outcome")
+            if outcome is not None:
+                # One rubric of a fanned-out video finished
+                outcome["pending"] -= 1
+                if error_summary is not None:
+                    if len(self.rubrics) > 1:
+                        error_summary = f"{job['rubric_key']}: {error_summary}"
+                    outcome["errors"].append(error_summary)
+                    outcome["details"].append(error_detail or error_summary)
+                if outcome["pending"] > 0:
+                    return
+                error_summary = "; ".join(outcome["errors"]) or None
+                error_detail = "\n".join(outcome["details"]) or None
+            self.completed += 1
+            self.video_times.append(time.monotonic() - job["submitted_at"])
+            if error_summary is None:
+                self.successful += 1
+            else:
+                self.failed.append((job["name"], error_summary))
+            counts = (self.completed, self.total, self.successful, len(self.failed))
+        if error_summary is None:
+            self._record(job, "reported")
+        else:
+            self._record(job, "failed", error=error_summary,
+                         error_class=ErrorHandler.classify(error_detail or error_summary))
+        with self._lock:
+            self._done.notify_all()
+        if self.on_completed:
+            self.on_completed(job["name"], *counts, error_summary)
+
+class AssessmentModel:
+    """
+    One assessment held in memory: a score and feedback per rubric item plus
+    the summative comment. Reports render from it directly, and the GUI form
+    binds to it only while the user is viewing a result, so batch work never
+    touches a widget.
+    
+    Binary items hold "Yes"/"No" and likert items an int from 1 to 5,
+    whatever form the AI used (true/"yes"/1, "4"/4.0, out-of-range values).
+    """
+    BINARY_DEFAULT = "No"
+    LIKERT_DEFAULT = 3
+
+    def __init__(self, rubric_data):
+        self.rubric = rubric_data
+        self.items = rubric_data['items']
+        self._by_name = {item['name']: item for item in self.items}
+        # Lenient lookup for names the AI re-cased or re-spaced
+        self._by_folded = {" ".join(name.split()).casefold(): name for name in self._by_name}
+        self.scores = {
+            item['name']: AssessmentModel.BINARY_DEFAULT if item['type'] == 'binary' else AssessmentModel.LIKERT_DEFAULT
+            for item in self.items
+        }
+        self.feedback = {item['name']: "" for item in self.items}
+        self.summative = ""
+        self.missing_criteria = []
+        self.scored = set()  # Items the AI (or the reviewer) scored; the rest show defaults
+        self.detected_pattern = None
+        self.unmatched = []  # AI entries for criteria outside this rubric (see to_result)
+
+    @staticmethod
+    def from_result(rubric_data, ai_data):
+        """Build a model from an AI result (see apply_result)."""
+        model = AssessmentModel(rubric_data)
+        model.apply_result(ai_data)
+        return model
+
+    @staticmethod
+    def normalize_score(score, item_type):
+        """Return the display score ("Yes"/"No" or 1-5), or None if unusable."""
+        value = ResponseParser._normalize_score(score, item_type)
+        if value is None:
+            return None
+        if item_type == 'binary':
+            return "Yes" if value >= 1 else "No"
+        return value
+
+    def resolve_name(self, name):
+        """Map a criterion name from the AI onto the rubric's, or None."""
+        if not isinstance(name, str):
+            return None
+        if name in self._by_name:
+            return name
+        return self._by_folded.get(" ".join(name.split()).casefold())
+
+    def apply(self, ai_item):
+        """
+        Apply one criterion from the AI (e.g. as it streams in).
+        Returns the rubric item name it updated, or None if it was ignored.
+        """
+        name = self.resolve_name(ai_item.get('name'))
+        if name is None:
+            return None
+        score = AssessmentModel.normalize_score(ai_item.get('score'), self._by_name[name]['type'])
+        if score is None and 'advice' not in ai_item:
+            return None
+        if score is not None:
+            self.scores[name] = score
+            self.scored.add(name)
+        # Unscored entries keep the default score but show their note
+        # (e.g. the "Not assessed" placeholder for missing criteria)
+        self.feedback[name] = ai_item.get('advice', '') or ''
+        return name
+
+    def apply_result(self, ai_data):
+        """Apply a whole AI result; error results leave the model unchanged."""
+        if "error" in ai_data:
+            return
+        for ai_item in ai_data.get('assessments', []):
+            if isinstance(ai_item, dict):
+                if self.apply(ai_item) is None and self.resolve_name(ai_item.get('name')) is None:
+                    self.unmatched.append(ai_item)
+        self.summative = ai_data.get('summative_comment', '') or ''
+        self.missing_criteria = list(ai_data.get('missing_criteria', []))
+        self.detected_pattern = ai_data.get('detected_pattern')
+
+    def to_result(self):
+        """
+        Return the model (e.g. after the user's review) as an AI result.
+        
+        Only scored criteria get a score; the rest keep their note and are
+        listed as missing. The detected pattern and AI entries for criteria
+        outside this rubric are kept, so an auto-detect result shown on the
+        generic form still maps onto the detected technique's rubric.
+        """
+        assessments = []
+        missing = []
+        for item in self.items:
+            name = item['name']
+            entry = {"name": name, "advice": self.feedback[name]}
+            if name in self.scored:
+                entry["score"] = self.scores[name]
+            else:
+                missing.append(name)
+            assessments.append(entry)
+        result = {
+            "assessments": assessments + [dict(entry) for entry in self.unmatched],
+            "summative_comment": self.summative,
+            "missing_criteria": missing
+        }
+        if self.detected_pattern:
+            result["detected_pattern"] = self.detected_pattern
+        return result
+
+    def set_score(self, name, score):
+        value = AssessmentModel.normalize_score(score, self._by_name[name]['type'])
+        if value is not None:
+            if value != self.scores[name]:
+                # A changed score counts as assessed by the reviewer
+                self.scored.add(name)
+            self.scores[name] = value
+
+    def set_feedback(self, name, text):
+        self.feedback[name] = text
+
+    def rows(self):
+        """Return (rows, summative_comment) in the report's row format."""
+        results = [
+            {"Criterion": item['name'], "Score": self.scores[item['name']], "Feedback": self.feedback[item['name']]}
+            for item in self.items
+        ]
+        return results, self.summative
+
+class ReportRenderer:
+    """
+    Writes assessment PDFs without touching any widgets, for both the
+    desktop app and the command-line runner.
+    
+    Reports are laid out by ReportLab in a pool of worker processes, so
+    neither the Tk main loop nor the batch workers wait on layout: submit()
+    returns a Future for the PDF path. Each worker builds the paragraph
+    and table styles once and reuses them for every report it renders.
+    
+    Spawned workers re-run the entry script as __mp_main__, so entry
+    points must keep GUI imports under their __main__ guard (the desktop
+    app starts from medvat.py for this reason).
+    """
+    WORKERS = 2
+    USE_PROCESSES = True  # Fall back to a thread if processes can't be started
+    TABLE_COLUMNS = [150, 50, 300]
+
+    _lock = threading.Lock()
+    _pool = None
+    _reserved = set()  # Paths chosen for reports that are still rendering
+    _styles = None  # (stylesheet, table style), built once per process
+
+    @staticmethod
+    def rows_for_rubric(rubric_items, ai_data):
+        """
+        Map an AI result onto rubric rows without touching any widgets,
+        using the same defaults as a freshly built form.
+        Returns (rows, summative_comment).
+        """
+        return AssessmentModel.from_result({"items": rubric_items}, ai_data).rows()
+
+    @staticmethod
+    def rubric_suffix(rubric_key):
+        """File-name form of a rubric key, e.g. Chest_Tube_Insertion_VOP."""
+        return re.sub(r'[^A-Za-z0-9]+', '_', rubric_key).strip('_')
+
+    @staticmethod
+    def pdf_path_for(video_path, rubric_key=None, output_dir=None, taken=()):
+        """
+        Pick the report path for a video: <video>.pdf next to the video (or
+        in output_dir), with a rubric suffix when rubric_key is given and an
+        incrementing number if the file already exists (or is in taken).
+        """
+        video_dir = output_dir or os.path.dirname(video_path)
+        video_name_without_ext = os.path.splitext(os.path.basename(video_path))[0]
+        
+        # Generate PDF filename with auto-incrementing number if needed
+        base_pdf_name = video_name_without_ext
+        if rubric_key is not None:
+            base_pdf_name += "_" + ReportRenderer.rubric_suffix(rubric_key)
+        pdf_filename = os.path.join(video_dir, f"{base_pdf_name}.pdf")
+        
+        def in_use(path):
+            return os.path.exists(path) or path in taken
+        
+        # Check if file exists and find next available number
+        if in_use(pdf_filename):
+            match = re.search(r'_(\d+)$', base_pdf_name)
+            if match:
+                existing_number = int(match.group(1))
+                base_name = base_pdf_name[:match.start()]
+                counter = existing_number + 1
+            else:
+                base_name = base_pdf_name
+                counter = 1
+            
+            while in_use(pdf_filename):
+                pdf_filename = os.path.join(video_dir, f"{base_name}_{counter}.pdf")
+                counter += 1
+        return pdf_filename
+
+    @staticmethod
+    def _style_sheet():
+        if ReportRenderer._styles is None:
+            from reportlab.lib import colors
+            from reportlab.lib.styles import getSampleStyleSheet
+            from reportlab.platypus import TableStyle
+            table_style = TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+                ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
+                ('GRID', (0, 0), (-1, -1), 1, colors.black),
+                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ])
+            ReportRenderer._styles = (getSampleStyleSheet(), table_style)
+        return ReportRenderer._styles
+
+    @staticmethod
+    def render(pdf_filename, title, video_basename, items, summary, date_text):
+        """
+        Lay out and write one report. Runs in a worker process, so it only
+        takes plain data. Returns the size of the written file.
+        """
+        from reportlab.lib.pagesizes import LETTER
+        from reportlab.platypus import SimpleDocTemplate, Table, Paragraph, Spacer
+
+        styles, table_style = ReportRenderer._style_sheet()
+        doc = SimpleDocTemplate(pdf_filename, pagesize=LETTER)
+        elements = []
+        
+        # Title
+        elements.append(Paragraph(f"<b>{title}</b>", styles['Title']))
+        elements.append(Paragraph(f"Date: {date_text}", styles['Normal']))
+        elements.append(Paragraph(f"File: {video_basename}", styles['Normal']))
+        elements.append(Spacer(1, 20))
+        
+        # Table
+        data = [["Criterion", "Score", "AI Assessment & Advice"]]
+        for item in items:
+            data.append([
+                Paragraph(item['Criterion'], styles['Normal']),
+                str(item['Score']),
+                Paragraph(item['Feedback'], styles['Normal'])
+            ])
+        
+        t = Table(data, colWidths=ReportRenderer.TABLE_COLUMNS)
+        t.setStyle(table_style)
+        elements.append(t)
+        elements.append(Spacer(1, 20))
+        
+        # Summative
+        elements.append(Paragraph("<b>Holistic Summative Comment:</b>", styles['Heading2']))
+        elements.append(Paragraph(summary, styles['Normal']))
+        
+        doc.build(elements)
+        return os.path.getsize(pdf_filename)
+
+    @staticmethod
+    def _executor():
+        with ReportRenderer._lock:
+            if ReportRenderer._pool is None:
+                if ReportRenderer.USE_PROCESSES:
+                    import multiprocessing
+                    # Spawn rather than fork: the parent has Tk and network threads
+                    ReportRenderer._pool = ProcessPoolExecutor(
+                        max_workers=ReportRenderer.WORKERS,
+                        mp_context=multiprocessing.get_context("spawn")
+                    )
+                else:
+                    ReportRenderer._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="report")
+            return ReportRenderer._pool
+
+    @staticmethod
+    def _use_thread_fallback(error):
+        print(f"[Report] Process pool unavailable ({error}), rendering on a thread")
+        with ReportRenderer._lock:
+            ReportRenderer.USE_PROCESSES = False
+            ReportRenderer._pool = None
+
+    @staticmethod
+    def submit(video_path, rubric, items, summary, rubric_key=None, output_dir=None):
+        """
+        Queue the report for one video.
+        
+        Args:
+            video_path: Assessed video (names the report)
+            rubric: Rubric dict (for the title)
+            items, summary: Rows and summative comment in get_data() format
+            rubric_key: Adds a rubric suffix to the file name, e.g.
+                video_Chest_Tube_Insertion_VOP.pdf (multi-rubric jobs)
+            output_dir: Directory for the report (default: the video's)
+        
+        Returns a Future for the PDF path; it raises if the report could
+        not be written.
+        """
+        started = time.monotonic()
+        video_basename = os.path.basename(video_path)
+        with ReportRenderer._lock:
+            # Reports still rendering don't exist on disk yet, so reserve their names
+            pdf_filename = ReportRenderer.pdf_path_for(
+                video_path, rubric_key, output_dir, taken=ReportRenderer._reserved
+            )
+            ReportRenderer._reserved.add(pdf_filename)
+        job = (
+            pdf_filename, rubric['title'], video_basename,
+            [dict(item) for item in items], summary,
+            datetime.now().strftime('%Y-%m-%d %H:%M')
+        )
+        try:
+            render_future = ReportRenderer._executor().submit(ReportRenderer.render, *job)
+        except Exception as e:
+            ReportRenderer._use_thread_fallback(e)
+            render_future = ReportRenderer._executor().submit(ReportRenderer.render, *job)
+
+        result = Future()
+
+        def on_rendered(future):
+            with ReportRenderer._lock:
+                ReportRenderer._reserved.discard(pdf_filename)
+            try:
+                size = future.result()
+            except Exception as e:
+                print(f"Error generating PDF for {video_path}: {e}")
+                Metrics.record("report", time.monotonic() - started, "error", video=video_basename)
+                result.set_exception(e)
+                return
+            Metrics.record("report", time.monotonic() - started, "ok", size, video=video_basename)
+            result.set_result(pdf_filename)
+
+        render_future.add_done_callback(on_rendered)
+        return result
+
+    @staticmethod
+    def write_pdf(video_path, rubric, items, summary, rubric_key=None, output_dir=None):
+        """
+        Write the report for one video and wait for it (see submit()).
+        Returns the PDF path, or None if it could not be written.
+        """
+        try:
+            return ReportRenderer.submit(video_path, rubric, items, summary, rubric_key, output_dir).result()
+        except Exception:
+            return None
+
+class ResultExporter:
+    """
+    Appends every completed assessment to a cohort dataset with one row per
+    video x criterion, so gradebooks can be built without re-reading PDFs.
+    
+    Rows go to two places in export_dir:
+    
+    - assessments.jsonl: one JSON object per row, written as each
+      assessment completes
+    - assessments_parquet/: a Parquet dataset (needs pyarrow), written as a
+      new part file every FLUSH_ROWS rows and when the exporter is closed;
+      small parts are merged once there are more than MAX_PARTS. Without
+      pyarrow, rows are appended to assessments.csv instead.
+    
+    Each assessment is exported once: rows carry a result_key (video
+    content, rubric, model and prompt), and an assessment whose key is
+    already in the dataset, e.g. a re-run served from the result cache, is
+    skipped.
+    
+    Load the whole cohort with ResultExporter.load().
+    """
+    EXPORT_DIR = "medvat_exports"
+    JSONL_FILE = "assessments.jsonl"
+    PARQUET_DIR = "assessments_parquet"
+    CSV_FILE = "assessments.csv"
+    FLUSH_ROWS = 5000
+    MAX_PARTS = 32
+    COLUMNS = (
+        "exported_at", "video", "video_path", "rubric_key", "rubric_title", "model",
+        "criterion", "criterion_type", "score", "score_label", "assessed", "advice",
+        "timestamps_s", "video_duration_s", "analysis_s", "video_elapsed_s", "result_key"
+    )
+    RESULT_KEY_RE = re.compile(r'"result_key": "([0-9a-f]+)"')
+
+    def __init__(self, export_dir=None, columnar_format="auto"):
+        """
+        Args:
+            export_dir: Folder for the dataset (default: EXPORT_DIR)
+            columnar_format: "parquet", "csv", or "auto" (Parquet when
+                pyarrow is installed; checked on the first export so
+                startup doesn't import it)
+        """
+        self.export_dir = export_dir or ResultExporter.EXPORT_DIR
+        self.columnar_format = columnar_format
+        self.jsonl_path = os.path.join(self.export_dir, ResultExporter.JSONL_FILE)
+        self.parquet_dir = os.path.join(self.export_dir, ResultExporter.PARQUET_DIR)
+        self.csv_path = os.path.join(self.export_dir, ResultExporter.CSV_FILE)
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._exported = None  # result_keys already in the dataset, read on first export
+        self.rows_written = 0
+
+    @staticmethod
+    def from_config(config, export_dir=None):
+        """Build an exporter from the "export" config section, or None if disabled."""
+        settings = config.get("export", {})
+        if not settings.get("enabled", True):
+            return None
+        return ResultExporter(export_dir or settings.get("dir"), settings.get("format", "auto"))
+
+    @staticmethod
+    def has_pyarrow():
+        try:
+            import pyarrow  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    @staticmethod
+    def timestamps(text):
+        """
+        Return the [MM:SS] / [H:MM:SS] times (in seconds) mentioned in text,
+        in order of mention; bare times like "12:30" are not references.
+        """
+        return [SegmentMerger.parse_timestamp(match) for match in SegmentMerger.TIMESTAMP_RE.finditer(text or "")]
+
+    @staticmethod
+    def rows_for(video_path, rubric_key, rubric, model_name, result,
+                 video_duration=None, analysis_seconds=None, video_elapsed=None, result_key=None):
+        """
+        Flatten one assessment into rows, one per rubric item. Scores are
+        numeric (binary: 1/0, likert: 1-5); criteria the result holds no
+        usable score for have none. Auto-detect results are flattened
+        against the rubric of the detected suturing technique.
+        """
+        detected = result.get("detected_pattern")
+        if rubric.get("auto_detect", False) and detected:
+            for key, candidate in RubricManager.get_rubrics().items():
+                if (candidate.get("category") == "Suturing" and candidate.get("subcategory") == detected
+                        and not candidate.get("auto_detect", False)):
+                    rubric_key, rubric = key, candidate
+        model = AssessmentModel.from_result(rubric, result)
+        exported_at = datetime.now().isoformat(timespec="seconds")
+        video_duration, analysis_seconds, video_elapsed = (
+            None if value is None else round(value, 2)
+            for value in (video_duration, analysis_seconds, video_elapsed)
+        )
+        rows = []
+        for item in model.items:
+            name = item['name']
+            assessed = name in model.scored
+            label = model.scores[name]
+            if item['type'] == 'binary':
+                score = 1 if label == "Yes" else 0
+            else:
+                score = label
+            rows.append({
+                "exported_at": exported_at,
+                "video": os.path.basename(video_path),
+                "video_path": os.path.abspath(video_path),
+                "rubric_key": rubric_key,
+                "rubric_title": rubric.get("title", rubric_key),
+                "model": model_name,
+                "criterion": name,
+                "criterion_type": item['type'],
+                "score": score if assessed else None,
+                "score_label": str(label) if assessed else None,
+                "assessed": assessed,
+                "advice": model.feedback[name],
+                "timestamps_s": ResultExporter.timestamps(model.feedback[name]),
+                "video_duration_s": video_duration,
+                "analysis_s": analysis_seconds,
+                "video_elapsed_s": video_elapsed,
+                "result_key": result_key
+            })
+        return rows
+
+    def append(self, rows):
+        """Write rows to the JSONL stream and the columnar dataset."""
+        if not rows:
+            return
+        with self._lock:
+            if self.columnar_format == "auto":
+                self.columnar_format = "parquet" if ResultExporter.has_pyarrow() else "csv"
+            os.makedirs(self.export_dir, exist_ok=True)
+            with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows))
+            if self.columnar_format == "parquet":
+                self._buffer.extend(rows)
+                if len(self._buffer) >= ResultExporter.FLUSH_ROWS:
+                    self._flush_parquet()
+            else:
+                self._append_csv(rows)
+            self.rows_written += len(rows)
+
+    def export(self, video_path, rubric_key, rubric, model_name, result, result_key=None, **durations):
+        """
+        Export one completed assessment (see rows_for for the durations).
+        result_key (GeminiClient.result_cache_key) identifies it; returns
+        False if an assessment with that key was already exported.
+        """
+        with self._lock:
+            if result_key is not None:
+                if self._exported is None:
+                    self._exported = self._exported_keys()
+                if result_key in self._exported:
+                    return False
+                self._exported.add(result_key)
+        try:
+            self.append(ResultExporter.rows_for(
+                video_path, rubric_key, rubric, model_name, result, result_key=result_key, **durations
+            ))
+            return True
+        except Exception as e:
+            print(f"[Export] Could not export {os.path.basename(video_path)}: {e}")
+            if result_key is not None:
+                with self._lock:
+                    self._exported.discard(result_key)
+            return False
+
+    def _exported_keys(self):
+        """Return the result_keys in the JSONL stream (which has every exported row)."""
+        keys = set()
+        try:
+            with open(self.jsonl_path, encoding="utf-8") as f:
+                for line in f:
+                    match = ResultExporter.RESULT_KEY_RE.search(line)
+                    if match:
+                        keys.add(match.group(1))
+        except FileNotFoundError:
+            pass
+        return keys
+
+    def flush(self):
+        """Write buffered rows to the Parquet dataset."""
+        with self._lock:
+            if self._buffer:
+                self._flush_parquet()
+
+    def close(self):
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"[Export] Could not write Parquet part: {e}")
+
+    def _append_csv(self, rows):
+        import csv
+        new_file = not os.path.exists(self.csv_path)
+        with open(self.csv_path, "a", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=ResultExporter.COLUMNS)
+            if new_file:
+                writer.writeheader()
+            for row in rows:
+                writer.writerow(dict(row, timestamps_s=";".join(str(t) for t in row["timestamps_s"])))
+
+    @staticmethod
+    def _schema():
+        import pyarrow as pa
+        return pa.schema([
+            ("exported_at", pa.string()), ("video", pa.string()), ("video_path", pa.string()),
+            ("rubric_key", pa.string()), ("rubric_title", pa.string()), ("model", pa.string()),
+            ("criterion", pa.string()), ("criterion_type", pa.string()), ("score", pa.int8()),
+            ("score_label", pa.string()), ("assessed", pa.bool_()), ("advice", pa.string()),
+            ("timestamps_s", pa.list_(pa.int32())), ("video_duration_s", pa.float32()),
+            ("analysis_s", pa.float32()), ("video_elapsed_s", pa.float32()), ("result_key", pa.string())
+        ])
+
+    @staticmethod
+    def _part_name(suffix=""):
+        # Unique across exporters and processes writing the same dataset
+        return f"part-{datetime.now().strftime('%Y%m%d%H%M%S')}-{os.getpid()}-{os.urandom(4).hex()}{suffix}.parquet"
+
+    def _flush_parquet(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        os.makedirs(self.parquet_dir, exist_ok=True)
+        table = pa.Table.from_pylist(self._buffer, schema=ResultExporter._schema())
+        name = ResultExporter._part_name()
+        # Write under a temporary name so readers never see a partial file
+        tmp_path = os.path.join(self.parquet_dir, "." + name + ".tmp")
+        pq.write_table(table, tmp_path, compression="zstd")
+        os.replace(tmp_path, os.path.join(self.parquet_dir, name))
+        print(f"[Export] Wrote {len(self._buffer)} rows to {name}")
+        self._buffer = []
+        parts = [p for p in os.listdir(self.parquet_dir) if p.endswith(".parquet")]
+        if len(parts) > ResultExporter.MAX_PARTS:
+            self._compact(parts)
+
+    def _compact(self, parts):
+        """Merge part files into one so loading stays a single read."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        paths = sorted(os.path.join(self.parquet_dir, p) for p in parts)
+        table = pa.concat_tables([pq.read_table(path, schema=ResultExporter._schema()) for path in paths])
+        name = ResultExporter._part_name("-merged")
+        tmp_path = os.path.join(self.parquet_dir, "." + name + ".tmp")
+        pq.write_table(table, tmp_path, compression="zstd")
+        os.replace(tmp_path, os.path.join(self.parquet_dir, name))
+        for path in paths:
+            os.remove(path)
+        print(f"[Export] Merged {len(paths)} parts ({table.num_rows} rows)")
+
+    @staticmethod
+    def load(export_dir=None, columns=None):
+        """
+        Load the cohort dataset as a pandas DataFrame: the Parquet dataset if
+        there is one, otherwise the CSV. Needs pandas (and pyarrow for
+        Parquet), from requirements-export.txt.
+        """
+        try:
+            import pandas as pd
+        except ImportError as e:
+            raise ImportError("Loading the export needs pandas: pip install -r requirements-export.txt") from e
+        export_dir = export_dir or ResultExporter.EXPORT_DIR
+        parquet_dir = os.path.join(export_dir, ResultExporter.PARQUET_DIR)
+        if os.path.isdir(parquet_dir) and any(p.endswith(".parquet") for p in os.listdir(parquet_dir)):
+            return pd.read_parquet(parquet_dir, columns=columns)
+        csv_path = os.path.join(export_dir, ResultExporter.CSV_FILE)
+        return pd.read_csv(csv_path, usecols=columns)
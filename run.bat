@@ -1,5 +1,5 @@
 @echo off
 call venv\Scripts\activate.bat
-python medvat_app.py
+python medvat.py
 
 
@@ -1,5 +1,5 @@
 #!/bin/bash
 source venv/Scripts/activate
-python medvat_app.py
+python medvat.py
 
 
@@ -0,0 +1,43 @@
+"""
+The headless runner must close the job store even when the arguments turn
+out to be invalid.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import medvat_cli
+from medvat_core import BatchJobStore
+
+
+class UsageErrorTest(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix="medvat_test_cli_")
+        self.previous_db = BatchJobStore.DB_FILE
+        BatchJobStore.DB_FILE = os.path.join(self.work_dir, "jobs.sqlite3")
+
+    def tearDown(self):
+        BatchJobStore.DB_FILE = self.previous_db
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def test_job_store_is_closed_on_usage_error(self):
+        closed = []
+        original_close = BatchJobStore.close
+
+        def close(store):
+            closed.append(store.path)
+            original_close(store)
+
+        with mock.patch.object(BatchJobStore, "close", close):
+            exit_code = medvat_cli.main([os.path.join(self.work_dir, "missing.mp4")])  # no --rubric
+        self.assertEqual(exit_code, medvat_cli.EXIT_USAGE)
+        self.assertEqual(closed, [BatchJobStore.DB_FILE])
+
+
+if __name__ == "__main__":
+    unittest.main()
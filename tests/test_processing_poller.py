@@ -0,0 +1,62 @@
+"""
+Processing timeouts: long recordings that compress to small files must get
+a timeout based on their duration, not only their size.
+"""
+import os
+import sys
+import unittest
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from medvat_core import GeminiBackend, GeminiClient, Metrics, ProcessingPoller
+
+
+class OfflineBackend(GeminiBackend):
+    def configure(self, api_key):
+        pass
+
+
+class RecordingPoller:
+    """Stands in for the shared poller and records what it was asked to watch."""
+    def __init__(self):
+        self.calls = []
+
+    def watch(self, video_file, size_bytes=0, duration_seconds=None):
+        self.calls.append((video_file.name, size_bytes, duration_seconds))
+        future = Future()
+        future.set_result(SimpleNamespace(name=video_file.name, state=SimpleNamespace(name="ACTIVE")))
+        return future
+
+
+class ProcessingTimeoutTest(unittest.TestCase):
+    def setUp(self):
+        self.previous = (ProcessingPoller._shared, GeminiBackend._current, Metrics.enabled)
+        self.poller = RecordingPoller()
+        ProcessingPoller._shared = self.poller
+        # Don't write the metrics log from tests
+        Metrics.enabled = False
+
+    def tearDown(self):
+        ProcessingPoller._shared, GeminiBackend._current, Metrics.enabled = self.previous
+
+    def test_long_small_video_gets_duration_based_timeout(self):
+        size_bytes = 20 * 1024 * 1024  # 20 MB
+        size_only = ProcessingPoller.timeout_for(size_bytes)
+        with_duration = ProcessingPoller.timeout_for(size_bytes, duration_seconds=90 * 60)
+        self.assertAlmostEqual(with_duration - size_only, 90 * ProcessingPoller.TIMEOUT_PER_VIDEO_MINUTE)
+
+    def test_wait_for_processing_passes_duration_to_poller(self):
+        client = GeminiClient("test-key", backend=OfflineBackend())
+        video_file = SimpleNamespace(
+            name="files/long-small", state=SimpleNamespace(name="PROCESSING"), size_bytes=20 * 1024 * 1024
+        )
+        video_file_out, error = client.wait_for_processing(video_file, "hash", lambda msg, val: None, 90 * 60)
+        self.assertIsNone(error)
+        self.assertEqual(video_file_out.name, "files/long-small")
+        self.assertEqual(self.poller.calls, [("files/long-small", 20 * 1024 * 1024, 90 * 60)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""
+Streaming generations must hold their concurrency slot, and be timed,
+until the stream has been read to the end.
+"""
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from medvat_core import RateLimiter
+
+
+class SlowStream:
+    usage_metadata = "usage"
+
+    def __init__(self, chunks, delay):
+        self.chunks = chunks
+        self.delay = delay
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            time.sleep(self.delay)
+            yield chunk
+
+
+class StreamingSlotTest(unittest.TestCase):
+    def test_slot_is_held_until_stream_is_read(self):
+        limiter = RateLimiter()
+        stream = limiter.call_stream("generate", lambda: SlowStream(["a", "b", "c"], 0.02))
+        self.assertEqual(limiter._active, 1)
+        self.assertEqual(list(stream), ["a", "b", "c"])
+        self.assertEqual(limiter._active, 0)
+        self.assertEqual(stream.usage_metadata, "usage")
+        # The recorded latency covers reading the stream, not just opening it
+        average, samples = limiter._latency["generate"]
+        self.assertEqual(samples, 1)
+        self.assertGreaterEqual(average, 0.04)
+
+    def test_slot_is_released_when_stream_fails(self):
+        limiter = RateLimiter()
+
+        def failing():
+            yield "a"
+            raise RuntimeError("connection reset")
+
+        stream = limiter.call_stream("generate", failing)
+        with self.assertRaises(RuntimeError):
+            list(stream)
+        self.assertEqual(limiter._active, 0)
+
+    def test_rate_limit_before_first_chunk_is_retried(self):
+        limiter = RateLimiter()
+        RateLimiter.BASE_BACKOFF, previous = 0, RateLimiter.BASE_BACKOFF
+        attempts = []
+
+        def flaky():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise Exception("429 Resource has been exhausted")
+            return iter(["ok"])
+
+        try:
+            self.assertEqual(list(limiter.call_stream("generate", flaky)), ["ok"])
+        finally:
+            RateLimiter.BASE_BACKOFF = previous
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual(limiter._active, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
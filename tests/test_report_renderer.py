@@ -0,0 +1,29 @@
+"""
+Spawned report workers re-run the entry script as __mp_main__; the desktop
+launcher must not load the GUI when they do.
+"""
+import os
+import subprocess
+import sys
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What a spawned worker does with the parent's entry script
+WORKER_PREPARE = """
+import runpy, sys
+runpy.run_path({launcher!r}, run_name="__mp_main__")
+print(",".join(name for name in ("tkinter", "customtkinter", "medvat_app") if name in sys.modules))
+"""
+
+
+class WorkerEntryTest(unittest.TestCase):
+    def test_launcher_imports_nothing_in_workers(self):
+        code = WORKER_PREPARE.format(launcher=os.path.join(REPO_DIR, "medvat.py"))
+        proc = subprocess.run([sys.executable, "-c", code], cwd=REPO_DIR, capture_output=True, text=True, timeout=60)
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+        self.assertEqual(proc.stdout.strip(), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
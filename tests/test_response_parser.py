@@ -0,0 +1,107 @@
+"""
+Parsing and validating model responses, including responses cut off
+mid-document and merged results of segmented analysis.
+"""
+import json
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from medvat_core import (
+    AssessmentModel, GeminiBackend, GeminiClient, ResponseParser, ResultExporter, UploadRegistry, VideoSegmenter
+)
+
+RUBRIC = {
+    "title": "Test Rubric",
+    "items": [
+        {"name": "A", "type": "likert", "desc": ""},
+        {"name": "B", "type": "likert", "desc": ""},
+        {"name": "C", "type": "binary", "desc": ""},
+    ]
+}
+
+
+class TruncatedResponseTest(unittest.TestCase):
+    def test_entry_cut_off_before_its_score_is_missing(self):
+        text = '{"assessments": [{"name": "A", "score": 4, "advice": "[00:12] Good"}, {"name": "B", "sc'
+        data, repaired = ResponseParser.extract(text)
+        self.assertTrue(repaired)
+        self.assertEqual(data["assessments"][-1], {"name": "B"})
+
+        result = ResponseParser.validate(data, RUBRIC)
+        self.assertEqual(result["missing_criteria"], ["B", "C"])
+        entries = {entry["name"]: entry for entry in result["assessments"]}
+        self.assertEqual(entries["A"]["score"], 4)
+        self.assertNotIn("score", entries["B"])
+        self.assertTrue(entries["B"]["advice"].startswith("Not assessed"))
+
+    def test_unusable_score_is_missing(self):
+        data = {"assessments": [
+            {"name": "A", "score": "excellent", "advice": "Smooth passes"},
+            {"name": "B", "score": 3},
+            {"name": "C", "score": "yes"},
+        ]}
+        result = ResponseParser.validate(data, RUBRIC)
+        self.assertEqual(result["missing_criteria"], ["A"])
+        self.assertIn("Smooth passes", result["assessments"][0]["advice"])
+
+    def test_names_match_ignoring_case_and_spacing(self):
+        data = {"assessments": [
+            {"name": "a", "score": 2}, {"name": " B ", "score": 5}, {"name": "c", "score": 0},
+            {"name": "Not in rubric", "score": 5},
+        ]}
+        result = ResponseParser.validate(data, RUBRIC)
+        self.assertNotIn("missing_criteria", result)
+        self.assertEqual([entry["name"] for entry in result["assessments"]], ["A", "B", "C"])
+
+    def test_complete_response_round_trips(self):
+        payload = {"assessments": [{"name": n, "score": 1, "advice": ""} for n in ("A", "B", "C")],
+                   "summative_comment": "Done"}
+        data, repaired = ResponseParser.extract("```json\n" + json.dumps(payload) + "\n```")
+        self.assertFalse(repaired)
+        result = ResponseParser.validate(data, RUBRIC)
+        self.assertNotIn("missing_criteria", result)
+        model = AssessmentModel.from_result(RUBRIC, result)
+        self.assertEqual(model.scores, {"A": 1, "B": 1, "C": "Yes"})
+
+
+class OfflineBackend(GeminiBackend):
+    def configure(self, api_key):
+        pass
+
+
+class SegmentedResultTest(unittest.TestCase):
+    def setUp(self):
+        self.previous_backend = GeminiBackend._current
+
+    def tearDown(self):
+        GeminiBackend._current = self.previous_backend
+
+    def test_criteria_no_window_scored_are_missing(self):
+        # Every window scores A and C only
+        window = {"assessments": [{"name": "A", "score": 4, "observed": True, "advice": ""},
+                                  {"name": "C", "score": 1, "observed": True, "advice": ""}],
+                  "summative_comment": ""}
+        client = GeminiClient("test-key", backend=OfflineBackend())
+        segments = [("part0.mp4", 0.0, 600.0), ("part1.mp4", 540.0, 1140.0)]
+        with mock.patch.object(UploadRegistry, "content_hash", return_value="hash"), \
+                mock.patch.object(VideoSegmenter, "split", return_value=segments), \
+                mock.patch.object(client, "upload_video", return_value=(SimpleNamespace(name="f"), "h", None)), \
+                mock.patch.object(client, "wait_for_processing", return_value=(SimpleNamespace(name="f"), None)), \
+                mock.patch.object(client, "_run_prompt", side_effect=lambda *a, **k: json.loads(json.dumps(window))):
+            result = client.analyze_video_segmented("long.mp4", RUBRIC, lambda msg, val: None, duration=1140.0)
+
+        self.assertEqual(result["missing_criteria"], ["B"])
+        entries = {entry["name"]: entry for entry in result["assessments"]}
+        self.assertNotIn("score", entries["B"])
+        rows = {row["criterion"]: row for row in ResultExporter.rows_for("long.mp4", "test", RUBRIC, "model", result)}
+        self.assertEqual((rows["A"]["score"], rows["A"]["assessed"]), (4, True))
+        self.assertEqual((rows["B"]["score"], rows["B"]["assessed"]), (None, False))
+
+
+if __name__ == "__main__":
+    unittest.main()
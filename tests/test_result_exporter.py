@@ -0,0 +1,151 @@
+"""
+Cohort export: which criteria count as assessed, which rubric an
+auto-detect result is flattened against, and exporting each assessment
+only once.
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from medvat_core import AssessmentModel, ResultExporter, RubricManager
+
+
+RUBRIC = {
+    "title": "Test Rubric",
+    "items": [
+        {"name": "Knots", "type": "binary"},
+        {"name": "Spacing", "type": "likert"},
+        {"name": "Economy of motion", "type": "likert"},
+    ],
+}
+
+
+def rows_by_criterion(rows):
+    return {row["criterion"]: row for row in rows}
+
+
+class RowsForTest(unittest.TestCase):
+    def test_only_scored_criteria_are_assessed(self):
+        result = {
+            "assessments": [
+                {"name": "Knots", "score": "yes", "advice": "Square knots [01:05]."},
+                # Left at the default 3 by the parser, without a usable score
+                {"name": "Spacing", "score": None, "advice": "Spacing not visible."},
+            ],
+            "summative_comment": "Good.",
+        }
+        rows = rows_by_criterion(ResultExporter.rows_for("video.mp4", "test", RUBRIC, "model", result))
+        self.assertTrue(rows["Knots"]["assessed"])
+        self.assertEqual(rows["Knots"]["score"], 1)
+        for name in ("Spacing", "Economy of motion"):
+            self.assertFalse(rows[name]["assessed"])
+            self.assertIsNone(rows[name]["score"])
+            self.assertIsNone(rows[name]["score_label"])
+
+    def test_auto_detect_uses_the_detected_rubric(self):
+        rubrics = RubricManager.get_rubrics()
+        auto_key = next(key for key, rubric in rubrics.items() if rubric.get("auto_detect"))
+        detected = RubricManager.get_suturing_pattern_rubrics()["Vertical Mattress"]
+        result = {
+            "assessments": [{"name": item["name"], "score": 4 if item["type"] == "likert" else 1, "advice": ""}
+                            for item in detected["items"]],
+            "summative_comment": "",
+            "detected_pattern": "Vertical Mattress",
+        }
+        rows = ResultExporter.rows_for("video.mp4", auto_key, rubrics[auto_key], "model", result)
+        self.assertEqual([row["criterion"] for row in rows], [item["name"] for item in detected["items"]])
+        self.assertTrue(all(row["assessed"] for row in rows))
+        self.assertEqual({row["rubric_key"] for row in rows}, {"Suturing: Vertical Mattress"})
+        self.assertEqual({row["rubric_title"] for row in rows}, {detected["title"]})
+
+
+class TimestampTest(unittest.TestCase):
+    def test_only_bracketed_references_count(self):
+        text = "Knot at [01:05], again at [1:02:03]. Session started 12:30, ratio 3:15."
+        self.assertEqual(ResultExporter.timestamps(text), [65, 3723])
+
+
+class ExportOnceTest(unittest.TestCase):
+    RESULT = {
+        "assessments": [
+            {"name": "Knots", "score": 1, "advice": ""},
+            {"name": "Spacing", "score": 4, "advice": ""},
+            {"name": "Economy of motion", "score": 2, "advice": ""},
+        ],
+        "summative_comment": "",
+    }
+
+    def setUp(self):
+        self.export_dir = tempfile.mkdtemp(prefix="medvat_test_export_")
+
+    def tearDown(self):
+        shutil.rmtree(self.export_dir, ignore_errors=True)
+
+    def read_rows(self):
+        with open(os.path.join(self.export_dir, ResultExporter.JSONL_FILE), encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def test_same_result_key_is_exported_once(self):
+        exporter = ResultExporter(self.export_dir, "csv")
+        self.assertTrue(exporter.export("video.mp4", "test", RUBRIC, "model", self.RESULT, result_key="abc123"))
+        # e.g. the same video re-run and served from the result cache
+        self.assertFalse(exporter.export("video.mp4", "test", RUBRIC, "model", self.RESULT, result_key="abc123"))
+        self.assertTrue(exporter.export("other.mp4", "test", RUBRIC, "model", self.RESULT, result_key="def456"))
+        # A new exporter (e.g. after an app restart) knows what is in the dataset
+        restarted = ResultExporter(self.export_dir, "csv")
+        self.assertFalse(restarted.export("video.mp4", "test", RUBRIC, "model", self.RESULT, result_key="abc123"))
+        rows = self.read_rows()
+        self.assertEqual(len(rows), 6)
+        self.assertEqual([row["result_key"] for row in rows], ["abc123"] * 3 + ["def456"] * 3)
+
+    def test_reviewed_model_round_trip(self):
+        result = {
+            "assessments": [{"name": "Knots", "score": 0, "advice": "Loose."},
+                            {"name": "Spacing", "score": 2, "advice": ""}],
+            "summative_comment": "",
+            "missing_criteria": ["Economy of motion"],
+        }
+        model = AssessmentModel.from_result(RUBRIC, result)
+        model.set_score("Spacing", 4)  # The reviewer's correction
+        rows = rows_by_criterion(ResultExporter.rows_for("video.mp4", "test", RUBRIC, "model", model.to_result()))
+        self.assertEqual(rows["Knots"]["score"], 0)
+        self.assertEqual(rows["Knots"]["advice"], "Loose.")
+        self.assertEqual(rows["Spacing"]["score"], 4)
+        self.assertFalse(rows["Economy of motion"]["assessed"])
+
+
+    def test_auto_detect_gui_round_trip(self):
+        rubrics = RubricManager.get_rubrics()
+        auto_key = "Suturing: Auto-Detect"
+        detected = rubrics["Suturing: Vertical Mattress"]
+        # Validated against the detected rubric; the model skipped "Even spacing"
+        result = {
+            "assessments": [{"name": item["name"], "score": 4 if item["type"] == "likert" else 1, "advice": "ok"}
+                            for item in detected["items"] if item["name"] != "Even spacing"]
+                           + [{"name": "Even spacing", "advice": "Not assessed: ..."}],
+            "summative_comment": "Fine.",
+            "missing_criteria": ["Even spacing"],
+            "detected_pattern": "Vertical Mattress",
+        }
+        # The form is bound to the generic Auto-Detect rubric (AssessmentPanel.populate_from_ai)
+        model = AssessmentModel.from_result(rubrics[auto_key], result)
+        # get_data() reads every row back; the reviewer changes one score
+        for name, score in model.scores.items():
+            model.set_score(name, 2 if name == "Gentle tissue handling" else score)
+
+        rows = rows_by_criterion(ResultExporter.rows_for("video.mp4", auto_key, rubrics[auto_key], "model", model.to_result()))
+        self.assertEqual(list(rows), [item["name"] for item in detected["items"]])
+        self.assertEqual({row["rubric_key"] for row in rows.values()}, {"Suturing: Vertical Mattress"})
+        self.assertEqual(rows["Gentle tissue handling"]["score"], 2)
+        self.assertEqual((rows["Proper eversion"]["score"], rows["Proper eversion"]["assessed"]), (4, True))
+        self.assertEqual((rows["Even spacing"]["score"], rows["Even spacing"]["assessed"]), (None, False))
+        self.assertTrue(all(row["assessed"] for name, row in rows.items() if name != "Even spacing"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+"""
+Stream-copy cuts start at the keyframe before the requested start; timestamps
+must be rebased from that keyframe, not from the nominal window start. Merged
+scores only count windows that actually scored the criterion.
+"""
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from medvat_core import SegmentMerger, VideoSegmenter
+
+
+class KeyframeStartTest(unittest.TestCase):
+    def test_cut_starts_at_previous_keyframe(self):
+        # Keyframes every 4 s; a cut at 450 s really starts at 448 s
+        probe_output = "".join(f"{392 + 4 * i:.6f}\n" for i in range(16))
+        with mock.patch.object(VideoSegmenter, "_ffprobe", return_value=probe_output):
+            start = VideoSegmenter.keyframe_before("video.mp4", 450.0)
+        self.assertEqual(start, 448.0)
+        # [00:10] in the clip is 10 s after the keyframe
+        self.assertEqual(SegmentMerger.rebase("[00:10] Knot tied", start), "[07:38] Knot tied")
+
+    def test_container_start_time_is_subtracted(self):
+        with mock.patch.object(VideoSegmenter, "_ffprobe", return_value="1.400000\n449.400000\n"):
+            self.assertAlmostEqual(VideoSegmenter.keyframe_before("video.mp4", 450.0, start_time=1.4), 448.0)
+
+    def test_unprobeable_video_returns_none(self):
+        with mock.patch.object(VideoSegmenter, "_ffprobe", return_value=None):
+            self.assertIsNone(VideoSegmenter.keyframe_before("video.mp4", 450.0))
+        self.assertEqual(VideoSegmenter.keyframe_before("video.mp4", 0.0), 0.0)
+
+
+class MergeScoresTest(unittest.TestCase):
+    RUBRIC = {"title": "Test", "items": [{"name": "Spacing", "type": "likert"}, {"name": "Knots", "type": "binary"}]}
+
+    def test_windows_without_a_usable_score_do_not_vote(self):
+        windows = [
+            (0, 600, {"assessments": [{"name": "Spacing", "score": 5, "advice": ""},
+                                      {"name": "Knots", "score": 1, "advice": ""}]}),
+            (540, 1140, {"assessments": [{"name": "Spacing", "advice": "Camera moved."},
+                                         {"name": "Knots", "score": "n/a", "advice": ""}]}),
+            (1080, 1680, {"assessments": [{"name": "Spacing", "score": None, "observed": True, "advice": ""}]}),
+        ]
+        merged = {entry["name"]: entry for entry in SegmentMerger.merge(self.RUBRIC, windows)["assessments"]}
+        self.assertEqual(merged["Spacing"]["score"], 5)
+        self.assertEqual(merged["Spacing"]["advice"], "Camera moved.")
+        self.assertEqual(merged["Knots"]["score"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+"""
+Videos count as reported under every name ReportRenderer gives a report,
+including the rubric and duplicate-number suffixes of multi-rubric runs.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from medvat_core import ReportRenderer, VideoScanner
+
+
+class ReportNameTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="medvat_test_scan_")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def touch(self, *names):
+        for name in names:
+            open(os.path.join(self.folder, name), "w").close()
+
+    def test_multi_rubric_report_names(self):
+        self.touch("plain.mp4", "rubric.mp4", "numbered.mov", "pending.mp4")
+        rubric_pdf = ReportRenderer.pdf_path_for(os.path.join(self.folder, "rubric.mp4"), "Chest Tube Insertion VOP")
+        self.assertEqual(os.path.basename(rubric_pdf), "rubric_Chest_Tube_Insertion_VOP.pdf")
+        self.touch(
+            "plain.pdf",
+            os.path.basename(rubric_pdf),
+            "numbered_Suturing_Simple_Interrupted_2.pdf",
+            # Report of another video, not of "pending"
+            "pending_notes.pdf",
+        )
+        found = VideoScanner.scan(self.folder, verbose=False)
+        self.assertEqual([os.path.basename(path) for path in found], ["pending.mp4"])
+
+    def test_numbered_name_of_another_video(self):
+        # case_2.pdf is case_2's own report, so case still needs one
+        self.touch("case.mp4", "case_2.mp4", "case_2.pdf")
+        found = VideoScanner.scan(self.folder, verbose=False)
+        self.assertEqual([os.path.basename(path) for path in found], ["case.mp4"])
+
+    def test_reports_in_output_dir(self):
+        self.touch("clip.mp4", "other.mp4")
+        output_dir = os.path.join(self.folder, "reports")
+        os.mkdir(output_dir)
+        open(os.path.join(output_dir, "CLIP_1.pdf"), "w").close()
+        found = VideoScanner.scan(self.folder, output_dir=output_dir, verbose=False)
+        self.assertEqual([os.path.basename(path) for path in found], ["other.mp4"])
+
+
+if __name__ == "__main__":
+    unittest.main()